@@ -1,25 +1,24 @@
 # Example usage
-import json
-
 from daemon import WeApRous
 
 
-def create_sampleapp(): 
+def create_sampleapp():
     app = WeApRous()
 
-@app.route("/", methods=["GET"])
-def home(_):
-    return {"message": "Welcome to the RESTful TCP WebApp"}
+    @app.route("/", methods=["GET"])
+    def home(headers, body):
+        return {"json": {"message": "Welcome to the RESTful TCP WebApp"}}
 
-@app.route("/user", methods=["GET"])
-def get_user(_):
-    return {"id": 1, "name": "Alice", "email": "alice@example.com"}
+    @app.route("/user", methods=["GET"])
+    def get_user(headers, body):
+        return {"json": {"id": 1, "name": "Alice", "email": "alice@example.com"}}
 
-@app.route("/echo", methods=["POST"])
-def echo(body):
-    try:
-        data = json.loads(body)
-        return {"received": data}
-    except json.JSONDecodeError:
-        return {"error": "Invalid JSON"}
+    @app.route("/echo", methods=["POST"])
+    def echo(headers, body, request):
+        try:
+            data = request.json
+        except ValueError:
+            return {"json": {"error": "Invalid JSON"}, "status": 400}
+        return {"json": {"received": data}}
 
+    return app
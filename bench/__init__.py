@@ -0,0 +1,34 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench
+~~~~~~~~~~~~~~~~~
+
+This package provides the load-testing harness of the daemon stack.
+
+It starts the daemons on loopback in a scratch directory (see
+:mod:`bench.stack`): a plain backend serving ``www/`` and ``static/``, the
+tracker (``start_app.py``), a p2p client (``start_p2p.py``) and the proxy
+(``start_proxy.py``) with a generated ``config/proxy.conf``. It then drives
+them with a concurrent HTTP client (:mod:`bench.client`) through the
+scenarios of :mod:`bench.scenarios`, and reports requests per second,
+latency percentiles, error rates and the peak RSS of every daemon as JSON
+(:mod:`bench.report`), so runs can be compared across commits.
+
+Usage::
+
+  $ python -m bench --duration 10 --concurrency 32 --output before.json
+  $ git checkout my-branch
+  $ python -m bench --duration 10 --concurrency 32 --output after.json
+  $ python -m bench.report before.json after.json
+"""
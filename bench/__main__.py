@@ -0,0 +1,98 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.__main__
+~~~~~~~~~~~~~~~~~
+
+Command line entry point of the benchmarks: starts the stack, runs the
+selected scenarios with and/or without keep-alive, and writes the JSON
+report to stdout or to ``--output``.
+"""
+
+import argparse
+import json
+import sys
+
+from .client import run_load
+from .report import build_report, summarize
+from .scenarios import SCENARIOS
+from .stack import Stack
+
+#: Keep-alive modes selectable with ``--keep-alive``.
+KEEP_ALIVE_MODES = {"on": (True,), "off": (False,), "both": (True, False)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench",
+                                     description="Load-test the WeApRous daemons on loopback.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma separated scenarios among {}. Default is all.".format(
+                            ", ".join(SCENARIOS)))
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Virtual users per scenario. Default is 16.")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="Seconds each scenario runs. Default is 5.")
+    parser.add_argument("--warmup", type=float, default=1.0,
+                        help="Seconds of unreported load before each scenario. Default is 1.")
+    parser.add_argument("--keep-alive", choices=sorted(KEEP_ALIVE_MODES), default="both",
+                        help="Reuse client connections: on, off or both. Default is both.")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="Pause of the polling users, in seconds. Default is 0.1.")
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread",
+                        help="Serving engine of the backends. Default is thread.")
+    parser.add_argument("--output", default=None,
+                        help="Write the JSON report to this file instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit("Unknown scenario {}, expected some of {}".format(
+            ", ".join(unknown), ", ".join(SCENARIOS)))
+
+    results = []
+    with Stack(engine=args.engine) as stack:
+        for name in names:
+            scenario = SCENARIOS[name]
+            host, port, requests, setup = scenario.target(stack)
+            interval = scenario.interval
+            if interval and args.poll_interval is not None:
+                interval = args.poll_interval
+            for keep_alive in KEEP_ALIVE_MODES[args.keep_alive]:
+                if args.warmup > 0:
+                    run_load(host, port, requests, args.concurrency, args.warmup, keep_alive,
+                             interval, setup)
+                result = run_load(host, port, requests, args.concurrency, args.duration,
+                                  keep_alive, interval, setup)
+                entry = summarize(scenario, keep_alive, result)
+                results.append(entry)
+                sys.stderr.write("{:<8} {:<10} {:>9.1f} rps  p99 {:8.3f} ms  errors {}\n".format(
+                    name, "keep-alive" if keep_alive else "close", entry["rps"],
+                    entry["latency_ms"]["p99"], entry["errors"]))
+        peak_rss = stack.peak_rss()
+
+    report = build_report(vars(args), results, peak_rss)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+            out.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.client
+~~~~~~~~~~~~~~~~~
+
+This module provides the concurrent HTTP client of the benchmarks.
+
+Each virtual user is a thread with its own :class:`HttpConnection
+<HttpConnection>`. With keep-alive the connection is reused until the server
+closes it; without it every request opens a new connection and sends
+``Connection: close``. Responses are framed by ``Content-Length``, chunked
+encoding, or the end of the connection, so the client also works against
+the proxy, which answers one request per connection.
+
+A virtual user may pause between two requests, like the 100 ms
+``setTimeout`` of the chat pages polling the p2p client; its latency is
+then measured without the pause.
+
+Usage::
+
+  >>> conn = HttpConnection("127.0.0.1", 9000, keep_alive=True)
+  >>> status, headers, body = conn.request("GET", "/login.html")
+  >>> result = run_load(host, port, requests, concurrency=16, duration=5)
+  >>> result.latencies[:3]
+  [0.00041, 0.00038, 0.00052]
+"""
+
+import socket
+import threading
+import time
+
+#: Bytes read per ``recv``.
+RECV_SIZE = 65536
+#: Seconds a request may take before it counts as an error.
+REQUEST_TIMEOUT = 10.0
+
+
+class ResponseError(Exception):
+    """Raised when a response can not be read: the connection closed early
+    or the framing is invalid."""
+
+
+class HttpConnection:
+    """The :class:`HttpConnection <HttpConnection>` object, a minimal HTTP/1.1
+    client connection that can stay open between requests.
+
+    :attrs host (str): server address.
+    :attrs port (int): server port.
+    :attrs keep_alive (bool): reuse the connection between requests.
+    :attrs connects (int): number of TCP connections opened.
+    """
+
+    __attrs__ = [
+        "host",
+        "port",
+        "keep_alive",
+        "connects",
+    ]
+
+    def __init__(self, host, port, keep_alive=True, timeout=REQUEST_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.connects = 0
+        self._timeout = timeout
+        self._sock = None
+        self._buffer = b""
+
+    def close(self):
+        """Closes the connection, the next request opens a new one."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._buffer = b""
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self._timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connects += 1
+
+    def _recv(self):
+        chunk = self._sock.recv(RECV_SIZE)
+        if not chunk:
+            raise ResponseError("connection closed by the server")
+        self._buffer += chunk
+
+    def _read_until(self, marker):
+        while True:
+            index = self._buffer.find(marker)
+            if index >= 0:
+                data = self._buffer[:index]
+                self._buffer = self._buffer[index + len(marker):]
+                return data
+            self._recv()
+
+    def _read_exactly(self, size):
+        while len(self._buffer) < size:
+            self._recv()
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+    def _read_to_close(self):
+        parts = [self._buffer]
+        self._buffer = b""
+        while True:
+            chunk = self._sock.recv(RECV_SIZE)
+            if not chunk:
+                return b"".join(parts)
+            parts.append(chunk)
+
+    def _read_chunked(self):
+        parts = []
+        while True:
+            size_line = self._read_until(b"\r\n")
+            try:
+                size = int(size_line.split(b";", 1)[0], 16)
+            except ValueError:
+                raise ResponseError("invalid chunk size {!r}".format(size_line))
+            if size == 0:
+                # Trailers end with an empty line.
+                while self._read_until(b"\r\n"):
+                    pass
+                return b"".join(parts)
+            parts.append(self._read_exactly(size))
+            self._read_exactly(2)
+
+    def request(self, method, path, headers=None, body=b""):
+        """
+        Sends one request and reads its response.
+
+        :param method (str): request method.
+        :param path (str): request target.
+        :param headers (dict, optional): extra request headers.
+        :param body (bytes): request body.
+
+        :rtype tuple: (status, headers, body), header names lowercased.
+
+        :raises OSError: If the connection fails.
+        :raises ResponseError: If the response can not be read.
+        """
+        if self._sock is None:
+            self._connect()
+        lines = ["{} {} HTTP/1.1".format(method, path)]
+        sent_headers = {"Host": "{}:{}".format(self.host, self.port),
+                        "Connection": "keep-alive" if self.keep_alive else "close"}
+        if body or method in ("POST", "PUT"):
+            sent_headers["Content-Length"] = str(len(body))
+        sent_headers.update(headers or {})
+        lines.extend("{}: {}".format(name, value) for name, value in sent_headers.items())
+        try:
+            self._sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+            return self._read_response(method)
+        except (OSError, ResponseError):
+            self.close()
+            raise
+
+    def _read_response(self, method):
+        head = self._read_until(b"\r\n\r\n").decode("latin-1")
+        status_line, _, header_block = head.partition("\r\n")
+        try:
+            status = int(status_line.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            raise ResponseError("invalid status line {!r}".format(status_line))
+        response_headers = {}
+        for line in header_block.split("\r\n"):
+            name, _, value = line.partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == "HEAD" or status in (204, 304):
+            body = b""
+        elif "chunked" in response_headers.get("transfer-encoding", "").lower():
+            body = self._read_chunked()
+        elif "content-length" in response_headers:
+            body = self._read_exactly(int(response_headers["content-length"]))
+        else:
+            body = self._read_to_close()
+            self.close()
+
+        if not self.keep_alive or response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers, body
+
+
+class LoadResult:
+    """The :class:`LoadResult <LoadResult>` object, what the virtual users of
+    one load run measured.
+
+    :attrs latencies (list): seconds per completed request.
+    :attrs statuses (dict): status code to count, 0 for failed requests.
+    :attrs errors (int): failed requests and 5xx responses.
+    :attrs connects (int): TCP connections opened.
+    :attrs duration (float): seconds the run lasted.
+    """
+
+    __attrs__ = [
+        "latencies",
+        "statuses",
+        "errors",
+        "connects",
+        "duration",
+    ]
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.connects = 0
+        self.duration = 0.0
+
+    def merge(self, other):
+        """Adds the measures of another virtual user."""
+        self.latencies.extend(other.latencies)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.errors += other.errors
+        self.connects += other.connects
+
+
+def virtual_user(host, port, requests, keep_alive, deadline, interval, setup, result):
+    """
+    Sends the requests of a scenario in a loop until the deadline.
+
+    :param host (str): server address.
+    :param port (int): server port.
+    :param requests (list): (method, path, headers, body) tuples, sent in turn.
+    :param keep_alive (bool): reuse the connection between requests.
+    :param deadline (float): ``time.perf_counter()`` value to stop at.
+    :param interval (float): seconds to pause after each response, 0 for none.
+    :param setup (callable): called with the connection before the loop; returns
+                             headers added to every request (e.g. a session cookie).
+    :param result (LoadResult): where the measures are recorded.
+    """
+    conn = HttpConnection(host, port, keep_alive)
+    try:
+        extra = setup(conn) if setup else {}
+    except (OSError, ResponseError):
+        result.statuses[0] = result.statuses.get(0, 0) + 1
+        result.errors += 1
+        return
+    finally:
+        conn.close()
+    conn.connects = 0
+    latencies = result.latencies
+    statuses = result.statuses
+    index = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                break
+            method, path, headers, body = requests[index % len(requests)]
+            index += 1
+            if extra:
+                headers = dict(headers, **extra)
+            try:
+                status = conn.request(method, path, headers, body)[0]
+            except (OSError, ResponseError):
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 0 or status >= 500:
+                result.errors += 1
+            if interval:
+                time.sleep(interval)
+    finally:
+        result.connects = conn.connects
+        conn.close()
+
+
+def run_load(host, port, requests, concurrency=16, duration=5.0, keep_alive=True,
+             interval=0.0, setup=None):
+    """
+    Drives a server with concurrent virtual users.
+
+    :param host (str): server address.
+    :param port (int): server port.
+    :param requests (list): (method, path, headers, body) tuples, sent in turn.
+    :param concurrency (int): number of virtual users.
+    :param duration (float): seconds the load lasts.
+    :param keep_alive (bool): reuse connections between requests.
+    :param interval (float): pause of a user after each response (polling).
+    :param setup (callable, optional): per-user setup, see :func:`virtual_user`.
+
+    :rtype LoadResult: the merged measures.
+    """
+    results = [LoadResult() for _ in range(concurrency)]
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [threading.Thread(target=virtual_user, name="VirtualUser-{}".format(index),
+                                args=(host, port, requests, keep_alive, deadline, interval,
+                                      setup, result), daemon=True)
+               for index, result in enumerate(results)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + REQUEST_TIMEOUT * 2)
+
+    total = LoadResult()
+    for result in results:
+        total.merge(result)
+    total.duration = time.perf_counter() - started
+    return total
@@ -0,0 +1,159 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.report
+~~~~~~~~~~~~~~~~~
+
+This module turns load results into the JSON report of a run and compares
+two reports.
+
+A report holds the run metadata (commit, Python, options), one entry per
+scenario and keep-alive mode with the requests per second, the latency
+percentiles in milliseconds and the error rate, and the peak RSS of every
+daemon in KiB.
+
+Usage::
+
+  $ python -m bench.report before.json after.json
+  static   keep-alive  rps   4210.3 ->   5120.8  +21.6%   p99  4.12 ->  3.01 ms  -26.9%
+  ...
+"""
+
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from .stack import REPO_ROOT
+
+#: Latency percentiles reported.
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered, pct):
+    """
+    Nearest-rank percentile of sorted values.
+
+    :param ordered (list): values sorted in increasing order.
+    :param pct (float): percentile, 0 to 100.
+
+    :rtype float: the value, 0.0 for an empty list.
+    """
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(scenario, keep_alive, result):
+    """
+    Summarizes the load result of one scenario.
+
+    :param scenario (Scenario): the scenario that ran.
+    :param keep_alive (bool): whether the connections were reused.
+    :param result (LoadResult): the measures.
+
+    :rtype dict: the report entry.
+    """
+    ordered = sorted(result.latencies)
+    count = len(ordered)
+    latency = {"p{}".format(pct): round(percentile(ordered, pct) * 1000, 3)
+               for pct in PERCENTILES}
+    latency["mean"] = round(sum(ordered) / count * 1000, 3) if count else 0.0
+    latency["max"] = round(ordered[-1] * 1000, 3) if count else 0.0
+    return {
+        "scenario": scenario.name,
+        "description": scenario.description,
+        "keep_alive": keep_alive,
+        "requests": count,
+        "errors": result.errors,
+        "error_rate": round(result.errors / count, 6) if count else 0.0,
+        "rps": round(count / result.duration, 1) if result.duration else 0.0,
+        "latency_ms": latency,
+        "statuses": {str(status): n for status, n in sorted(result.statuses.items())},
+        "connections": result.connects,
+    }
+
+
+def git_commit():
+    """Returns the commit being measured, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(options, results, peak_rss):
+    """
+    Assembles the report of a run.
+
+    :param options (dict): the options of the run.
+    :param results (list): entries returned by :func:`summarize`.
+    :param peak_rss (dict): daemon name to peak RSS in KiB.
+
+    :rtype dict: the report, ready for :func:`json.dump`.
+    """
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": results,
+        "peak_rss_kb": peak_rss,
+    }
+
+
+def _change(before, after):
+    if not before:
+        return "     n/a"
+    return "{:+7.1f}%".format((after - before) / before * 100)
+
+
+def compare(before, after, out=sys.stdout):
+    """
+    Prints the throughput, p99 latency and error rate changes between two reports.
+
+    :param before (dict): the reference report.
+    :param after (dict): the new report.
+    :param out (file): destination.
+    """
+    out.write("{} -> {}\n".format(before.get("commit"), after.get("commit")))
+    reference = {(entry["scenario"], entry["keep_alive"]): entry for entry in before["results"]}
+    for entry in after["results"]:
+        old = reference.get((entry["scenario"], entry["keep_alive"]))
+        mode = "keep-alive" if entry["keep_alive"] else "close"
+        if old is None:
+            out.write("{:<8} {:<10}  new\n".format(entry["scenario"], mode))
+            continue
+        out.write("{:<8} {:<10}  rps {:9.1f} -> {:9.1f} {}   p99 {:8.3f} -> {:8.3f} ms {}"
+                  "   errors {:.2%} -> {:.2%}\n".format(
+                      entry["scenario"], mode, old["rps"], entry["rps"],
+                      _change(old["rps"], entry["rps"]),
+                      old["latency_ms"]["p99"], entry["latency_ms"]["p99"],
+                      _change(old["latency_ms"]["p99"], entry["latency_ms"]["p99"]),
+                      old["error_rate"], entry["error_rate"]))
+    for name, kib in sorted(after.get("peak_rss_kb", {}).items()):
+        old = before.get("peak_rss_kb", {}).get(name)
+        if kib is not None and old is not None:
+            out.write("peak RSS {:<8} {:8d} -> {:8d} KiB {}\n".format(name, old, kib,
+                                                                      _change(old, kib)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m bench.report BEFORE.json AFTER.json")
+    with open(sys.argv[1]) as first, open(sys.argv[2]) as second:
+        compare(json.load(first), json.load(second))
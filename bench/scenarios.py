@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.scenarios
+~~~~~~~~~~~~~~~~~
+
+This module defines the traffic the benchmarks send to the daemons of a
+:class:`Stack <bench.stack.Stack>`.
+
+- ``static``: pages and assets served by the plain backend (``www/`` and
+  ``static/``, from the static cache).
+- ``hook``: tracker routes, a logged-in user loading the index page (hook,
+  session lookup and template) and the channel list.
+- ``proxy``: the static pages and a tracker route through the proxy.
+- ``poll``: users of the p2p client refreshing a chat page every
+  :data:`POLL_INTERVAL` seconds, like ``chat.html``.
+
+Usage::
+
+  >>> scenario = SCENARIOS["hook"]
+  >>> host, port, requests, setup = scenario.target(stack)
+"""
+
+from urllib.parse import urlencode
+
+from .client import ResponseError
+from .stack import BACKEND_HOST
+
+#: Pause of a polling user between two refreshes, the ``setTimeout`` of chat.html.
+POLL_INTERVAL = 0.1
+#: Credentials of the built-in tracker account.
+LOGIN = {"username": "admin", "password": "password"}
+
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def get(path, headers=None):
+    """Returns a GET request tuple for :func:`run_load <bench.client.run_load>`."""
+    return ("GET", path, headers or {}, b"")
+
+
+def login(conn):
+    """
+    Logs a virtual user into the tracker and registers a chat address, so
+    the protected routes run their whole handler.
+
+    :param conn (HttpConnection): connection to the tracker backend.
+
+    :rtype dict: the ``Cookie`` header of the session.
+    """
+    status, headers, _ = conn.request("POST", "/login", FORM,
+                                      urlencode(LOGIN).encode("ascii"))
+    # The session cookie is the last Set-Cookie header, the one the client keeps.
+    session = headers.get("set-cookie", "").split(";", 1)[0].partition("=")[2]
+    if status != 302 or not session:
+        raise ResponseError("login failed with status {}".format(status))
+    cookie = {"Cookie": "auth=true; session_id={}".format(session)}
+    address = urlencode({"ip": "127.0.0.1", "port": 12000, "local-port": 10000})
+    conn.request("POST", "/submit-info", dict(FORM, **cookie), address.encode("ascii"))
+    return cookie
+
+
+class Scenario:
+    """The :class:`Scenario <Scenario>` object, the requests one kind of
+    virtual user sends.
+
+    :attrs name (str): scenario name.
+    :attrs description (str): what is measured.
+    :attrs interval (float): pause after each response, 0 for a closed loop.
+    """
+
+    __attrs__ = [
+        "name",
+        "description",
+        "interval",
+    ]
+
+    def __init__(self, name, description, target, interval=0.0):
+        self.name = name
+        self.description = description
+        self.interval = interval
+        self._target = target
+
+    def target(self, stack):
+        """
+        Resolves the scenario against running daemons.
+
+        :param stack (Stack): the running daemons.
+
+        :rtype tuple: (host, port, requests, setup) for :func:`run_load <bench.client.run_load>`.
+        """
+        return self._target(stack)
+
+
+def _static(stack):
+    host, port = stack.address("backend")
+    requests = [get("/login.html"), get("/css/styles.css"), get("/images/welcome.png")]
+    return host, port, requests, None
+
+
+def _hook(stack):
+    host, port = stack.address("tracker")
+    return host, port, [get("/"), get("/channel")], login
+
+
+def _proxy(stack):
+    host, port = stack.address("proxy")
+    requests = [get("/login.html", {"Host": BACKEND_HOST}),
+                get("/css/styles.css", {"Host": BACKEND_HOST}),
+                get("/login", {"Host": stack.tracker_host})]
+    return host, port, requests, None
+
+
+def _poll(stack):
+    host, port = stack.address("p2p")
+    return host, port, [get("/chat/127.0.0.1/{}".format(stack.chat_port))], None
+
+
+#: Scenarios by name, in the order they run.
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario("static", "static pages and assets from the backend", _static),
+        Scenario("hook", "logged-in tracker pages (hook, session and template)", _hook),
+        Scenario("proxy", "static pages and a tracker route through the proxy", _proxy),
+        Scenario("poll", "chat page refreshed every {:g} ms".format(POLL_INTERVAL * 1000),
+                 _poll, interval=POLL_INTERVAL),
+    )
+}
@@ -0,0 +1,261 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.stack
+~~~~~~~~~~~~~~~~~
+
+This module starts and stops the daemons under test.
+
+The daemons read ``config/proxy.conf``, ``www/`` and ``static/`` relative to
+their working directory, so each run gets a scratch directory holding a
+generated ``config/proxy.conf`` and links to the pages and assets of the
+repository. Every daemon runs its own start script as a subprocess on a free
+loopback port:
+
+- ``backend``: ``start_backend.py``, no routes, serves static files,
+- ``tracker``: ``start_app.py``, whose backend is the only ``proxy_pass`` of
+  its host block,
+- ``p2p``: ``start_p2p.py``, serving the chat pages,
+- ``proxy``: ``start_proxy.py``, forwarding :data:`BACKEND_HOST` to the
+  backend and the tracker address to the tracker backend.
+
+Usage::
+
+  >>> with Stack(engine="async") as stack:
+  ...     stack.address("tracker")
+  ('127.0.0.1', 40123)
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+#: Root of the repository, where the start scripts live.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#: Interface the daemons are bound to.
+HOST = "127.0.0.1"
+#: Virtual host of the proxy forwarding to the plain backend.
+BACKEND_HOST = "bench-backend"
+#: Seconds to wait for a daemon to accept connections.
+START_TIMEOUT = 10.0
+#: Directories linked into the scratch directory.
+SHARED_DIRS = ("www", "static", "apps")
+#: Names of the daemons, in start order.
+DAEMONS = ("backend", "tracker", "p2p", "proxy")
+
+
+def free_ports(count):
+    """
+    Returns distinct loopback ports that are free right now. The probes are
+    kept open until all of them are bound, so no port is returned twice.
+
+    :param count (int): number of ports.
+
+    :rtype list: the port numbers.
+    """
+    probes = []
+    try:
+        for _ in range(count):
+            probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            probes.append(probe)
+            probe.bind((HOST, 0))
+        return [probe.getsockname()[1] for probe in probes]
+    finally:
+        for probe in probes:
+            probe.close()
+
+
+def wait_listening(port, process, timeout=START_TIMEOUT):
+    """
+    Waits until a daemon accepts connections.
+
+    :param port (int): port of the daemon.
+    :param process (subprocess.Popen): the daemon process.
+    :param timeout (float): seconds to wait.
+
+    :raises RuntimeError: If the daemon exits or does not listen in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("daemon exited with status {}".format(process.returncode))
+        try:
+            socket.create_connection((HOST, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("daemon did not listen on port {} within {}s".format(port, timeout))
+
+
+def peak_rss_kb(pid):
+    """
+    Reads the peak resident set size of a process (Linux ``VmHWM``).
+
+    :param pid (int): process id.
+
+    :rtype int: peak RSS in KiB, or None where ``/proc`` is not available.
+    """
+    try:
+        with open("/proc/{}/status".format(pid)) as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def proxy_conf(tracker, tracker_backend, backend):
+    """
+    Renders the ``proxy.conf`` of the run.
+
+    :param tracker (str): "ip:port" of the tracker, its virtual host.
+    :param tracker_backend (str): "ip:port" its backend listens on.
+    :param backend (str): "ip:port" of the plain backend.
+
+    :rtype str: the configuration file.
+    """
+    return (
+        'host "{tracker}" {{\n'
+        '    proxy_pass http://{tracker_backend};\n'
+        '}}\n'
+        '\n'
+        'host "{name}" {{\n'
+        '    proxy_pass http://{backend};\n'
+        '}}\n'
+    ).format(tracker=tracker, tracker_backend=tracker_backend, name=BACKEND_HOST,
+             backend=backend)
+
+
+class Stack:
+    """The :class:`Stack <Stack>` object, the daemons of one benchmark run.
+
+    :attrs engine (str): serving engine of the backends, "thread" or "async".
+    :attrs ports (dict): daemon name to the port clients connect to.
+    :attrs processes (dict): daemon name to its process.
+    :attrs workdir (str): scratch directory the daemons run in.
+    """
+
+    __attrs__ = [
+        "engine",
+        "ports",
+        "processes",
+        "workdir",
+    ]
+
+    def __init__(self, engine="thread", log_level="WARNING"):
+        self.engine = engine
+        self.ports = {}
+        self.processes = {}
+        self.workdir = None
+        #: Virtual host of the tracker, the Host header sent through the proxy.
+        self.tracker_host = None
+        #: Chat port of the p2p client, part of the chat page paths.
+        self.chat_port = None
+        self._log_level = log_level
+        self._logs = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def address(self, name):
+        """Returns the (ip, port) clients of a daemon connect to."""
+        return HOST, self.ports[name]
+
+    def _prepare_workdir(self):
+        self.workdir = tempfile.mkdtemp(prefix="weaprous-bench-")
+        for name in SHARED_DIRS:
+            source = os.path.join(REPO_ROOT, name)
+            if os.path.isdir(source):
+                os.symlink(source, os.path.join(self.workdir, name))
+        os.mkdir(os.path.join(self.workdir, "config"))
+
+    def _spawn(self, name, script, *args):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+        env["WEAPROUS_LOG_LEVEL"] = self._log_level
+        log = open(os.path.join(self.workdir, name + ".log"), "wb")
+        self._logs.append(log)
+        command = [sys.executable, os.path.join(REPO_ROOT, script)] + [str(arg) for arg in args]
+        self.processes[name] = subprocess.Popen(command, cwd=self.workdir, env=env,
+                                                stdout=log, stderr=subprocess.STDOUT)
+        return self.processes[name]
+
+    def start(self):
+        """Starts every daemon and waits until they accept connections."""
+        self._prepare_workdir()
+        backend, tracker, tracker_backend, p2p, chat, proxy = free_ports(6)
+        with open(os.path.join(self.workdir, "config", "proxy.conf"), "w") as conf:
+            conf.write(proxy_conf("{}:{}".format(HOST, tracker),
+                                  "{}:{}".format(HOST, tracker_backend),
+                                  "{}:{}".format(HOST, backend)))
+
+        self.ports = {"backend": backend, "tracker": tracker_backend, "p2p": p2p,
+                      "proxy": proxy}
+        self.tracker_host = "{}:{}".format(HOST, tracker)
+        self.chat_port = chat
+
+        try:
+            self._spawn("backend", "start_backend.py", "--server-ip", HOST,
+                        "--server-port", backend, "--engine", self.engine)
+            self._spawn("tracker", "start_app.py", "--server-ip", HOST, "--server-port", tracker,
+                        "--engine", self.engine)
+            self._spawn("p2p", "start_p2p.py", "--server-port", p2p, "--chat-ip", HOST,
+                        "--chat-port", chat)
+            self._spawn("proxy", "start_proxy.py", "--server-ip", HOST, "--server-port", proxy)
+            for name in DAEMONS:
+                try:
+                    wait_listening(self.ports[name], self.processes[name])
+                except RuntimeError as e:
+                    raise RuntimeError("{}: {}, see {}".format(
+                        name, e, os.path.join(self.workdir, name + ".log")))
+        except Exception:
+            self.stop(keep_workdir=True)
+            raise
+
+    def peak_rss(self):
+        """
+        Peak RSS of every daemon, read while they are still running.
+
+        :rtype dict: daemon name to KiB (None where unknown).
+        """
+        return {name: peak_rss_kb(process.pid) for name, process in self.processes.items()}
+
+    def stop(self, keep_workdir=False):
+        """
+        Stops the daemons and removes the scratch directory.
+
+        :param keep_workdir (bool): keep the directory, e.g. to read the logs.
+        """
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for log in self._logs:
+            log.close()
+        self._logs = []
+        if self.workdir and not keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
@@ -10,11 +10,15 @@
 # while attending the course
 #
 
-from .backend import create_backend
+from .backend import create_backend, pool_stats
 from .proxy import create_proxy
 from .weaprous import WeApRous
 from .response import Response
 from .request import Request
 from .backend import create_backend
 from .httpadapter import HttpAdapter
-from .dictionary import CaseInsensitiveDict
\ No newline at end of file
+from .dictionary import CaseInsensitiveDict
+from .workerpool import WorkerPool
+from .logger import get_logger, configure_logging, log_stats
+from .profiling import configure_profiling
+from .middleware import Middleware
@@ -0,0 +1,455 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.asyncbackend
+~~~~~~~~~~~~~~~~~
+
+This module provides an event-loop serving engine for WeApRous backends.
+All client connections are multiplexed on a single asyncio loop, so an idle
+or polling browser costs a few kilobytes instead of a whole thread.
+
+The engine dispatches into the same route hooks and :class:`Response <Response>`
+builders as the threaded backend, through :class:`HttpAdapter <HttpAdapter>`:
+
+- coroutine hooks (``async def``) are awaited on the loop,
+- synchronous hooks, static files and templates run on a bounded thread
+  executor, so the existing ``start_app.py`` and ``start_p2p.py`` routes work
+  unchanged.
+
+Usage Example:
+--------------
+>>> create_backend("127.0.0.1", 9000, routes={}, engine="async")
+
+"""
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .response import SERVICE_UNAVAILABLE, TOO_MANY_CONNECTIONS, READ_ERRORS, FileBody
+from .httpadapter import (HttpAdapter, KEEP_ALIVE_TIMEOUT, MAX_KEEP_ALIVE_REQUESTS,
+                          acquire_adapter, release_adapter)
+from .reader import RequestError, RECV_SIZE
+from .limits import ConnectionLimits, DeadlineExceeded
+from .workerpool import DEFAULT_POOL_SIZE, DEFAULT_QUEUE_SIZE
+from .logger import get_logger
+from .profiling import PROFILER
+from . import metrics
+
+if hasattr(asyncio, "timeout"):
+    async def within(awaitable, timeout):
+        """Awaits with a timeout, without the task :func:`asyncio.wait_for` creates."""
+        async with asyncio.timeout(timeout):
+            return await awaitable
+else:
+    within = asyncio.wait_for
+
+#: Bytes per ``loop.sendfile`` call; the write deadline applies to each call.
+SENDFILE_CHUNK_SIZE = 1024 * 1024
+
+log = get_logger("AsyncBackend")
+
+
+class AsyncEngine:
+    """The :class:`AsyncEngine <AsyncEngine>` object, which serves a
+    backend on one asyncio event loop.
+
+    The executor runs ``pool_size`` threads, and at most ``pool_size + queue_size``
+    requests may be dispatched at once. Requests above that bound are answered
+    with a 503, mirroring the threaded :class:`WorkerPool <WorkerPool>`.
+
+    Attributes:
+        ip (str): IP address to bind the server.
+        port (int): Port number to listen on.
+        routes (dict): Mapping of route paths to handler functions.
+        pool_size (int): Number of executor threads for synchronous work.
+        queue_size (int): Number of requests allowed to wait for the executor.
+        keep_alive_timeout (float): Idle timeout of a persistent connection.
+        max_requests (int): Maximum requests served on one connection.
+        reuse_port (bool): Whether the listening socket is bound with SO_REUSEPORT.
+        limits (ConnectionLimits): Read and write deadlines and per-IP connection cap.
+    """
+
+    __attrs__ = [
+        "ip",
+        "port",
+        "routes",
+        "pool_size",
+        "queue_size",
+        "keep_alive_timeout",
+        "max_requests",
+        "reuse_port",
+        "limits",
+        "executor",
+        "connections",
+        "inflight",
+        "rejected",
+    ]
+
+    def __init__(self, ip, port, routes, pool_size=DEFAULT_POOL_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE, keep_alive_timeout=KEEP_ALIVE_TIMEOUT,
+                 max_requests=MAX_KEEP_ALIVE_REQUESTS, reuse_port=False, limits=None):
+        #: IP address.
+        self.ip = ip
+        #: Port.
+        self.port = port
+        #: Routes
+        self.routes = routes
+        #: Executor threads.
+        self.pool_size = pool_size
+        #: Pending requests allowed above the executor size.
+        self.queue_size = queue_size
+        #: Idle timeout of a persistent connection.
+        self.keep_alive_timeout = keep_alive_timeout
+        #: Maximum requests per connection.
+        self.max_requests = max_requests
+        #: SO_REUSEPORT for prefork workers.
+        self.reuse_port = reuse_port
+        #: Deadlines and per-IP connection cap.
+        self.limits = limits or ConnectionLimits("{}:{}".format(ip, port),
+                                                 idle_timeout=keep_alive_timeout)
+        #: Executor for synchronous hooks and file I/O.
+        self.executor = ThreadPoolExecutor(max_workers=pool_size,
+                                           thread_name_prefix="Async-{}".format(port))
+        #: Open client connections.
+        self.connections = 0
+        #: Requests currently dispatched.
+        self.inflight = 0
+        #: Requests rejected with 503.
+        self.rejected = 0
+
+    def stats(self):
+        """
+        Snapshot of the engine counters, shaped like :meth:`WorkerPool.stats`.
+
+        :rtype dict: executor size, busy workers, queue depth and counters.
+        """
+        inflight = self.inflight
+        return {
+            "pool_size": self.pool_size,
+            "busy_workers": min(inflight, self.pool_size),
+            "queue_depth": max(0, inflight - self.pool_size),
+            "queue_size": self.queue_size,
+            "connections": self.connections,
+            "rejected": self.rejected,
+        }
+
+    async def dispatch(self, adapter, head, body):
+        """
+        Dispatches one request through the adapter.
+
+        :param adapter (HttpAdapter): adapter bound to the connection.
+        :param head (bytes): the request line and headers.
+        :param body (bytes): the request body.
+
+        :rtype bytes | iterable: the encoded HTTP response, or its pieces when streamed.
+        """
+        loop = asyncio.get_running_loop()
+        timer = adapter.timer
+        timer.start()
+        req = adapter.prepare_request(head, self.routes, body)
+        timer.mark("parse")
+
+        hook = req.hook
+        if hook and inspect.iscoroutinefunction(hook):
+            started = time.perf_counter()
+            hook_result = await hook(**adapter.hook_kwargs(req))
+            metrics.HOOK_LATENCY.observe((hook._route_path,), time.perf_counter() - started)
+            timer.mark("hook")
+            return await loop.run_in_executor(self.executor, self._render, adapter, req, hook_result)
+
+        return await loop.run_in_executor(self.executor, self._dispatch_sync, adapter, req)
+
+    def _dispatch_sync(self, adapter, req):
+        # Runs on an executor thread, where a sampled request can be profiled.
+        profile = PROFILER.start()
+        try:
+            hook_result = None
+            if req.hook:
+                hook_result = adapter.call_hook(req)
+                adapter.timer.mark("hook")
+            return self._render(adapter, req, hook_result)
+        finally:
+            if profile is not None:
+                PROFILER.stop(profile)
+
+    def _render(self, adapter, req, hook_result):
+        response = adapter.build_reply(req, hook_result)
+        adapter.timer.mark("render")
+        return adapter.annotate(response)
+
+    async def send_response(self, adapter, writer, response):
+        """
+        Writes a response built by :meth:`HttpAdapter.build_reply`. Pieces of a
+        streamed response are produced on the executor, since the producer may
+        block, and written as they come. File bodies go through :meth:`sendfile`.
+
+        :param adapter (HttpAdapter): adapter bound to the connection.
+        :param writer (asyncio.StreamWriter): client stream writer.
+        :param response (bytes | iterable): the encoded response.
+
+        :rtype tuple: (status, sent) the status code and the number of bytes sent.
+        """
+        if isinstance(response, (bytes, bytearray)):
+            writer.write(response)
+            await self.drain(writer)
+            return metrics.status_of(response), len(response)
+
+        loop = asyncio.get_running_loop()
+        pieces = iter(response)
+        status = sent = 0
+        try:
+            while True:
+                piece = await loop.run_in_executor(self.executor, next, pieces, None)
+                if piece is None:
+                    break
+                if isinstance(piece, FileBody):
+                    await self.drain(writer)
+                    sent += await self.sendfile(writer, piece)
+                    continue
+                if not sent:
+                    status = metrics.status_of(piece)
+                writer.write(piece)
+                await self.drain(writer)
+                sent += len(piece)
+        except (ConnectionError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            log.warning("Stream aborted for %s: %s", adapter.connaddr, e)
+            adapter.response.keep_alive = False
+        finally:
+            close = getattr(response, 'close', None)
+            if close:
+                close()
+        return status, sent
+
+    async def sendfile(self, writer, body):
+        """
+        Writes a file span with ``loop.sendfile`` in pieces of
+        :data:`SENDFILE_CHUNK_SIZE`, so ``limits.write_timeout`` bounds each
+        piece rather than the whole file.
+
+        :param writer (asyncio.StreamWriter): client stream writer.
+        :param body (FileBody): the span to send.
+
+        :rtype int: number of bytes sent.
+
+        :raises DeadlineExceeded: If the client stops reading for too long.
+        """
+        loop = asyncio.get_running_loop()
+        offset, remaining = body.offset, body.count
+        sent = 0
+        while remaining is None or remaining > 0:
+            size = SENDFILE_CHUNK_SIZE if remaining is None else min(SENDFILE_CHUNK_SIZE, remaining)
+            count = await self.drain(writer, loop.sendfile(writer.transport, body.file, offset, size))
+            if not count:
+                break
+            sent += count
+            offset += count
+            if remaining is not None:
+                remaining -= count
+            if count < size:
+                # End of file.
+                break
+        return sent
+
+    async def drain(self, writer, operation=None):
+        """
+        Waits for a write to complete within ``limits.write_timeout``.
+
+        :param writer (asyncio.StreamWriter): client stream writer.
+        :param operation (awaitable, optional): the write to wait for, by
+                                                default ``writer.drain()``.
+
+        :rtype: the result of the operation.
+
+        :raises DeadlineExceeded: If the client does not read in time.
+        """
+        if operation is None:
+            if not writer.transport.get_write_buffer_size() and not writer.is_closing():
+                # Everything was written, drain() would not wait. A closing
+                # transport goes through drain() to report the lost connection.
+                return None
+            operation = writer.drain()
+        try:
+            return await within(operation, self.limits.write_timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("write_timeout") from None
+
+    async def read_message(self, reader, parser):
+        """
+        Reads exactly one HTTP request from the stream. Bytes of pipelined
+        requests stay buffered in the connection parser.
+
+        Like :func:`read_message <daemon.reader.read_message>`, the wait for
+        the first byte, the head and the body each have a total deadline.
+
+        :param reader (asyncio.StreamReader): client stream reader.
+        :param parser (HttpParser): parser bound to the connection.
+
+        :rtype tuple: (head, body) as bytes, or None when the client closed.
+
+        :raises RequestError: If a size limit is exceeded or the framing is invalid.
+        :raises DeadlineExceeded: If a deadline is missed; ``reason`` names the phase.
+        """
+        loop = asyncio.get_running_loop()
+        phase = deadline = None
+        while True:
+            message = parser.next_message()
+            if message is not None:
+                return message
+            current = parser.phase()
+            if current != phase:
+                phase = current
+                timeout = getattr(self.limits, phase)
+                deadline = None if timeout is None else loop.time() + timeout
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(phase)
+            try:
+                chunk = await within(reader.read(RECV_SIZE), remaining)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(phase) from None
+            if not chunk:
+                return None
+            parser.feed(chunk)
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves one client connection on the event loop. Requests on the
+        connection are answered in order until the client closes it, it stays
+        idle for ``keep_alive_timeout`` seconds or reaches ``max_requests``.
+        Reads and writes run within the deadlines of :attr:`limits`.
+
+        :param reader (asyncio.StreamReader): client stream reader.
+        :param writer (asyncio.StreamWriter): client stream writer.
+        """
+        addr = writer.get_extra_info("peername")
+        limits = self.limits
+        if not limits.admit(addr[0]):
+            log.warning("Too many connections from %s, rejecting", addr[0])
+            writer.write(TOO_MANY_CONNECTIONS)
+            writer.close()
+            return
+        adapter = acquire_adapter(self.ip, self.port, None, addr, self.routes,
+                                  self.keep_alive_timeout, self.max_requests, limits)
+        self.connections += 1
+        served = 0
+        try:
+            while True:
+                try:
+                    message = await self.read_message(reader, adapter.parser)
+                except RequestError as e:
+                    log.warning("Rejecting request from %s: %s", addr, e)
+                    writer.write(adapter.response.build_error(e.status, e.reason))
+                    await self.drain(writer)
+                    metrics.REQUESTS.inc((adapter.server, "-", "-", e.status))
+                    break
+                if message is None:
+                    break
+
+                if self.inflight >= self.pool_size + self.queue_size:
+                    self.rejected += 1
+                    log.warning("Executor queue full, rejecting %s", addr)
+                    writer.write(SERVICE_UNAVAILABLE)
+                    await self.drain(writer)
+                    break
+
+                served += 1
+                adapter.keep_alive = served < self.max_requests
+                self.inflight += 1
+                try:
+                    head, body = message
+                    response = await self.dispatch(adapter, head, body)
+                except Exception:
+                    # Nothing was sent yet, the client still gets an answer.
+                    log.exception("Error serving %s", addr)
+                    response = adapter.response.build_internal_error()
+                finally:
+                    self.inflight -= 1
+
+                status, sent = await self.send_response(adapter, writer, response)
+                adapter.observe(adapter.timer.started, len(head) + len(body), status, sent)
+                if not adapter.response.keep_alive:
+                    break
+        except DeadlineExceeded as e:
+            limits.closed(e.reason)
+            if e.reason in ("header_timeout", "body_timeout"):
+                log.warning("Closing %s: %s", addr, e.reason)
+                writer.write(READ_ERRORS[408])
+            elif e.reason == "write_timeout":
+                log.warning("Closing %s: %s", addr, e.reason)
+        except ConnectionError as e:
+            log.warning("Connection error from %s: %s", addr, e)
+        except Exception:
+            log.exception("Error serving %s", addr)
+        finally:
+            self.connections -= 1
+            limits.release(addr[0])
+            writer.close()
+        # Not reached when the task is cancelled, an executor thread may
+        # still be rendering with the adapter then.
+        release_adapter(adapter)
+
+    async def serve(self):
+        """Binds the listening socket and serves forever."""
+        server = await asyncio.start_server(self.handle_client, self.ip, self.port,
+                                            backlog=max(50, self.queue_size),
+                                            reuse_port=self.reuse_port or None)
+        log.info("Listening on port %s with %s executor threads (queue %s)",
+                 self.port, self.pool_size, self.queue_size)
+        if self.routes != {}:
+            log.debug("route settings %s", self.routes)
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """Runs the event loop in the calling thread until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def run_async_backend(ip, port, routes, pool_size=DEFAULT_POOL_SIZE,
+                      queue_size=DEFAULT_QUEUE_SIZE, keep_alive_timeout=KEEP_ALIVE_TIMEOUT,
+                      max_requests=MAX_KEEP_ALIVE_REQUESTS, reuse_port=False, registry=None,
+                      limits=None):
+    """
+    Starts the event-loop backend, binds to the specified IP and port, and
+    multiplexes every client connection on one asyncio loop.
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param pool_size (int): Number of executor threads for synchronous hooks.
+    :param queue_size (int): Number of requests allowed to wait for the executor.
+    :param keep_alive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Maximum requests served on one persistent connection.
+    :param reuse_port (bool): Bind with SO_REUSEPORT so prefork workers share the address.
+    :param registry (dict, optional): Registry the engine is published in while running.
+    :param limits (ConnectionLimits, optional): Deadlines and per-IP connection cap.
+    """
+    engine = AsyncEngine(ip, port, routes, pool_size, queue_size,
+                         keep_alive_timeout, max_requests, reuse_port, limits)
+    address = "{}:{}".format(ip, port)
+    if registry is not None:
+        registry[address] = engine
+    try:
+        engine.run()
+    except OSError as e:
+        log.error("Socket error: %s", e)
+    finally:
+        if registry is not None:
+            registry.pop(address, None)
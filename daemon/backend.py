@@ -30,80 +30,285 @@ Requirements:
 
 Notes:
 ------
-- The server create daemon threads for client handling.
+- Accepted connections are handed to a fixed-size :class:`WorkerPool <WorkerPool>`
+  through a bounded queue. When the queue is full the client immediately receives
+  a ``503 Service Unavailable`` with ``Retry-After`` instead of a new thread.
+- Between two requests, an idle keep-alive connection holds no worker: it is
+  parked in :class:`IdleConnections <IdleConnections>` and queued to the pool
+  again when its next request arrives.
+- The live pool counters of every running backend are available from
+  :func:`pool_stats`.
+- Reads and writes run within the deadlines of a :class:`ConnectionLimits
+  <ConnectionLimits>`, and a client IP may be capped to a number of open
+  connections; a refused client receives a ``429 Too Many Requests``.
+- ``engine="async"`` serves the backend on one asyncio event loop instead,
+  see :mod:`daemon.asyncbackend`.
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend("127.0.0.1", 9000, routes={}, pool_size=64, queue_size=256)
+>>> create_backend("127.0.0.1", 9000, routes={}, engine="async")
 
 """
 
 import socket
 import threading
 import argparse
+import functools
 
 from .response import *
-from .httpadapter import HttpAdapter
+from .httpadapter import (HttpAdapter, KEEP_ALIVE_TIMEOUT, MAX_KEEP_ALIVE_REQUESTS,
+                          acquire_adapter, release_adapter)
 from .dictionary import CaseInsensitiveDict
+from .workerpool import WorkerPool, DEFAULT_POOL_SIZE, DEFAULT_QUEUE_SIZE
+from .idle import IdleConnections
+from .limits import (ConnectionLimits, HEADER_TIMEOUT, BODY_TIMEOUT, WRITE_TIMEOUT,
+                     MAX_CONNECTIONS_PER_IP, send_nowait)
+from .asyncbackend import run_async_backend
+from .logger import get_logger
+from .router import Router
+from .profiling import configure_profiling, profile_route
+from . import metrics
 
-def handle_client(ip, port, conn, addr, routes):
+log = get_logger("Backend")
+
+#: Serving engines selectable from :func:`create_backend`.
+ENGINES = ("thread", "async")
+
+#: Worker pools of the running backends, keyed by "ip:port".
+ACTIVE_POOLS = {}
+
+def handle_client(ip, port, conn, addr, routes, keep_alive_timeout=KEEP_ALIVE_TIMEOUT,
+                  max_requests=MAX_KEEP_ALIVE_REQUESTS, limits=None, idle=None, adapter=None):
     """
-    Initializes an HttpAdapter instance and delegates the client handling logic to it.
+    Takes an HttpAdapter from the worker's freelist (or creates one) and
+    delegates the client handling logic to it. The adapter goes back to the
+    freelist once the connection is closed.
+
+    With ``idle``, a keep-alive connection waiting for its next request is
+    parked there together with its adapter, and this function is called
+    again with that ``adapter`` when the request arrives.
 
     :param ip (str): IP address of the server.
     :param port (int): Port number the server is listening on.
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param keep_alive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Maximum requests served on one connection.
+    :param limits (ConnectionLimits): Deadlines of the backend; the connection
+                                      admitted by it is released once closed.
+    :param idle (IdleConnections, optional): where idle connections are parked.
+    :param adapter (HttpAdapter, optional): adapter of a resumed connection.
     """
-    daemon = HttpAdapter(ip, port, conn, addr, routes)
+    daemon = adapter
+    if daemon is None:
+        daemon = acquire_adapter(ip, port, conn, addr, routes, keep_alive_timeout,
+                                 max_requests, limits)
 
     # Handle client
-    daemon.handle_client(conn, addr, routes)
+    try:
+        parked = daemon.handle_client(conn, addr, routes, park=idle is not None)
+    except Exception:
+        conn.close()
+        if limits is not None:
+            limits.release(addr[0])
+        raise
+    if parked:
+        idle.park(conn, (ip, port, conn, addr, routes, keep_alive_timeout, max_requests,
+                         limits, idle, daemon))
+        return
+    if limits is not None:
+        limits.release(addr[0])
+    release_adapter(daemon)
 
-def run_backend(ip, port, routes):
+def reject_client(conn):
+    """
+    Answers a client with a prebuilt 503 response and closes the connection.
+    It runs on the accept loop, so it must never block nor parse the request.
+
+    :param conn (socket.socket): Client connection socket.
+    """
+    send_nowait(conn, SERVICE_UNAVAILABLE)
+    conn.close()
+
+def resume_client(pool, task):
+    """
+    Queues a parked connection whose next request arrived, or answers it
+    with a 503 when the queue is full.
+
+    :param pool (WorkerPool): worker pool of the backend.
+    :param task (tuple): arguments of :func:`handle_client`.
+    """
+    if not pool.submit(*task):
+        conn, addr, limits = task[2], task[3], task[7]
+        log.warning("Worker queue full, rejecting %s", addr)
+        limits.release(addr[0])
+        reject_client(conn)
+
+def expire_client(task):
+    """
+    Closes a parked connection that stayed idle for ``idle_timeout``.
+
+    :param task (tuple): arguments of :func:`handle_client`.
+    """
+    conn, addr, limits = task[2], task[3], task[7]
+    conn.close()
+    limits.closed("idle_timeout")
+    limits.release(addr[0])
+
+def pool_stats():
+    """
+    Returns the live worker pool counters of every running backend.
+
+    :rtype dict: mapping "ip:port" to the :meth:`WorkerPool.stats` snapshot.
+    """
+    return {address: pool.stats() for address, pool in ACTIVE_POOLS.items()}
+
+#: Pool metrics read from :func:`pool_stats`: (stats key, name, type, help).
+POOL_METRICS = (
+    ("pool_size", "weaprous_workers", "gauge", "Worker threads of the backend."),
+    ("busy_workers", "weaprous_workers_busy", "gauge", "Worker threads serving a request."),
+    ("queue_depth", "weaprous_queue_depth", "gauge", "Connections or requests waiting for a worker."),
+    ("connections", "weaprous_connections", "gauge", "Open client connections (async engine)."),
+    ("rejected", "weaprous_rejected_total", "counter", "Clients answered with 503 because the queue was full."),
+)
+
+def collect_pool_metrics():
+    """
+    Metrics collector exposing the worker utilisation of the running backends.
+
+    :rtype list: (name, type, help, labelnames, samples) tuples, see :class:`Registry`.
+    """
+    stats = pool_stats()
+    families = []
+    for key, name, kind, help in POOL_METRICS:
+        samples = [((address,), values[key]) for address, values in sorted(stats.items())
+                   if key in values]
+        families.append((name, kind, help, ("server",), samples))
+    return families
+
+metrics.REGISTRY.add_collector(collect_pool_metrics)
+
+def run_backend(ip, port, routes, pool_size=DEFAULT_POOL_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                keep_alive_timeout=KEEP_ALIVE_TIMEOUT, max_requests=MAX_KEEP_ALIVE_REQUESTS,
+                reuse_port=False, limits=None):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
-    connections. Each connection is handled in a separate thread. The backend accepts incoming
-    connections and spawns a thread for each client.
+    connections. Each accepted connection is queued to a fixed-size worker pool. When the
+    queue is full the client is answered with a 503 instead of spawning another thread.
 
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param pool_size (int): Number of worker threads.
+    :param queue_size (int): Maximum number of accepted connections waiting for a worker.
+    :param keep_alive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Maximum requests served on one persistent connection.
+    :param reuse_port (bool): Bind with SO_REUSEPORT so several prefork workers
+                              share the address.
+    :param limits (ConnectionLimits): Deadlines and per-IP connection cap. Defaults
+                                      to the standard ones.
     """
+    if limits is None:
+        limits = ConnectionLimits("{}:{}".format(ip, port), idle_timeout=keep_alive_timeout)
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if reuse_port:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    pool = WorkerPool(handle_client, size=pool_size, queue_size=queue_size,
+                      name="Backend-{}".format(port))
+    idle = IdleConnections(functools.partial(resume_client, pool), expire_client,
+                           limits.idle_timeout, name="Backend-{}".format(port))
+    ACTIVE_POOLS["{}:{}".format(ip, port)] = pool
 
     try:
         server.bind((ip, port))
-        server.listen(50)
-        print("[Backend] Listening on port {}".format(port))
+        server.listen(max(50, queue_size))
+        pool.start()
+        idle.start()
+        log.info("Listening on port %s with %s workers (queue %s)",
+                 port, pool_size, queue_size)
         if routes != {}:
-            print("[Backend] route settings {}".format(routes))
+            log.debug("route settings %s", routes)
 
         while True:
             conn, addr = server.accept()
-            #
-            #  TODO: implement the step of the client incomping connection
-            #        using multi-thread programming with the
-            #        provided handle_client routine
-            #
-            # handle_client(ip, port, conn, addr, routes)
-            
-            thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
-            thread.start()
+            if not limits.admit(addr[0]):
+                log.warning("Too many connections from %s, rejecting", addr[0])
+                send_nowait(conn, TOO_MANY_CONNECTIONS)
+                conn.close()
+                continue
+            if not pool.submit(ip, port, conn, addr, routes, keep_alive_timeout, max_requests,
+                               limits, idle):
+                log.warning("Worker queue full, rejecting %s", addr)
+                limits.release(addr[0])
+                reject_client(conn)
     except socket.error as e:
-      print("Socket error: {}".format(e))
+      log.error("Socket error: %s", e)
+    finally:
+        ACTIVE_POOLS.pop("{}:{}".format(ip, port), None)
 
-def create_backend(ip, port, routes={}):
+def create_backend(ip, port, routes={}, pool_size=DEFAULT_POOL_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                   engine="thread", keep_alive_timeout=KEEP_ALIVE_TIMEOUT,
+                   max_requests=MAX_KEEP_ALIVE_REQUESTS, reuse_port=False, metrics_path=None,
+                   profile_path=None, profile_sample=None, header_timeout=HEADER_TIMEOUT,
+                   body_timeout=BODY_TIMEOUT, write_timeout=WRITE_TIMEOUT,
+                   max_connections_per_ip=MAX_CONNECTIONS_PER_IP):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param pool_size (int, optional): Number of worker threads.
+    :param queue_size (int, optional): Depth of the accept queue feeding the workers.
+    :param engine (str, optional): "thread" for the worker pool backend, "async" for
+                                   the event-loop backend. Defaults to "thread".
+    :param keep_alive_timeout (float, optional): Seconds an idle persistent connection is kept.
+    :param max_requests (int, optional): Maximum requests served on one persistent connection.
+    :param reuse_port (bool, optional): Bind with SO_REUSEPORT (prefork workers).
+    :param metrics_path (str, optional): Path of the route serving the metrics in the
+                                         Prometheus text format, e.g. "/metrics".
+                                         Disabled by default.
+    :param profile_path (str, optional): Path of the admin route reporting the sampled
+                                         profiles and changing the sample rate, e.g.
+                                         "/profile". Disabled by default.
+    :param profile_sample (int, optional): Profile 1 request out of N with cProfile,
+                                           see :mod:`daemon.profiling`.
+    :param header_timeout (float, optional): Seconds to receive a request head once
+                                             its first byte arrived.
+    :param body_timeout (float, optional): Seconds to receive a request body.
+    :param write_timeout (float, optional): Seconds one response write may block.
+    :param max_connections_per_ip (int, optional): Connections a client IP may have
+                                                   open at once, 0 (default) for no limit.
+
+    :raises ValueError: If the engine is unknown.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    if profile_sample is not None:
+        configure_profiling(sample=profile_sample)
+
+    if metrics_path or profile_path:
+        routes = Router(routes)
+        if metrics_path:
+            routes.add(metrics_path, ["GET"], metrics.metrics_route(metrics_path))
+        if profile_path:
+            routes.add(profile_path, ["GET"], profile_route(profile_path))
+
+    limits = ConnectionLimits("{}:{}".format(ip, port), keep_alive_timeout, header_timeout,
+                              body_timeout, write_timeout, max_connections_per_ip)
+
+    if engine == "thread":
+        run_backend(ip, port, routes, pool_size, queue_size, keep_alive_timeout, max_requests,
+                    reuse_port, limits)
+    elif engine == "async":
+        run_async_backend(ip, port, routes, pool_size, queue_size, keep_alive_timeout,
+                          max_requests, reuse_port, registry=ACTIVE_POOLS, limits=limits)
+    else:
+        raise ValueError("Invalid engine {}, expected one of {}".format(engine, ENGINES))
\ No newline at end of file
@@ -0,0 +1,358 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module provides the load-balancing policies of the proxy, chosen by
+the ``dist_policy`` directive of a host block in ``config/proxy.conf``:
+
+- ``round-robin`` (default): the backends in turn,
+- ``weighted``: smooth weighted round-robin, a backend with ``weight=3``
+  receiving three requests for each one of a backend with weight 1,
+  interleaved rather than in bursts,
+- ``least-connections``: the backend with the fewest requests in flight
+  relative to its weight,
+- ``sticky-cookie [name]``: a request carrying the session cookie
+  (``session_id`` by default) goes to the backend that set it, learned from
+  the ``Set-Cookie`` headers of the responses; other requests go round-robin.
+  Backends keeping sessions in memory (``start_app.py``) need this one.
+- ``consistent-hash ip | header <name> | cookie <name> [vnodes=N]``: a hash
+  ring with N virtual nodes per weight unit of each backend (160 by
+  default). Requests with the same key always reach the same backend, and
+  adding or removing a backend only moves the keys it owns. Requests
+  without the header or cookie are hashed on the client IP.
+
+A policy object is compiled once per host block by
+:func:`parse_virtual_hosts <daemon.proxy.parse_virtual_hosts>` and shared by
+the proxy threads; weights come from the ``weight=N`` parameter of
+``proxy_pass``. Choosing a backend costs the same whatever the number of
+requests served: the round-robin schedules are precomputed and the hash
+ring is a sorted list searched with :func:`bisect.bisect`.
+
+Usage::
+
+  host "127.0.0.1:8000" {
+      proxy_pass http://127.0.0.1:8001 weight=2;
+      proxy_pass http://127.0.0.1:8002;
+      dist_policy sticky-cookie session_id;
+  }
+
+  >>> policy = compile_policy("consistent-hash header X-User", ["127.0.0.1:8001", "127.0.0.1:8002"])
+  >>> backend = policy.choose(headers, client_ip)
+  >>> policy.done(backend)
+"""
+
+import bisect
+import collections
+import hashlib
+import itertools
+import threading
+
+#: Virtual nodes per weight unit of a backend on a hash ring.
+VIRTUAL_NODES = 160
+#: Sessions remembered by a sticky-cookie policy, the least recently used
+#: ones being forgotten first.
+MAX_STICKY_SESSIONS = 65536
+#: Cookie followed by the sticky-cookie policy by default.
+SESSION_COOKIE = "session_id"
+
+
+def cookie_value(headers, name):
+    """
+    Reads one cookie of a request.
+
+    :param headers (HeaderMap): request headers.
+    :param name (str): cookie name.
+
+    :rtype str: the value, or None if the cookie is absent.
+    """
+    cookies = headers.get("cookie") if headers is not None else None
+    if not cookies:
+        return None
+    for pair in cookies.split(";"):
+        key, sep, value = pair.partition("=")
+        if sep and key.strip() == name:
+            return value.strip()
+    return None
+
+
+def hash_key(key):
+    """
+    Hashes a key onto a ring, the same way in every process (unlike
+    :func:`hash`, which is salted per process).
+
+    :param key (str): the key.
+
+    :rtype int: a 64-bit position.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Policy:
+    """The :class:`Policy <Policy>` object, the base of the load-balancing
+    policies.
+
+    :attrs backends (list): "host:port" of the backends.
+    :attrs weights (list): weight of each backend, 1 by default.
+    """
+
+    #: Name of the policy in ``dist_policy``.
+    name = None
+
+    __attrs__ = [
+        "backends",
+        "weights",
+    ]
+
+    def __init__(self, backends, weights=None):
+        self.backends = list(backends)
+        self.weights = list(weights) if weights else [1] * len(self.backends)
+        if len(self.weights) != len(self.backends) or min(self.weights, default=1) < 1:
+            raise ValueError("Invalid weights {} for {}".format(self.weights, self.backends))
+
+    def choose(self, headers, client_ip):
+        """
+        Picks the backend of a request.
+
+        :param headers (HeaderMap): request headers.
+        :param client_ip (str): client IP address.
+
+        :rtype str: "host:port" of the backend.
+        """
+        raise NotImplementedError
+
+    def learn(self, backend, head):
+        """
+        Sees the head of a response before it is relayed.
+
+        :param backend (str): backend that answered.
+        :param head (bytes): status line and headers of the response.
+        """
+
+    def done(self, backend):
+        """
+        Ends a request :meth:`choose` sent to a backend, answered or not.
+
+        :param backend (str): the chosen backend.
+        """
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, self.backends)
+
+
+class RoundRobin(Policy):
+    """The backends in turn."""
+
+    name = "round-robin"
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends, weights)
+        # next() of a cycle is atomic under the GIL, no lock is needed.
+        self._cycle = itertools.cycle(self.schedule())
+
+    def schedule(self):
+        """The backends of one round, in order."""
+        return self.backends
+
+    def choose(self, headers, client_ip):
+        return next(self._cycle)
+
+
+class WeightedRoundRobin(RoundRobin):
+    """Smooth weighted round-robin, the schedule being computed once."""
+
+    name = "weighted"
+
+    def schedule(self):
+        # Each turn, every backend gains its weight and the one with the most
+        # credit is chosen and pays the total weight back.
+        total = sum(self.weights)
+        credit = [0] * len(self.backends)
+        order = []
+        for _ in range(total):
+            for index, weight in enumerate(self.weights):
+                credit[index] += weight
+            best = max(range(len(credit)), key=credit.__getitem__)
+            credit[best] -= total
+            order.append(self.backends[best])
+        return order
+
+
+class LeastConnections(Policy):
+    """The backend with the fewest requests in flight per weight unit, ties
+    going round-robin."""
+
+    name = "least-connections"
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends, weights)
+        self._active = [0] * len(self.backends)
+        self._index = {backend: index for index, backend in enumerate(self.backends)}
+        self._start = 0
+        self._lock = threading.Lock()
+
+    def choose(self, headers, client_ip):
+        count = len(self.backends)
+        with self._lock:
+            start = self._start
+            self._start = (start + 1) % count
+            best = min(((start + offset) % count for offset in range(count)),
+                       key=lambda index: self._active[index] / self.weights[index])
+            self._active[best] += 1
+        return self.backends[best]
+
+    def done(self, backend):
+        index = self._index.get(backend)
+        if index is None:
+            return
+        with self._lock:
+            if self._active[index] > 0:
+                self._active[index] -= 1
+
+    def active(self, backend):
+        """Requests in flight to a backend."""
+        return self._active[self._index[backend]]
+
+
+class StickyCookie(RoundRobin):
+    """Requests of a session to the backend that created it, learned from
+    its ``Set-Cookie`` header; requests without a known session go
+    round-robin."""
+
+    name = "sticky-cookie"
+
+    def __init__(self, backends, weights=None, cookie=SESSION_COOKIE,
+                 max_sessions=MAX_STICKY_SESSIONS):
+        super().__init__(backends, weights)
+        self.cookie = cookie
+        self.max_sessions = int(max_sessions)
+        self._marker = b"set-cookie:"
+        self._prefix = cookie.encode("latin-1") + b"="
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose(self, headers, client_ip):
+        session = cookie_value(headers, self.cookie)
+        if session:
+            with self._lock:
+                backend = self._sessions.get(session)
+                if backend is not None:
+                    self._sessions.move_to_end(session)
+                    return backend
+        return next(self._cycle)
+
+    def learn(self, backend, head):
+        if self._marker not in head.lower():
+            return
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() != b"set-cookie":
+                continue
+            value = value.strip()
+            if not value.startswith(self._prefix):
+                continue
+            session = value[len(self._prefix):].split(b";", 1)[0].strip()
+            if not session:
+                continue
+            session = session.decode("latin-1")
+            with self._lock:
+                self._sessions[session] = backend
+                self._sessions.move_to_end(session)
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+    def sessions(self):
+        """Number of sessions remembered."""
+        return len(self._sessions)
+
+
+class ConsistentHash(Policy):
+    """A hash ring of the backends, keyed on the client IP, a header or a cookie."""
+
+    name = "consistent-hash"
+
+    #: Sources of the key.
+    SOURCES = ("ip", "header", "cookie")
+
+    def __init__(self, backends, weights=None, source="ip", key=None, vnodes=VIRTUAL_NODES):
+        super().__init__(backends, weights)
+        if source not in self.SOURCES:
+            raise ValueError("consistent-hash key must be one of {}, not {}".format(
+                "/".join(self.SOURCES), source))
+        if source != "ip" and not key:
+            raise ValueError("consistent-hash {} needs a name".format(source))
+        self.source = source
+        self.key = key.lower() if source == "header" else key
+        self.vnodes = int(vnodes)
+
+        ring = []
+        for backend, weight in zip(self.backends, self.weights):
+            for node in range(self.vnodes * weight):
+                ring.append((hash_key("{}#{}".format(backend, node)), backend))
+        ring.sort()
+        self._points = [point for point, _ in ring]
+        self._owners = [backend for _, backend in ring]
+
+    def key_of(self, headers, client_ip):
+        """
+        Reads the key of a request.
+
+        :rtype str: the header or cookie value, the client IP when it is absent.
+        """
+        value = None
+        if self.source == "header" and headers is not None:
+            value = headers.get(self.key)
+        elif self.source == "cookie":
+            value = cookie_value(headers, self.key)
+        return value or client_ip or ""
+
+    def choose(self, headers, client_ip):
+        index = bisect.bisect(self._points, hash_key(self.key_of(headers, client_ip)))
+        return self._owners[index % len(self._owners)]
+
+
+#: Policies by their ``dist_policy`` name.
+POLICIES = {
+    policy.name: policy
+    for policy in (RoundRobin, WeightedRoundRobin, LeastConnections, StickyCookie, ConsistentHash)
+}
+
+
+def compile_policy(directive, backends, weights=None):
+    """
+    Builds the policy of a host block.
+
+    :param directive (str): value of ``dist_policy``, e.g. "round-robin" or
+                            "consistent-hash cookie session_id vnodes=100".
+    :param backends (list): "host:port" of the backends.
+    :param weights (list, optional): weight of each backend.
+
+    :rtype Policy: the policy.
+
+    :raises ValueError: If the policy is unknown or its arguments are invalid.
+    """
+    words = directive.split()
+    if not words:
+        raise ValueError("Empty dist_policy")
+    name, args = words[0], words[1:]
+    policy = POLICIES.get(name)
+    if policy is None:
+        raise ValueError("Unknown dist_policy {}, expected one of {}".format(
+            name, ", ".join(POLICIES)))
+    options = dict(arg.split("=", 1) for arg in args if "=" in arg)
+    args = [arg for arg in args if "=" not in arg]
+    try:
+        return policy(backends, weights, *args, **options)
+    except TypeError as e:
+        raise ValueError("Invalid arguments of dist_policy {}: {}".format(directive, e))
@@ -0,0 +1,300 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.cache
+~~~~~~~~~~~~~~~~~
+
+This module provides an in-memory cache of static assets.
+
+The :class:`StaticCache <StaticCache>` keeps the content of small files in a
+size-bounded LRU keyed by file path, together with the validators computed
+once per file version: a strong ``ETag`` and the ``Last-Modified`` date.
+Entries are revalidated with one ``stat`` per lookup and reloaded whenever the
+file mtime or size changes. Files larger than ``max_entry_size`` keep only
+their validators and are streamed from disk with sendfile. Compressed
+variants of a cached file are built on first request and dropped with the
+entry, so each file version is compressed once per content coding.
+
+It also evaluates the conditional request headers (``If-None-Match`` and
+``If-Modified-Since``) so unchanged assets are answered with ``304``.
+
+Usage::
+
+  >>> entry = STATIC_CACHE.lookup("www/index.html")
+  >>> if is_not_modified(request.headers, entry):
+  >>>     ...  # 304 Not Modified
+"""
+
+import email.utils
+import hashlib
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+from .compress import compress
+
+#: Total bytes of file content kept in memory.
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+#: Files larger than this are not kept in memory.
+CACHE_MAX_ENTRY_SIZE = 512 * 1024
+
+
+def http_date(timestamp=None):
+    """
+    Formats a POSIX timestamp as an HTTP date (RFC 7231).
+
+    :param timestamp (float, optional): seconds since the epoch, defaults to now.
+
+    :rtype str: e.g. ``Sun, 06 Nov 1994 08:49:37 GMT``.
+    """
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+class CacheEntry:
+    """The :class:`CacheEntry <CacheEntry>` object, one version of a static file.
+
+    :attrs path (str): file path.
+    :attrs size (int): file size in bytes.
+    :attrs mtime_ns (int): modification time in nanoseconds, used for invalidation.
+    :attrs mtime (int): modification time in whole seconds, used for If-Modified-Since.
+    :attrs etag (str): strong entity tag, quoted.
+    :attrs last_modified (str): ``Last-Modified`` header value.
+    :attrs content (bytes): file content, or None when too large to cache.
+    :attrs variants (dict): content coding to compressed content, or to None
+                            when compressing does not make the content smaller.
+    """
+
+    __attrs__ = [
+        "path",
+        "size",
+        "mtime_ns",
+        "mtime",
+        "etag",
+        "last_modified",
+        "content",
+        "variants",
+    ]
+
+    def __init__(self, path, st, content=None):
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.mtime = int(st.st_mtime)
+        self.content = content
+        self.variants = {}
+        self.last_modified = http_date(self.mtime)
+        if content is not None:
+            digest = hashlib.blake2b(content, digest_size=12).hexdigest()
+        else:
+            digest = "{:x}-{:x}-{:x}".format(st.st_ino, st.st_mtime_ns, st.st_size)
+        self.etag = '"{}"'.format(digest)
+
+    def matches(self, st):
+        """Tells whether the entry still describes the file stat result ``st``."""
+        return self.mtime_ns == st.st_mtime_ns and self.size == st.st_size
+
+    def etag_for(self, encoding=None):
+        """
+        Returns the entity tag of one representation. Strong tags must differ
+        between content codings, so the coding is appended to the tag.
+
+        :param encoding (str, optional): content coding, None for identity.
+
+        :rtype str: quoted entity tag.
+        """
+        if encoding is None:
+            return self.etag
+        return '{}-{}"'.format(self.etag[:-1], encoding)
+
+
+def _entry_size(entry):
+    """Bytes an entry holds in memory, its content and compressed variants."""
+    if entry.content is None:
+        return 0
+    return len(entry.content) + sum(len(v) for v in entry.variants.values() if v)
+
+
+class StaticCache:
+    """The :class:`StaticCache <StaticCache>` object, a thread-safe LRU of
+    :class:`CacheEntry <CacheEntry>` bounded by the total content size.
+
+    Attributes:
+        max_bytes (int): Total bytes of content kept in memory.
+        max_entry_size (int): Largest file whose content is kept.
+        entries (OrderedDict): Path to entry, least recently used first.
+        hits (int): Lookups served from memory.
+        misses (int): Lookups that (re)loaded the file.
+    """
+
+    __attrs__ = [
+        "max_bytes",
+        "max_entry_size",
+        "entries",
+        "current_bytes",
+        "hits",
+        "misses",
+    ]
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_entry_size=CACHE_MAX_ENTRY_SIZE):
+        self.max_bytes = max_bytes
+        self.max_entry_size = max_entry_size
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, path):
+        """
+        Returns the current entry of a regular file, loading it on a miss
+        or when the file changed on disk.
+
+        :param path (str): file path.
+
+        :rtype CacheEntry: the entry, or None if there is no such regular file.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry.matches(st):
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        content = None
+        if st.st_size <= self.max_entry_size:
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                    st = os.fstat(f.fileno())
+            except OSError:
+                return None
+            if len(content) != st.st_size:
+                # The file changed while it was read, serve it uncached.
+                content = None
+
+        entry = CacheEntry(path, st, content)
+        self._store(entry)
+        return entry
+
+    def _store(self, entry):
+        with self._lock:
+            old = self.entries.pop(entry.path, None)
+            if old is not None:
+                self.current_bytes -= _entry_size(old)
+            self.entries[entry.path] = entry
+            self.current_bytes += _entry_size(entry)
+            while self.current_bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= _entry_size(evicted)
+
+    def compressed(self, entry, encoding):
+        """
+        Returns the content of a cached entry encoded with a content coding,
+        compressing it on first use. The variant counts towards ``max_bytes``.
+
+        :param entry (CacheEntry): entry with its content in memory.
+        :param encoding (str): ``"gzip"`` or ``"deflate"``.
+
+        :rtype bytes: the encoded content, or None if it is not smaller than
+                      the content itself.
+        """
+        if encoding in entry.variants:
+            return entry.variants[encoding]
+
+        data = compress(entry.content, encoding)
+        if len(data) >= len(entry.content):
+            data = None
+        with self._lock:
+            if encoding not in entry.variants:
+                entry.variants[encoding] = data
+                if data is not None and self.entries.get(entry.path) is entry:
+                    self.current_bytes += len(data)
+        return entry.variants[encoding]
+
+    def invalidate(self, path):
+        """Drops the entry of ``path``, if any."""
+        with self._lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.current_bytes -= _entry_size(old)
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+
+        :rtype dict: entries, cached bytes, hits and misses.
+        """
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def is_not_modified(headers, entry, etag=None):
+    """
+    Evaluates the conditional headers of a GET request against an entry
+    (RFC 7232). ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+
+    :param headers (dict): request headers with lower-case keys.
+    :param entry (CacheEntry): current version of the requested file.
+    :param etag (str, optional): tag of the selected representation,
+                                 defaults to the identity one.
+
+    :rtype bool: True if the client copy is current and a 304 can be sent.
+    """
+    etag = etag or entry.etag
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        return entry.mtime <= since.timestamp()
+    return False
+
+
+#: Process-wide static asset cache used by :class:`Response <Response>`.
+STATIC_CACHE = StaticCache()
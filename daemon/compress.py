@@ -0,0 +1,127 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.compress
+~~~~~~~~~~~~~~~~~
+
+This module provides the content coding negotiation of responses.
+
+:func:`negotiate_encoding` picks ``gzip`` or ``deflate`` from the
+``Accept-Encoding`` request header, :func:`should_compress` applies the size
+threshold and the MIME type allowlist, and :func:`compress` encodes a body
+with the standard library ``gzip`` / ``zlib`` modules.
+
+Static files keep their compressed variants in the
+:class:`StaticCache <StaticCache>`, so they are compressed once per file
+version; rendered pages are compressed per response.
+
+Usage::
+
+  >>> encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+  >>> if encoding and should_compress("text/html", len(body)):
+  >>>     body = compress(body, encoding)
+"""
+
+import gzip
+import zlib
+
+#: Bodies smaller than this are sent uncompressed.
+COMPRESS_MIN_SIZE = 1024
+#: zlib compression level for responses (1 fastest, 9 smallest).
+COMPRESS_LEVEL = 6
+#: MIME types worth compressing. Images, audio, video and archives are
+#: already compressed.
+COMPRESSIBLE_TYPES = frozenset([
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "text/xml",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+])
+#: Supported content codings, in order of preference.
+ENCODINGS = ("gzip", "deflate")
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks the content coding of a response from the ``Accept-Encoding``
+    request header (RFC 7231, section 5.3.4).
+
+    :param accept_encoding (str): header value, or None when absent.
+
+    :rtype str: ``"gzip"``, ``"deflate"``, or None for the identity coding.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def should_compress(content_type, size):
+    """
+    Tells whether a body of the given type and size is worth compressing.
+
+    :param content_type (str): ``Content-Type`` value, parameters are ignored.
+    :param size (int): body size in bytes.
+
+    :rtype bool: True if the body should be compressed.
+    """
+    if size < COMPRESS_MIN_SIZE or not content_type:
+        return False
+    return content_type.split(';', 1)[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+def compress(data, encoding, level=COMPRESS_LEVEL):
+    """
+    Encodes a body with a content coding.
+
+    :param data (bytes): body to encode.
+    :param encoding (str): ``"gzip"`` or ``"deflate"``.
+    :param level (int): zlib compression level.
+
+    :rtype bytes: the encoded body.
+
+    :raises ValueError: If the coding is not supported.
+    """
+    if encoding == "gzip":
+        # A fixed mtime keeps the output, and so the cached variants, stable.
+        return gzip.compress(data, level, mtime=0)
+    if encoding == "deflate":
+        # HTTP "deflate" is the zlib format (RFC 1950), not raw deflate.
+        return zlib.compress(data, level)
+    raise ValueError("Unsupported content coding: {}".format(encoding))
@@ -10,6 +10,7 @@
 # while attending the course
 #
 
+import sys
 from collections.abc import MutableMapping
 
 class CaseInsensitiveDict(MutableMapping):
@@ -49,4 +50,106 @@ class CaseInsensitiveDict(MutableMapping):
         return iter(self.store)
 
     def __len__(self):
-        return len(self.store)
\ No newline at end of file
+        return len(self.store)
+
+_MISSING = object()
+#: Header names seen so far, raw bytes to their lowercased interned key.
+HEADER_NAMES = {}
+#: Maximum number of cached header names, so odd clients can not grow it forever.
+MAX_CACHED_HEADER_NAMES = 1024
+
+
+def header_key(raw_name):
+    """
+    Returns the key of a raw header name: lowercased, decoded and interned,
+    so equal names share one string. Known names are cached.
+
+    :param raw_name (bytes): header name as received, e.g. ``b"Content-Type"``.
+
+    :rtype str: e.g. ``"content-type"``.
+    """
+    key = HEADER_NAMES.get(raw_name)
+    if key is None:
+        key = sys.intern(raw_name.strip().decode('latin-1').lower())
+        if len(HEADER_NAMES) < MAX_CACHED_HEADER_NAMES:
+            HEADER_NAMES[raw_name] = key
+    return key
+
+
+class HeaderMap(MutableMapping):
+    """The :class:`HeaderMap <HeaderMap>` object, the case-insensitive
+    headers of a parsed request.
+
+    Keys are stored lowercased (see :func:`header_key`), so the usual lookups
+    with a lowercase literal, e.g. ``headers.get('content-type')``, hit the
+    dictionary directly; other spellings are lowercased on a miss only.
+    Values arrive as raw bytes and are decoded on first access, so headers
+    the application never reads are never decoded. Values stored by the
+    application (``"query"``, ``"params"``, ...) are kept as they are.
+
+    Usage::
+
+      >>> headers = HeaderMap()
+      >>> headers.add_raw(b"Content-Type", b"text/html")
+      >>> headers['Content-Type']
+      'text/html'
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self, *args, **kwargs):
+        self._items = {}
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def add_raw(self, raw_name, raw_value):
+        """
+        Stores a header as received, the last one of a repeated name wins.
+
+        :param raw_name (bytes): header name.
+        :param raw_value (bytes): header value, without the surrounding spaces.
+        """
+        self._items[header_key(raw_name)] = raw_value
+
+    def _lookup(self, key):
+        items = self._items
+        value = items.get(key, _MISSING)
+        if value is _MISSING:
+            key = key.lower()
+            value = items.get(key, _MISSING)
+        if value.__class__ is bytes:
+            value = items[key] = value.decode('utf-8', 'replace')
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._items or key.lower() in self._items
+
+    def __setitem__(self, key, value):
+        self._items[key.lower()] = value
+
+    def __delitem__(self, key):
+        del self._items[key.lower()]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def raw(self, key, default=None):
+        """Returns a value without decoding it: bytes when it was received
+        and not read yet. ``key`` must be lowercase."""
+        return self._items.get(key, default)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,207 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.headers
+~~~~~~~~~~~~~~~~~
+
+This module provides the serialization of response heads.
+
+- status lines and header names are encoded once and kept as bytes,
+- the ``Date`` value is formatted at most once per second,
+- a head is written into a per-thread :class:`HeaderWriter <HeaderWriter>`
+  whose buffer is reused from one response to the next,
+- :func:`encode_response` prebuilds constant responses (404, 401, ...) as
+  module-level bytes.
+
+Usage::
+
+  >>> writer = header_writer()
+  >>> writer.start(200)
+  >>> writer.header("Content-Type", "text/html")
+  >>> writer.header("Date", current_date())
+  >>> head = writer.finish()
+"""
+
+import threading
+import time
+
+from .cache import http_date
+
+#: Initial size of a head buffer, grown on demand.
+HEAD_BUFFER_SIZE = 1024
+
+#: Reason phrases of the status codes the daemon sends.
+REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    302: "Found",
+    304: "Not Modified",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    416: "Range Not Satisfiable",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+#: Encoded status lines.
+STATUS_LINES = {
+    status: "HTTP/1.1 {} {}\r\n".format(status, reason).encode('ascii')
+    for status, reason in REASONS.items()
+}
+
+CRLF = b"\r\n"
+
+_names = {}
+_date = (0, b"")
+_local = threading.local()
+
+
+def current_date():
+    """
+    Returns the ``Date`` header value of the current second. The value is
+    formatted by the first call in a new second and shared afterwards.
+
+    :rtype bytes: e.g. ``b"Sun, 06 Nov 1994 08:49:37 GMT"``.
+    """
+    global _date
+    now = int(time.time())
+    second, value = _date
+    if second != now:
+        value = http_date(now).encode('ascii')
+        # One tuple assignment, so readers never see a half updated pair.
+        _date = (now, value)
+    return value
+
+
+def status_line(status):
+    """
+    Returns the encoded status line of a status code.
+
+    :param status (int): HTTP status code.
+
+    :rtype bytes: e.g. ``b"HTTP/1.1 200 OK\\r\\n"``.
+    """
+    line = STATUS_LINES.get(status)
+    if line is None:
+        line = "HTTP/1.1 {} {}\r\n".format(status, REASONS.get(status, "Unknown")).encode('ascii')
+    return line
+
+
+def header_name(name):
+    """
+    Returns the encoded ``"Name: "`` prefix of a header line.
+
+    :param name (str): header name.
+
+    :rtype bytes: the prefix, cached per name.
+    """
+    prefix = _names.get(name)
+    if prefix is None:
+        prefix = _names[name] = (name + ": ").encode('ascii')
+    return prefix
+
+
+class HeaderWriter:
+    """The :class:`HeaderWriter <HeaderWriter>` object, which writes a
+    response head into a reusable buffer.
+
+    A writer is not thread-safe; use the one returned by :func:`header_writer`
+    for the current thread.
+
+    :attrs buffer (bytearray): head bytes, valid up to ``length``.
+    :attrs length (int): number of bytes written.
+    """
+
+    __attrs__ = [
+        "buffer",
+        "length",
+    ]
+
+    def __init__(self, size=HEAD_BUFFER_SIZE):
+        self.buffer = bytearray(size)
+        self.length = 0
+
+    def write(self, data):
+        """Appends raw bytes, growing the buffer if needed."""
+        end = self.length + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(max(end - len(self.buffer), len(self.buffer))))
+        self.buffer[self.length:end] = data
+        self.length = end
+
+    def start(self, status):
+        """Resets the buffer and writes the status line."""
+        self.length = 0
+        self.write(status_line(status))
+
+    def header(self, name, value):
+        """
+        Writes one header line.
+
+        :param name (str): header name.
+        :param value (str | bytes | int): header value.
+        """
+        if value.__class__ is not bytes:
+            value = str(value).encode('utf-8')
+        self.write(header_name(name))
+        self.write(value)
+        self.write(CRLF)
+
+    def finish(self, body=b""):
+        """
+        Ends the head, optionally followed by a body.
+
+        :param body (bytes): body appended after the blank line.
+
+        :rtype bytes: the encoded head (and body).
+        """
+        self.write(CRLF)
+        if body:
+            self.write(body)
+        return bytes(memoryview(self.buffer)[:self.length])
+
+
+def header_writer():
+    """
+    Returns the head writer of the calling thread.
+
+    :rtype HeaderWriter: the thread's writer.
+    """
+    writer = getattr(_local, 'writer', None)
+    if writer is None:
+        writer = _local.writer = HeaderWriter()
+    return writer
+
+
+def encode_response(status, headers, body=b""):
+    """
+    Encodes a complete response, e.g. a constant error page built at import.
+
+    :param status (int): HTTP status code.
+    :param headers (list): (name, value) pairs.
+    :param body (bytes): response body.
+
+    :rtype bytes: the encoded response.
+    """
+    writer = HeaderWriter()
+    writer.start(status)
+    for name, value in headers:
+        writer.header(name, value)
+    return writer.finish(body)
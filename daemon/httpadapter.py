@@ -21,8 +21,13 @@ Request and Response objects to handle client-server communication.
 """
 
 from .request import Request
-from .response import Response
+from .response import Response, FileBody, READ_ERRORS
 from .dictionary import CaseInsensitiveDict
+from .reader import HttpParser, RequestError, read_message, MAX_HEADER_SIZE, MAX_BODY_SIZE
+from .logger import get_logger
+from .profiling import PhaseTimer, PROFILER, SETTINGS, add_server_timing, log_timing
+from .limits import ConnectionLimits, DeadlineExceeded, send_nowait
+from . import metrics
 
 # * new lib add
 import hashlib
@@ -30,6 +35,61 @@ import base64
 import struct
 import json
 import threading
+import asyncio
+import inspect
+import socket
+import time
+
+#: Seconds an idle persistent connection is kept open.
+KEEP_ALIVE_TIMEOUT = 5
+#: Maximum number of requests served on one persistent connection.
+MAX_KEEP_ALIVE_REQUESTS = 100
+#: Idle adapters kept by each thread for its next connections.
+FREELIST_SIZE = 16
+#: Seconds a worker waits for the next request of a keep-alive connection
+#: before parking it, so back-to-back requests skip the hand-off.
+KEEP_ALIVE_LINGER = 0.005
+
+log = get_logger("HttpAdapter")
+
+_idle = threading.local()
+
+
+def acquire_adapter(ip, port, conn, connaddr, routes,
+                    keep_alive_timeout=KEEP_ALIVE_TIMEOUT, max_requests=MAX_KEEP_ALIVE_REQUESTS,
+                    limits=None):
+    """
+    Returns an adapter bound to a new connection, taken from the freelist of
+    the calling thread when it has one, so a worker serving connection after
+    connection keeps reusing the same adapter, request and response objects.
+
+    The arguments are those of :class:`HttpAdapter <HttpAdapter>`.
+
+    :rtype HttpAdapter: the bound adapter, given back with :func:`release_adapter`.
+    """
+    adapters = getattr(_idle, "adapters", None)
+    if adapters:
+        adapter = adapters.pop()
+        adapter.bind(ip, port, conn, connaddr, routes, keep_alive_timeout, max_requests, limits)
+        return adapter
+    return HttpAdapter(ip, port, conn, connaddr, routes, keep_alive_timeout, max_requests,
+                       limits=limits)
+
+
+def release_adapter(adapter):
+    """
+    Resets an adapter whose connection is closed and keeps it on the freelist
+    of the calling thread, up to :data:`FREELIST_SIZE` adapters.
+
+    :param adapter (HttpAdapter): adapter returned by :func:`acquire_adapter`.
+    """
+    adapters = getattr(_idle, "adapters", None)
+    if adapters is None:
+        adapters = _idle.adapters = []
+    if len(adapters) < FREELIST_SIZE:
+        adapter.reset()
+        adapters.append(adapter)
+
 
 class HttpAdapter:
     """
@@ -49,9 +109,15 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        keep_alive_timeout (float): Seconds an idle persistent connection is kept.
+        max_requests (int): Maximum requests served on one connection.
+        served (int): Requests served on the current connection.
+        server (str): "ip:port" of the daemon, the ``server`` label of its metrics.
+        timer (PhaseTimer): Phase timings of the current request.
+        limits (ConnectionLimits): Read and write deadlines of the daemon.
     """
 
-    __attrs__ = [
+    __slots__ = (
         "ip",
         "port",
         "conn",
@@ -59,9 +125,19 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
-    ]
+        "keep_alive",
+        "keep_alive_timeout",
+        "max_requests",
+        "served",
+        "parser",
+        "server",
+        "timer",
+        "limits",
+    )
 
-    def __init__(self, ip, port, conn, connaddr, routes):
+    def __init__(self, ip, port, conn, connaddr, routes,
+                 keep_alive_timeout=KEEP_ALIVE_TIMEOUT, max_requests=MAX_KEEP_ALIVE_REQUESTS,
+                 max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE, limits=None):
         """
         Initialize a new HttpAdapter instance.
 
@@ -70,6 +146,13 @@ class HttpAdapter:
         :param conn (socket): Active socket connection.
         :param connaddr (tuple): Address of the connected client.
         :param routes (dict): Mapping of route paths to handler functions.
+        :param keep_alive_timeout (float): Idle timeout of a persistent connection.
+        :param max_requests (int): Maximum requests served on one connection.
+        :param max_header_size (int): Maximum size of a request head.
+        :param max_body_size (int): Maximum size of a request body.
+        :param limits (ConnectionLimits, optional): Deadlines shared by the daemon;
+                                                    defaults to the standard ones with
+                                                    ``keep_alive_timeout`` as idle timeout.
         """
 
         #: IP address.
@@ -86,72 +169,405 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
+        #: Whether the connection may stay open after the current request
+        self.keep_alive = True
+        #: Idle timeout of a persistent connection
+        self.keep_alive_timeout = keep_alive_timeout
+        #: Maximum requests per connection
+        self.max_requests = max_requests
+        #: Requests served on the connection
+        self.served = 0
+        #: Buffered reader, keeps bytes past the current request (pipelining)
+        self.parser = HttpParser(max_header_size, max_body_size)
+        #: Metrics label of the daemon
+        self.server = "{}:{}".format(ip, port)
+        #: Phase timings of the current request
+        self.timer = PhaseTimer()
+        #: Read and write deadlines
+        self.limits = limits or ConnectionLimits(self.server, idle_timeout=keep_alive_timeout)
+
+    def bind(self, ip, port, conn, connaddr, routes,
+             keep_alive_timeout=KEEP_ALIVE_TIMEOUT, max_requests=MAX_KEEP_ALIVE_REQUESTS,
+             limits=None):
+        """
+        Attach an idle adapter, see :meth:`reset`, to a new connection. The
+        request, response, parser and timer objects are kept.
+
+        :param ip (str): IP address of the server.
+        :param port (int): Port number of the server.
+        :param conn (socket): Active socket connection.
+        :param connaddr (tuple): Address of the connected client.
+        :param routes (dict): Mapping of route paths to handler functions.
+        :param keep_alive_timeout (float): Idle timeout of a persistent connection.
+        :param max_requests (int): Maximum requests served on one connection.
+        :param limits (ConnectionLimits, optional): Deadlines shared by the daemon.
+        """
+        if ip != self.ip or port != self.port:
+            self.ip = ip
+            self.port = port
+            self.server = "{}:{}".format(ip, port)
+        self.conn = conn
+        self.connaddr = connaddr
+        self.routes = routes
+        self.keep_alive = True
+        self.max_requests = max_requests
+        self.served = 0
+        if limits is not None:
+            self.limits = limits
+        elif (keep_alive_timeout != self.keep_alive_timeout
+              or self.limits.server != self.server):
+            self.limits = ConnectionLimits(self.server, idle_timeout=keep_alive_timeout)
+        self.keep_alive_timeout = keep_alive_timeout
+
+    def reset(self):
+        """
+        Detach the adapter from its connection: drop the connection, the
+        buffered bytes and the state of the last request, so the adapter
+        can be kept on a freelist and bound to the next connection.
+        """
+        self.conn = None
+        self.connaddr = None
+        self.routes = None
+        self.parser.reset()
+        self.request.reset()
+        self.response.reset()
 
-    def handle_client(self, conn, addr, routes):
+    def handle_client(self, conn, addr, routes, park=False):
         """
         Handle an incoming client connection.
 
-        This method reads the request from the socket, prepares the request object,
-        invokes the appropriate route handler if available, builds the response,
-        and sends it back to the client.
+        This method reads the requests from the socket one after another,
+        prepares the request object, invokes the appropriate route handler if
+        available, builds the response, and sends it back to the client.
+
+        The connection is kept open between requests (HTTP/1.1 keep-alive)
+        until the client asks to close it, stays idle for ``keep_alive_timeout``
+        seconds, or reaches ``max_requests``. Pipelined requests are answered
+        in order since leftover bytes are kept for the next read.
+
+        Reads and writes run within the deadlines of :attr:`limits`. A client
+        too slow to send its request gets a 408, and every connection closed
+        on a deadline is counted by reason (see :mod:`daemon.limits`).
+
+        Each request is timed phase by phase (see :mod:`daemon.profiling`),
+        and one request out of ``PROFILER.sample`` is profiled.
+
+        With ``park``, the method returns instead of waiting for the next
+        request of an idle persistent connection, leaving it open. The caller
+        watches the socket (see :mod:`daemon.idle`) and calls this method
+        again once it is readable; :attr:`served` carries over.
 
         :param conn (socket): The client socket connection.
         :param addr (tuple): The client's address.
         :param routes (dict): The route mapping for dispatching requests.
+        :param park (bool): Return on an idle connection rather than wait.
+
+        :rtype bool: True if the connection was left open and idle.
         """
 
         # Connection handler.
         self.conn = conn        
         # Connection address.
         self.connaddr = addr
-        # Request handler
+
+        limits = self.limits
+        parked = False
+        try:
+            while True:
+                # Handle the request
+                try:
+                    message = read_message(conn, self.parser, limits)
+                except RequestError as e:
+                    log.warning("Rejecting request from %s: %s", addr, e)
+                    conn.settimeout(limits.write_timeout)
+                    conn.sendall(self.response.build_error(e.status, e.reason))
+                    metrics.REQUESTS.inc((self.server, "-", "-", e.status))
+                    break
+                if message is None:
+                    break
+
+                self.served += 1
+                self.keep_alive = self.served < self.max_requests
+                head, body = message
+                profile = PROFILER.start()
+                try:
+                    try:
+                        response = self.handle_request(head, routes, body)
+                    except Exception:
+                        # Nothing was sent yet, the client still gets an answer.
+                        log.exception("Error serving %s", addr)
+                        response = self.response.build_internal_error()
+
+                    conn.settimeout(limits.write_timeout)
+                    status, sent = self.send_response(conn, self.annotate(response))
+                finally:
+                    if profile is not None:
+                        PROFILER.stop(profile)
+                self.observe(self.timer.started, len(head) + len(body), status, sent)
+                if not self.response.keep_alive:
+                    break
+                if park and not self.parser.pending and not self.next_request_ready(conn):
+                    parked = True
+                    break
+        except DeadlineExceeded as e:
+            limits.closed(e.reason)
+            if e.reason != "idle_timeout":
+                log.warning("Closing %s: %s", addr, e.reason)
+                send_nowait(conn, READ_ERRORS[408])
+        except socket.timeout:
+            # Only the writes are left with a timeout that is not a deadline
+            limits.closed("write_timeout")
+            log.warning("Closing %s: write_timeout", addr)
+        except OSError as e:
+            log.warning("Connection error from %s: %s", addr, e)
+        finally:
+            if not parked:
+                conn.close()
+        return parked
+
+    def next_request_ready(self, conn):
+        """
+        Waits up to :data:`KEEP_ALIVE_LINGER` seconds for the next request
+        (or the end) of a keep-alive connection, without consuming it.
+
+        :param conn (socket): The client socket connection.
+
+        :rtype bool: False if the connection stayed idle.
+        """
+        conn.settimeout(KEEP_ALIVE_LINGER)
+        try:
+            conn.recv(1, socket.MSG_PEEK)
+        except socket.timeout:
+            return False
+        return True
+
+    def send_response(self, conn, response):
+        """
+        Write a response built by :meth:`build_reply` to the socket.
+
+        A streamed response is an iterable of encoded pieces; each piece is
+        sent as soon as it is produced. :class:`FileBody <FileBody>` pieces are
+        sent with ``sendfile`` (zero-copy). If the producer fails half-way the
+        body can not be completed, so the connection is marked for closing.
+
+        :param conn (socket): The client socket connection.
+        :param response (bytes | iterable): The encoded response.
+
+        :rtype tuple: (status, sent) the status code and the number of bytes sent.
+        """
+        if isinstance(response, (bytes, bytearray)):
+            conn.sendall(response)
+            return metrics.status_of(response), len(response)
+
+        status = sent = 0
+        try:
+            for piece in response:
+                if isinstance(piece, FileBody):
+                    sent += piece.sendto(conn)
+                else:
+                    if not sent:
+                        status = metrics.status_of(piece)
+                    conn.sendall(piece)
+                    sent += len(piece)
+        except OSError:
+            raise
+        except Exception as e:
+            log.warning("Stream aborted for %s: %s", self.connaddr, e)
+            self.response.keep_alive = False
+        finally:
+            close = getattr(response, 'close', None)
+            if close:
+                close()
+        return status, sent
+
+    def annotate(self, response):
+        """
+        Add the ``Server-Timing`` header of the phases timed so far to a
+        response built by :meth:`build_reply`, unless it is switched off.
+
+        :param response (bytes | iterable): The encoded response.
+
+        :rtype bytes | iterable: The response to send.
+        """
+        if SETTINGS.server_timing:
+            return add_server_timing(response, self.timer)
+        return response
+
+    def observe(self, started, received, status, sent):
+        """
+        Record the request just answered in :mod:`daemon.metrics` and log
+        its phase timings, ending with the ``send`` phase.
+
+        :param started (float): ``time.perf_counter()`` when the request was parsed.
+        :param received (int): Size of the request.
+        :param status (int): Status code of the response.
+        :param sent (int): Number of response bytes sent.
+        """
+        self.timer.mark("send")
+        req = self.request
+        if req.hook is not None:
+            route = req.hook._route_path
+        else:
+            route = "static" if req.method else "-"
+        metrics.observe_request(self.server, route, req.method or "-", status,
+                                time.perf_counter() - started, received, sent)
+        log_timing(self.timer, req.method, req.path, status)
+
+    def prepare_request(self, head, routes, body=b""):
+        """
+        Reset the reused request/response pair and prepare the new request.
+
+        :param head (bytes): The request line and headers.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param body (bytes): The request body, already framed by the parser.
+
+        :rtype Request: The prepared request.
+        """
         req = self.request
-        # Response handler
         resp = self.response
+        req.reset()
+        resp.reset()
 
-        # Handle the request
-        msg = conn.recv(8192).decode()
-        req.prepare(msg, routes)
+        req.prepare(head, routes, body=body, headers=self.parser.headers)
+        resp.keep_alive = (self.keep_alive and req.method is not None
+                           and req.wants_keep_alive())
+        return req
 
-        # Handle request hook
+    def handle_request(self, head, routes, body=b""):
+        """
+        Turn one HTTP request into the encoded HTTP response.
+
+        The socket I/O is left to the caller so that both the threaded backend
+        and the event-loop engine share the same dispatching logic.
+
+        :param head (bytes): The request line and headers.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param body (bytes): The request body, already framed by the parser.
+
+        :rtype bytes: The encoded HTTP response.
+        """
+        timer = self.timer
+        timer.start()
+        req = self.prepare_request(head, routes, body)
+        timer.mark("parse")
+
+        hook_result = None
         if req.hook:
-            print("[HttpAdapter] hook in route-path METHOD {} PATH {}".format(req.hook._route_path,req.hook._route_methods))
-            hook_result = req.hook(headers=req.headers, body=req.body)
-            #
-            # TODO: handle for App hook here
-            #
-            if hook_result["auth"] == "false":
-                response = resp.build_unauthorized()
-                conn.sendall(response)
-                conn.close()
-                return
+            hook_result = self.call_hook(req)
+            timer.mark("hook")
+
+        response = self.build_reply(req, hook_result)
+        timer.mark("render")
+        return response
+
+    def hook_kwargs(self, req):
+        """
+        Build the keyword arguments of the route hook: ``headers`` and ``body``,
+        plus ``request`` for hooks declaring that parameter.
+
+        :param req (Request): The prepared request.
+
+        :rtype dict: The hook keyword arguments.
+        """
+        kwargs = {"headers": req.headers, "body": req.body}
+        if getattr(req.hook, '_accepts_request', False):
+            kwargs["request"] = req
+        return kwargs
+
+    def call_hook(self, req):
+        """
+        Invoke the route hook matched by the request.
+
+        Coroutine hooks are driven to completion so they can also be served by
+        the threaded backend.
+
+        :param req (Request): The prepared request.
+
+        :rtype dict: The hook result.
+        """
+        log.debug("hook in route-path METHOD %s PATH %s", req.hook._route_path, req.hook._route_methods)
+        started = time.perf_counter()
+        hook_result = req.hook(**self.hook_kwargs(req))
+        if inspect.iscoroutine(hook_result):
+            hook_result = asyncio.run(hook_result)
+        metrics.HOOK_LATENCY.observe((req.hook._route_path,), time.perf_counter() - started)
+        return hook_result
+
+    def build_reply(self, req, hook_result=None):
+        """
+        Build the HTTP response for a prepared request and its hook result.
+
+        The hook result dictates the response. It can specify:
+            - ``"auth": "false"``: a 401 Unauthorized response.
+            - ``"redirect": "/path"``: a 302 Redirect response.
+            - ``"temp_redirect": "http://..."``: a POST redirect page.
+            - ``"content": "file.html"``: a file, optionally filled
+              with the ``"placeholder"`` values, HTML-escaped when
+              ``"escape"`` is true.
+            - ``"stream": iterable``: a chunked response streamed from an
+              iterable of chunks or a file-like object, typed by the optional
+              ``"content_type"`` key.
+            - ``"json": value``: an ``application/json`` response of the value,
+              with the optional ``"status"`` code (200 by default).
+            - ``"body": bytes``: a response of the given body, typed by the
+              optional ``"content_type"`` key and with the optional ``"status"``.
+
+        A hook may also return the iterable (e.g. a generator) or the
+        file-like object itself instead of a dictionary.
+
+        :param req (Request): The prepared request.
+        :param hook_result (dict): The value returned by the route hook, if any.
+
+        :rtype bytes | iterable: The encoded HTTP response, or its encoded
+                                 pieces for a streamed response.
+        """
+        resp = self.response
+
+        if req.method is None:
+            return resp.build_bad_request()
+
+        if req.hook is None and req.allowed:
+            return resp.build_method_not_allowed(req.allowed)
+
+        if hook_result is not None and not isinstance(hook_result, dict):
+            return resp.build_stream(req, hook_result)
+
+        # Handle request hook
+        if hook_result is not None:
+            if hook_result.get("auth") == "false":
+                return resp.build_unauthorized()
+
+            if "json" in hook_result:
+                return resp.build_json(req, hook_result["json"], hook_result.get("status", 200))
+
+            if "body" in hook_result:
+                content_type = hook_result.get("content_type", "text/plain; charset=utf-8")
+                return resp.build_body(req, hook_result["body"], content_type,
+                                       hook_result.get("status", 200))
             
+            stream = hook_result.get("stream", None)
+            if stream is not None:
+                content_type = hook_result.get("content_type", "application/octet-stream")
+                return resp.build_stream(req, stream, content_type)
+
             new_session_id = hook_result.get("session_id", None)
             
             redirect = hook_result.get("redirect", None)
             if redirect:
-                response = resp.build_redirect(redirect, req, new_session_id)
-                conn.sendall(response)
-                conn.close()
-                return
+                return resp.build_redirect(redirect, req, new_session_id)
             
             temp_redirect = hook_result.get("temp_redirect", None)
             temp_body = hook_result.get("temp_body", "")
             if temp_redirect:
-                print(f"\n\n{temp_redirect}\n\n{temp_body}\n\n")
-                response = resp.build_post_redirect_page(temp_redirect, temp_body)
-                conn.sendall(response)
-                conn.close()
-                return
+                log.debug("temporary redirect to %s: %s", temp_redirect, temp_body)
+                return resp.build_post_redirect_page(temp_redirect, temp_body)
 
 
             content = hook_result.get("content", None)
             placeholder = hook_result.get("placeholder", None)
             if placeholder:
-                response = resp.build_content_placeholder(req, content, placeholder)
-                conn.sendall(response)
-                conn.close()
-                return
+                escape = hook_result.get("escape", False)
+                return resp.build_content_placeholder(req, content, placeholder, escape)
 
 
             if content:
@@ -159,10 +575,4 @@ class HttpAdapter:
             
 
         # Build response
-        response = resp.build_response(req)
-
-        #print(response)
-        conn.sendall(response)
-        conn.close()
-
-    
+        return resp.build_response(req)
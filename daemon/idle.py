@@ -0,0 +1,150 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.idle
+~~~~~~~~~~~~~~~~~
+
+This module watches the idle keep-alive connections of the threaded backend.
+
+Once a worker has answered a request on a persistent connection and no byte
+of the next one is buffered, it parks the socket in :class:`IdleConnections
+<IdleConnections>` and goes back to the pool instead of blocking in ``recv``.
+One selector thread watches every parked socket: a socket that becomes
+readable is handed back to the pool, one that stays idle for
+``idle_timeout`` seconds is expired. Idle clients, such as pages polling the
+backend or the upstream connections pooled by the proxy, then hold no worker.
+
+Usage::
+
+  >>> idle = IdleConnections(resume, expire, idle_timeout=5, name="Backend-9000")
+  >>> idle.start()
+  >>> idle.park(conn, task)  # resume(task) or expire(task) is called later
+"""
+
+import collections
+import selectors
+import socket
+import threading
+import time
+
+from .logger import get_logger
+
+log = get_logger("IdleConnections")
+
+
+class IdleConnections:
+    """The :class:`IdleConnections <IdleConnections>` object, which waits on
+    parked connections from a single thread.
+
+    Connections are expired in the order they were parked, since they share
+    the same idle timeout.
+
+    :attrs resume (callable): called with the task of a socket that became readable.
+    :attrs expire (callable): called with the task of a socket idle for too long,
+                              which is already unregistered and must be closed.
+    :attrs idle_timeout (float): seconds a socket may stay parked, None for no limit.
+    :attrs name (str): prefix of the thread name.
+    """
+
+    def __init__(self, resume, expire, idle_timeout=None, name="Idle"):
+        self.resume = resume
+        self.expire = expire
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self._selector = selectors.DefaultSelector()
+        # fd -> (deadline, conn, task), in parking order.
+        self._parked = collections.OrderedDict()
+        # Sockets parked by the workers, registered by the selector thread.
+        self._incoming = collections.deque()
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._waker.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._thread = None
+
+    def start(self):
+        """Spawns the selector thread."""
+        self._thread = threading.Thread(target=self._run, name="{}-idle".format(self.name),
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def park(self, conn, task):
+        """
+        Watches an idle connection. Safe to call from any thread.
+
+        :param conn (socket.socket): connection waiting for its next request.
+        :param task (tuple): passed back to :attr:`resume` or :attr:`expire`.
+        """
+        deadline = None
+        if self.idle_timeout is not None:
+            deadline = time.monotonic() + self.idle_timeout
+        self._incoming.append((deadline, conn, task))
+        try:
+            self._waker.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            # The wakeup buffer is full, the selector thread is awake anyway.
+            pass
+
+    @property
+    def parked(self):
+        """Number of connections currently parked."""
+        return len(self._parked) + len(self._incoming)
+
+    def _run(self):
+        while True:
+            timeout = self._expire_idle()
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup:
+                    self._register_incoming()
+                    continue
+                self._parked.pop(key.fd, None)
+                self._selector.unregister(key.fileobj)
+                self._call(self.resume, key.data)
+
+    def _register_incoming(self):
+        try:
+            while self._wakeup.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._incoming:
+            deadline, conn, task = self._incoming.popleft()
+            try:
+                self._selector.register(conn, selectors.EVENT_READ, task)
+            except (ValueError, OSError):
+                # Closed in the meantime.
+                self._call(self.expire, task)
+                continue
+            self._parked[conn.fileno()] = (deadline, conn, task)
+
+    def _expire_idle(self):
+        """Expires the connections past their deadline and returns the
+        seconds until the next one, None if there is none."""
+        now = time.monotonic()
+        while self._parked:
+            fd, (deadline, conn, task) = next(iter(self._parked.items()))
+            if deadline is None:
+                return None
+            if deadline > now:
+                return deadline - now
+            del self._parked[fd]
+            self._selector.unregister(conn)
+            self._call(self.expire, task)
+        return None
+
+    def _call(self, callback, task):
+        try:
+            callback(task)
+        except Exception:
+            log.exception("%s idle connection callback failed", self.name)
@@ -0,0 +1,116 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.jsoncodec
+~~~~~~~~~~~~~~~~~
+
+This module provides the JSON codec used for request bodies
+(:attr:`Request.json`) and ``"json"`` hook results.
+
+The codec is pluggable: it defaults to ``orjson`` when that package is
+installed, and to the standard library ``json`` module otherwise. Another
+implementation can be installed with :func:`set_codec`.
+
+Requirements:
+--------------
+- orjson (optional): faster encoder and decoder working on bytes.
+
+Usage::
+
+  >>> set_codec(JsonCodec("json", json.loads, stdlib_dumps))
+  >>> dumps({"id": 1})
+  b'{"id":1}'
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib_dumps(obj):
+    """
+    Serializes an object to compact UTF-8 JSON with the standard library.
+
+    :param obj: JSON-serializable object.
+
+    :rtype bytes: the encoded document.
+    """
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+
+class JsonCodec:
+    """The :class:`JsonCodec <JsonCodec>` object, a pair of JSON functions.
+
+    :attrs name (str): codec name, for logging.
+    :attrs loads (callable): parses ``bytes`` or ``str``, raises ``ValueError`` on invalid input.
+    :attrs dumps (callable): serializes an object straight to ``bytes``.
+    """
+
+    __attrs__ = [
+        "name",
+        "loads",
+        "dumps",
+    ]
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+
+#: Standard library codec, always available.
+STDLIB_CODEC = JsonCodec("json", json.loads, stdlib_dumps)
+#: orjson codec, or None when the package is not installed.
+ORJSON_CODEC = JsonCodec("orjson", orjson.loads, orjson.dumps) if orjson is not None else None
+
+_codec = ORJSON_CODEC or STDLIB_CODEC
+
+
+def get_codec():
+    """Returns the codec in use."""
+    return _codec
+
+
+def set_codec(codec):
+    """
+    Installs the codec used by :func:`loads` and :func:`dumps`.
+
+    :param codec (JsonCodec): the codec, e.g. :data:`STDLIB_CODEC`.
+    """
+    global _codec
+    _codec = codec
+
+
+def loads(data):
+    """
+    Parses a JSON document with the installed codec.
+
+    :param data (bytes | str): the document.
+
+    :raises ValueError: If the document is not valid JSON.
+    """
+    return _codec.loads(data)
+
+
+def dumps(obj):
+    """
+    Serializes an object with the installed codec.
+
+    :param obj: JSON-serializable object.
+
+    :rtype bytes: the encoded document.
+    """
+    return _codec.dumps(obj)
@@ -0,0 +1,180 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.limits
+~~~~~~~~~~~~~~~~~
+
+This module protects the daemons from slow and greedy clients.
+
+A :class:`ConnectionLimits <ConnectionLimits>` object holds the deadlines of
+one listening daemon and the number of connections each client IP has open:
+
+- ``idle_timeout``: seconds a connection may wait for the first byte of its
+  next request (the keep-alive timeout),
+- ``header_timeout``: seconds from the first byte of a request to the end of
+  its head, so a client trickling header bytes can not hold a worker,
+- ``body_timeout``: seconds from the end of the head to the end of the body,
+- ``write_timeout``: seconds one response write may take when the client
+  does not read,
+- ``max_connections_per_ip``: connections one client IP may have open at
+  once, 0 for no limit.
+
+Deadlines are totals, not per ``recv`` timeouts: each read is given the time
+left. A connection missing one is closed, with a 408 when a request was
+partly received, and counted in ``weaprous_connections_closed_total`` by
+reason (see :data:`CLOSE_REASONS`).
+
+Usage::
+
+  >>> limits = ConnectionLimits("127.0.0.1:9000", header_timeout=5, max_connections_per_ip=32)
+  >>> if not limits.admit(addr[0]):
+  >>>     reject(conn)
+  >>> message = read_message(conn, parser, limits)
+  >>> limits.release(addr[0])
+"""
+
+import threading
+
+from . import metrics
+
+#: Seconds to receive the head of a request once its first byte arrived.
+HEADER_TIMEOUT = 10
+#: Seconds to receive the body of a request once its head arrived.
+BODY_TIMEOUT = 30
+#: Seconds one response write may block.
+WRITE_TIMEOUT = 30
+#: Seconds a connection may wait for the first byte of a request.
+IDLE_TIMEOUT = 5
+#: Connections one client IP may have open at once, 0 for no limit. There is
+#: no limit by default since a backend behind the proxy sees one client IP.
+MAX_CONNECTIONS_PER_IP = 0
+
+#: Reasons counted by ``weaprous_connections_closed_total``.
+CLOSE_REASONS = (
+    "idle_timeout",
+    "header_timeout",
+    "body_timeout",
+    "write_timeout",
+    "ip_limit",
+)
+
+CLOSED_CONNECTIONS = metrics.REGISTRY.register(metrics.Counter(
+    "weaprous_connections_closed_total",
+    "Connections closed early by the daemon, by reason.",
+    ("server", "reason")))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a connection misses one of its deadlines. ``reason`` is
+    one of :data:`CLOSE_REASONS`."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConnectionLimits:
+    """The :class:`ConnectionLimits <ConnectionLimits>` object, the deadlines
+    and per-IP connection cap of one daemon.
+
+    :attrs server (str): "ip:port" of the daemon, the ``server`` label of its metrics.
+    :attrs idle_timeout (float): wait for the first byte of a request.
+    :attrs header_timeout (float): time to receive a request head.
+    :attrs body_timeout (float): time to receive a request body.
+    :attrs write_timeout (float): time one response write may take.
+    :attrs max_connections_per_ip (int): open connections per client IP, 0 for no limit.
+    """
+
+    __attrs__ = [
+        "server",
+        "idle_timeout",
+        "header_timeout",
+        "body_timeout",
+        "write_timeout",
+        "max_connections_per_ip",
+    ]
+
+    def __init__(self, server, idle_timeout=IDLE_TIMEOUT, header_timeout=HEADER_TIMEOUT,
+                 body_timeout=BODY_TIMEOUT, write_timeout=WRITE_TIMEOUT,
+                 max_connections_per_ip=MAX_CONNECTIONS_PER_IP):
+        self.server = server
+        self.idle_timeout = idle_timeout
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.write_timeout = write_timeout
+        self.max_connections_per_ip = max_connections_per_ip
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def admit(self, ip):
+        """
+        Counts a new connection of a client, unless it already has
+        ``max_connections_per_ip`` open; the refusal is counted as ``ip_limit``.
+
+        :param ip (str): client IP address.
+
+        :rtype bool: True if the connection may be served, then :meth:`release`
+                     must be called when it closes.
+        """
+        limit = self.max_connections_per_ip
+        with self._lock:
+            count = self._open.get(ip, 0)
+            if limit and count >= limit:
+                admitted = False
+            else:
+                self._open[ip] = count + 1
+                admitted = True
+        if not admitted:
+            self.closed("ip_limit")
+        return admitted
+
+    def release(self, ip):
+        """
+        Forgets a connection counted by :meth:`admit`.
+
+        :param ip (str): client IP address.
+        """
+        with self._lock:
+            count = self._open.get(ip, 0) - 1
+            if count > 0:
+                self._open[ip] = count
+            else:
+                self._open.pop(ip, None)
+
+    def connections(self, ip):
+        """Number of connections a client IP has open."""
+        return self._open.get(ip, 0)
+
+    def closed(self, reason):
+        """
+        Counts a connection closed early.
+
+        :param reason (str): one of :data:`CLOSE_REASONS`.
+        """
+        CLOSED_CONNECTIONS.inc((self.server, reason))
+
+
+def send_nowait(conn, data):
+    """
+    Writes a short answer without blocking, before closing a connection that
+    missed a deadline or was refused. Whatever the socket buffer can not take
+    is dropped.
+
+    :param conn (socket.socket): client connection.
+    :param data (bytes): prebuilt response.
+    """
+    try:
+        conn.setblocking(False)
+        conn.send(data)
+    except OSError:
+        pass
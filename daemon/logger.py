@@ -0,0 +1,297 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.logger
+~~~~~~~~~~~~~~~~~
+
+This module provides the asynchronous logging of the daemons.
+
+Components log through standard :mod:`logging` loggers named after them
+(``get_logger("Backend")``). Records below the configured level cost one
+level check. Enabled records are put on a bounded queue without blocking
+and written to stdout by a background :class:`LogWriter <LogWriter>` thread,
+so request threads never wait on the terminal. When the queue is full the
+record is dropped and counted; the writer reports the dropped count.
+
+Records below WARNING can also be sampled: with a sample rate of N only one
+record out of N is kept per component.
+
+Configuration:
+--------------
+- ``WEAPROUS_LOG_LEVEL``: DEBUG, INFO (default), WARNING or ERROR.
+- ``WEAPROUS_LOG_SAMPLE``: keep 1 out of N records below WARNING (default 1).
+- :func:`configure_logging` sets both at runtime.
+
+Usage::
+
+  >>> log = get_logger("Backend")
+  >>> log.info("Listening on port %s", port)
+  >>> log.debug("route settings %s", routes)   # formatted on the writer thread
+  >>> log_stats()
+  {'queued': 0, 'written': 12, 'dropped': 0, 'sampled_out': 0, ...}
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+
+#: Name of the parent logger of every component.
+ROOT_LOGGER = "weaprous"
+#: Maximum number of records waiting for the writer thread.
+LOG_QUEUE_SIZE = 10000
+#: Default level, overridden by the ``WEAPROUS_LOG_LEVEL`` environment variable.
+DEFAULT_LOG_LEVEL = "INFO"
+#: Line layout of the written records.
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(component)s] %(message)s"
+
+_STOP = object()
+
+
+class ComponentFormatter(logging.Formatter):
+    """Formatter exposing the component name (the last part of the logger
+    name) as ``%(component)s``, like the ``[Backend]`` prefixes of the daemons."""
+
+    def format(self, record):
+        record.component = record.name.rsplit('.', 1)[-1]
+        return super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one record out of ``rate`` below WARNING, per component.
+
+    :attrs rate (int): sampling rate, 1 keeps every record.
+    :attrs sampled_out (int): number of records discarded by sampling.
+    """
+
+    __attrs__ = [
+        "rate",
+        "sampled_out",
+    ]
+
+    def __init__(self, rate=1):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self.sampled_out = 0
+        self._counters = {}
+
+    def filter(self, record):
+        if self.rate == 1 or record.levelno >= logging.WARNING:
+            return True
+        # Racy increments only blur the sampling, records are never corrupted.
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        if count % self.rate == 0:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class QueueingHandler(logging.Handler):
+    """Handler putting records on a bounded queue without blocking.
+
+    Unlike :class:`logging.handlers.QueueHandler` the message is not formatted
+    here: the writer thread merges the arguments, so the calling thread only
+    pays for the record creation.
+
+    :attrs records (queue.Queue): records waiting for the writer.
+    :attrs dropped (int): number of records dropped because the queue was full.
+    """
+
+    __attrs__ = [
+        "records",
+        "dropped",
+    ]
+
+    def __init__(self, records):
+        super().__init__()
+        self.records = records
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def handle(self, record):
+        # Skip the handler lock of logging.Handler, put_nowait is thread-safe.
+        if self.filter(record):
+            self.emit(record)
+        return True
+
+
+class LogWriter:
+    """The :class:`LogWriter <LogWriter>` object, the background thread that
+    formats and writes the queued records.
+
+    :attrs records (queue.Queue): records to write.
+    :attrs handler (QueueingHandler): producer side, for the dropped counter.
+    :attrs output (logging.Handler): handler doing the actual write.
+    :attrs written (int): number of records written.
+    """
+
+    __attrs__ = [
+        "records",
+        "handler",
+        "output",
+        "written",
+    ]
+
+    def __init__(self, records, handler, output):
+        self.records = records
+        self.handler = handler
+        self.output = output
+        self.written = 0
+        self._reported = 0
+        self._thread = None
+
+    def start(self):
+        """Spawns the writer thread."""
+        self._thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Writes the pending records and stops the thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self.records.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            record = self.records.get()
+            if record is _STOP:
+                self._report_drops()
+                return
+            try:
+                self.output.handle(record)
+            except Exception:
+                pass
+            self.written += 1
+            if self.records.empty():
+                self._report_drops()
+
+    def _report_drops(self):
+        dropped = self.handler.dropped
+        if dropped != self._reported:
+            record = logging.LogRecord(
+                ROOT_LOGGER + ".Log", logging.WARNING, __file__, 0,
+                "Log queue full, dropped %d records (%d in total)",
+                (dropped - self._reported, dropped), None)
+            self._reported = dropped
+            self.output.handle(record)
+
+
+_lock = threading.Lock()
+_root = logging.getLogger(ROOT_LOGGER)
+_root.propagate = False
+_handler = None
+_sampler = None
+_writer = None
+
+
+def configure_logging(level=None, sample_rate=None, stream=None, queue_size=LOG_QUEUE_SIZE):
+    """
+    Sets up the queue, the writer thread and the level of every component
+    logger. Called implicitly by the first :func:`get_logger`; calling it
+    again changes the level and the sample rate.
+
+    :param level (str | int, optional): minimum level, defaults to ``WEAPROUS_LOG_LEVEL`` or INFO.
+    :param sample_rate (int, optional): keep 1 out of N records below WARNING,
+                                        defaults to ``WEAPROUS_LOG_SAMPLE`` or 1.
+    :param stream (file, optional): destination of the records, defaults to stdout.
+    :param queue_size (int): maximum number of records waiting for the writer.
+    """
+    global _handler, _sampler, _writer
+    with _lock:
+        if level is None:
+            level = os.environ.get("WEAPROUS_LOG_LEVEL", DEFAULT_LOG_LEVEL)
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+            if not isinstance(level, int):
+                level = logging.INFO
+        if sample_rate is None:
+            sample_rate = int(os.environ.get("WEAPROUS_LOG_SAMPLE", "1") or 1)
+        _root.setLevel(level)
+
+        if _handler is None:
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(ComponentFormatter(LOG_FORMAT))
+            _sampler = SamplingFilter(sample_rate)
+            _handler = QueueingHandler(queue.Queue(maxsize=queue_size))
+            _handler.addFilter(_sampler)
+            _root.addHandler(_handler)
+            _writer = LogWriter(_handler.records, _handler, output).start()
+            atexit.register(_writer_stop)
+        else:
+            _sampler.rate = max(1, int(sample_rate))
+            if stream is not None:
+                _writer.output.setStream(stream)
+
+
+def _writer_stop():
+    if _writer is not None:
+        _writer.stop()
+
+
+def get_logger(component):
+    """
+    Returns the logger of a component, e.g. ``get_logger("Proxy")``.
+
+    :param component (str): component name, shown between brackets in the output.
+
+    :rtype logging.Logger: the component logger.
+    """
+    if _handler is None:
+        configure_logging()
+    return logging.getLogger("{}.{}".format(ROOT_LOGGER, component))
+
+
+def log_stats():
+    """
+    Snapshot of the logging counters.
+
+    :rtype dict: queued, written, dropped and sampled out records, and the level.
+    """
+    if _handler is None:
+        return {}
+    return {
+        "queued": _handler.records.qsize(),
+        "written": _writer.written,
+        "dropped": _handler.dropped,
+        "sampled_out": _sampler.sampled_out,
+        "level": logging.getLevelName(_root.level),
+    }
+
+
+def _after_fork():
+    # Threads do not survive fork: give each prefork worker its own queue and
+    # writer, otherwise its queue would fill up and drop every record. The
+    # queue is replaced since the parent writer may have held its lock.
+    global _lock, _writer
+    _lock = threading.Lock()
+    if _handler is not None:
+        _handler.records = queue.Queue(maxsize=_handler.records.maxsize)
+        _handler.dropped = 0
+        _writer = LogWriter(_handler.records, _handler, _writer.output).start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
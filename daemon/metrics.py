@@ -0,0 +1,377 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.metrics
+~~~~~~~~~~~~~~~~~
+
+This module provides the counters and histograms of the daemons and their
+rendering in the Prometheus text exposition format.
+
+Recording must stay cheap on the request path, so every metric keeps one
+shard (a plain dictionary) per thread: a thread only ever writes its own
+shard and never takes a lock. Shards are summed when the metrics are
+rendered. Shards of finished threads are folded into a retired total, so the
+proxy spawning one thread per connection does not grow them without bound.
+
+Values that the daemons already maintain (worker pool usage, open
+connections) are not recorded twice: a collector reads them at render time.
+
+The ``/metrics`` route is opt-in, see ``metrics_path`` of
+:func:`create_backend <daemon.backend.create_backend>` and
+:func:`create_proxy <daemon.proxy.create_proxy>`. With prefork workers each
+process answers with its own metrics.
+
+Usage::
+
+  >>> REQUESTS.inc(("127.0.0.1:9000", "/login", "POST", 302))
+  >>> HOOK_LATENCY.observe(("/login",), 0.004)
+  >>> print(render().decode())
+  # HELP weaprous_requests_total Requests served, by route, method and status.
+  # TYPE weaprous_requests_total counter
+  weaprous_requests_total{server="127.0.0.1:9000",route="/login",method="POST",status="302"} 1
+  ...
+"""
+
+import bisect
+import threading
+
+#: Content type of the text exposition format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+#: Default latency buckets, in seconds.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+#: Number of shards after which the shards of finished threads are folded.
+MIN_FOLD_SHARDS = 64
+#: Method labels recorded as is; any other method is counted as "OTHER" so
+#: clients can not grow the label set. "-" marks a request without a method.
+METHOD_LABELS = frozenset(("GET", "HEAD", "POST", "PUT", "DELETE", "PATCH",
+                           "OPTIONS", "CONNECT", "TRACE", "-"))
+
+
+def status_of(head):
+    """
+    Reads the status code of an encoded response.
+
+    :param head (bytes): the response, or its first piece.
+
+    :rtype int: the status code, 0 if it can not be read.
+    """
+    try:
+        return int(head[9:12])
+    except (TypeError, ValueError):
+        return 0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+class Metric:
+    """Base of the sharded metrics.
+
+    :attrs name (str): metric name.
+    :attrs help (str): description shown in the ``# HELP`` line.
+    :attrs labelnames (tuple): names of the labels, in the order of the label values.
+    """
+
+    kind = "untyped"
+
+    __attrs__ = [
+        "name",
+        "help",
+        "labelnames",
+    ]
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        self._fold_at = MIN_FOLD_SHARDS
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            pass
+        values = self._local.values = {}
+        with self._lock:
+            if len(self._shards) >= self._fold_at:
+                self._fold()
+                self._fold_at = max(MIN_FOLD_SHARDS, 2 * len(self._shards))
+            self._shards.append((threading.current_thread(), values))
+        return values
+
+    def _fold(self):
+        # Called with the lock held. A finished thread no longer writes its
+        # shard, so it can be merged without racing with its owner.
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                self._merge(self._retired, values)
+        self._shards = alive
+
+    def _merge(self, total, values):
+        for labels, value in values.items():
+            total[labels] = total.get(labels, 0) + value
+
+    def values(self):
+        """
+        Sums the shards of every thread.
+
+        :rtype dict: label values to the metric value.
+        """
+        with self._lock:
+            self._fold()
+            total = {}
+            self._merge(total, self._retired)
+            for _, values in self._shards:
+                # dict() copies in one step, while the owner may be writing.
+                self._merge(total, dict(values))
+        return total
+
+    def samples(self):
+        """
+        Yields the exposition samples of the metric.
+
+        :rtype generator: (name suffix, label string, value) tuples.
+        """
+        for labels, value in sorted(self.values().items(), key=lambda item: str(item[0])):
+            yield "", _format_labels(self.labelnames, labels), value
+
+
+class Counter(Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        """
+        Adds to the counter.
+
+        :param labels (tuple): label values, in the order of ``labelnames``.
+        :param amount (int | float): increment.
+        """
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. the connections in progress.
+    Increments and decrements must happen on the same thread, or the shards
+    of several threads cancel each other out at render time."""
+
+    kind = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        """Subtracts from the gauge."""
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, with their sum.
+
+    :attrs buckets (tuple): upper bounds of the buckets, increasing.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        """
+        Records one observation.
+
+        :param labels (tuple): label values, in the order of ``labelnames``.
+        :param value (float): observed value, e.g. a duration in seconds.
+        """
+        values = self._shard()
+        row = values.get(labels)
+        if row is None:
+            # One count per bucket, one for +Inf, then the sum.
+            row = values[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def _merge(self, total, values):
+        for labels, row in values.items():
+            merged = total.get(labels)
+            if merged is None:
+                total[labels] = list(row)
+            else:
+                for index, value in enumerate(row):
+                    merged[index] += value
+
+    def samples(self):
+        for labels, row in sorted(self.values().items(), key=lambda item: str(item[0])):
+            cumulative = 0
+            bounds = self.buckets + (float("inf"),)
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(float(bound)))
+                yield "_bucket", _format_labels(self.labelnames, labels, le), cumulative
+            yield "_sum", _format_labels(self.labelnames, labels), row[-1]
+            yield "_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    """The :class:`Registry <Registry>` object, the metrics rendered by
+    the ``/metrics`` route.
+
+    A collector is a callable returning ``(name, kind, help, labelnames,
+    samples)`` tuples, ``samples`` being a list of (label values, value); it
+    exposes values that are maintained elsewhere.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        """Adds a metric and returns it."""
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Adds a collector called at every render."""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def render(self):
+        """
+        Renders every metric in the text exposition format.
+
+        :rtype bytes: the exposition document.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.help))
+            lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+            for suffix, labels, value in metric.samples():
+                lines.append("{}{}{} {}".format(metric.name, suffix, labels, _format_value(value)))
+        for collector in self.collectors:
+            for name, kind, help, labelnames, samples in collector():
+                lines.append("# HELP {} {}".format(name, help))
+                lines.append("# TYPE {} {}".format(name, kind))
+                for labels, value in samples:
+                    lines.append("{}{} {}".format(name, _format_labels(labelnames, labels),
+                                                  _format_value(value)))
+        lines.append("")
+        return "\n".join(lines).encode('utf-8')
+
+
+#: Metrics of this process.
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "weaprous_requests_total",
+    "Requests served, by route, method and status.",
+    ("server", "route", "method", "status")))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "weaprous_request_duration_seconds",
+    "Time from the parsed request to the last byte of the response, by route.",
+    ("server", "route")))
+HOOK_LATENCY = REGISTRY.register(Histogram(
+    "weaprous_hook_duration_seconds",
+    "Time spent in the route hooks, by route.",
+    ("route",)))
+RECEIVED_BYTES = REGISTRY.register(Counter(
+    "weaprous_received_bytes_total",
+    "Request bytes received (head and body).",
+    ("server",)))
+SENT_BYTES = REGISTRY.register(Counter(
+    "weaprous_sent_bytes_total",
+    "Response bytes sent.",
+    ("server",)))
+PROXY_CONNECTIONS = REGISTRY.register(Gauge(
+    "weaprous_proxy_connections",
+    "Client connections being served by the proxy.",
+    ("server",)))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    "weaprous_proxy_upstream_requests_total",
+    "Requests forwarded by the proxy, by backend and status (0 when the backend failed).",
+    ("backend", "status")))
+UPSTREAM_LATENCY = REGISTRY.register(Histogram(
+    "weaprous_proxy_upstream_duration_seconds",
+    "Time to forward a request and read the whole backend response, by backend.",
+    ("backend",)))
+UPSTREAM_CONNECTIONS = REGISTRY.register(Counter(
+    "weaprous_proxy_upstream_connections_total",
+    "Backend connections of the proxy pools, by backend and event (opened, reused, "
+    "expired, stale, discarded).",
+    ("backend", "event")))
+
+
+def observe_request(server, route, method, status, duration, received, sent):
+    """
+    Records one request served by a daemon.
+
+    :param server (str): "ip:port" of the daemon.
+    :param route (str): route pattern of the hook, or a placeholder for the rest.
+    :param method (str): request method, outside :data:`METHOD_LABELS` counted as "OTHER".
+    :param status (int): response status code.
+    :param duration (float): seconds spent serving the request.
+    :param received (int): request bytes.
+    :param sent (int): response bytes.
+    """
+    if method not in METHOD_LABELS:
+        method = "OTHER"
+    REQUESTS.inc((server, route, method, status))
+    REQUEST_LATENCY.observe((server, route), duration)
+    RECEIVED_BYTES.inc((server,), received)
+    SENT_BYTES.inc((server,), sent)
+
+
+def render():
+    """Renders the metrics of :data:`REGISTRY`."""
+    return REGISTRY.render()
+
+
+def metrics_route(path="/metrics"):
+    """
+    Builds the route hook serving the metrics, ready to be added to a route
+    table like the hooks registered by :meth:`WeApRous.route`.
+
+    :param path (str): route path.
+
+    :rtype callable: the route hook.
+    """
+    def metrics(headers, body):
+        return {"body": render(), "content_type": CONTENT_TYPE}
+
+    metrics._route_path = path
+    metrics._route_methods = ["GET"]
+    metrics._accepts_request = False
+    return metrics
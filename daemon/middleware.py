@@ -0,0 +1,203 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.middleware
+~~~~~~~~~~~~~~~~~
+
+This module provides the middleware chain run around the route hooks of a
+:class:`WeApRous <WeApRous>` app.
+
+A middleware has a ``before(request)`` step, run before the hook, and an
+``after(request, result)`` step, run after it. The steps of a chain run in
+order before the hook and in reverse order after it:
+
+- ``before`` may attach values to ``request.context``, a dictionary created
+  for each request and also handed to the hook as ``headers["context"]``,
+  so a value computed once (e.g. the logged-in user) is shared by the rest
+  of the chain and the hook.
+- ``before`` may short-circuit the request by returning a hook result, e.g.
+  ``{"auth": "false"}`` for the prebuilt 401 answer. The hook and the
+  remaining ``before`` steps are skipped; the ``after`` steps of the
+  middleware already entered still run.
+- ``after`` may replace the result by returning a new one; returning None
+  keeps it.
+
+Middleware is registered for the whole app (:meth:`WeApRous.use`,
+:meth:`WeApRous.before_request`, :meth:`WeApRous.after_request`) or for one
+route (``@app.route(..., middleware=[...])``); app middleware runs first.
+The chain of each route is composed once, when the routes are compiled.
+
+Usage::
+
+  >>> @app.before_request
+  >>> def load_user(request):
+  >>>     request.context["user"] = sessions.get((request.cookies or {}).get("session_id"))
+
+  >>> def login_required(request):
+  >>>     if request.context["user"] is None:
+  >>>         return {"auth": "false"}
+
+  >>> class Timing(Middleware):
+  >>>     def before(self, request):
+  >>>         request.context["started"] = time.perf_counter()
+  >>>     def after(self, request, result):
+  >>>         log.info("%s took %.3f s", request.path,
+  >>>                  time.perf_counter() - request.context["started"])
+
+  >>> app.use(Timing())
+  >>> @app.route('/', methods=['GET'], middleware=[login_required])
+  >>> def index(headers, body):
+  >>>     return {"content": "index.html", "placeholder": (headers["context"]["user"],)}
+"""
+
+import functools
+import inspect
+
+
+class Middleware:
+    """The :class:`Middleware <Middleware>` object, a step of the chain run
+    around a route hook. Subclasses override :meth:`before`, :meth:`after`
+    or both.
+    """
+
+    def before(self, request):
+        """
+        Runs before the hook.
+
+        :param request (Request): the prepared request.
+
+        :rtype dict: None to go on, or a hook result answering the request.
+        """
+        return None
+
+    def after(self, request, result):
+        """
+        Runs after the hook, or after the ``before`` step that short-circuited.
+
+        :param request (Request): the prepared request.
+        :param result: the hook result.
+
+        :rtype: the result to answer with, None to keep ``result``.
+        """
+        return None
+
+
+class BeforeHook(Middleware):
+    """A :class:`Middleware <Middleware>` made of a ``before`` function."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def before(self, request):
+        return self.func(request)
+
+    def __repr__(self):
+        return "<BeforeHook {}>".format(getattr(self.func, "__name__", self.func))
+
+
+class AfterHook(Middleware):
+    """A :class:`Middleware <Middleware>` made of an ``after`` function."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def after(self, request, result):
+        return self.func(request, result)
+
+    def __repr__(self):
+        return "<AfterHook {}>".format(getattr(self.func, "__name__", self.func))
+
+
+def as_middleware(value):
+    """
+    Normalizes a registered middleware: a plain function is a ``before`` step.
+
+    :param value (Middleware | callable): the middleware.
+
+    :rtype Middleware: the middleware object.
+
+    :raises TypeError: If the value is neither.
+    """
+    if isinstance(value, Middleware):
+        return value
+    if callable(value):
+        return BeforeHook(value)
+    raise TypeError("Middleware must be a Middleware or a callable, not {!r}".format(value))
+
+
+def _enter(chain, request):
+    # Runs the before steps; returns how many were entered and the result
+    # of the one that short-circuited, if any.
+    context = request.context
+    if context is None:
+        context = request.context = {}
+        request.headers["context"] = context
+    entered = 0
+    for middleware in chain:
+        entered += 1
+        result = middleware.before(request)
+        if result is not None:
+            return entered, result, True
+    return entered, None, False
+
+
+def _leave(chain, entered, request, result):
+    for index in range(entered - 1, -1, -1):
+        replaced = chain[index].after(request, result)
+        if replaced is not None:
+            result = replaced
+    return result
+
+
+def pipeline(handler, chain):
+    """
+    Composes a route hook with its middleware chain.
+
+    The returned hook takes the :class:`Request <Request>` (see
+    :func:`accepts_request <daemon.weaprous.accepts_request>`), keeps the
+    route metadata of ``handler`` and is a coroutine function when
+    ``handler`` is one, so both serving engines call it like the handler.
+
+    :param handler (callable): the route hook.
+    :param chain (list): :class:`Middleware <Middleware>` objects, outermost first.
+
+    :rtype callable: the composed hook, or ``handler`` itself for an empty chain.
+    """
+    chain = tuple(chain)
+    if not chain:
+        return handler
+    with_request = getattr(handler, "_accepts_request", False)
+
+    if inspect.iscoroutinefunction(handler):
+        async def hook(headers, body, request):
+            entered, result, answered = _enter(chain, request)
+            if not answered:
+                if with_request:
+                    result = await handler(headers=headers, body=body, request=request)
+                else:
+                    result = await handler(headers=headers, body=body)
+            return _leave(chain, entered, request, result)
+    else:
+        def hook(headers, body, request):
+            entered, result, answered = _enter(chain, request)
+            if not answered:
+                if with_request:
+                    result = handler(headers=headers, body=body, request=request)
+                else:
+                    result = handler(headers=headers, body=body)
+            return _leave(chain, entered, request, result)
+
+    functools.update_wrapper(hook, handler)
+    hook._accepts_request = True
+    hook._middleware = chain
+    return hook
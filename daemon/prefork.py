@@ -0,0 +1,224 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.prefork
+~~~~~~~~~~~~~~~~~
+
+This module provides a multi-process (prefork) mode for the backends.
+
+A :class:`Supervisor <Supervisor>` forks N worker processes per listening
+address. Every worker binds its own socket with ``SO_REUSEPORT``, so the
+kernel spreads the incoming connections over the workers and each one runs
+on its own interpreter and GIL. The supervisor restarts workers that die.
+
+On platforms without ``fork`` or ``SO_REUSEPORT`` (e.g. Windows) the worker
+groups are served by threads of the current process instead.
+
+Sharing application state:
+--------------------------
+Module-level dictionaries (e.g. the sessions of ``start_app.py``) are copied
+into each worker at fork time and diverge afterwards. State that must stay
+consistent across workers has to be created with :func:`shared_dict` (or
+:meth:`WeApRous.shared_state`) *before* the workers are started. It returns a
+dictionary proxy served by a manager process:
+
+- plain reads and writes (``d[k]``, ``d[k] = v``, ``d.get``, ``d.pop``) are
+  seen by every worker,
+- nested mutable values are copies: after mutating one, assign it back
+  (``d[k] = value``) to publish the change.
+
+Requirements:
+--------------
+- multiprocessing: fork-based worker processes and the state manager.
+- socket: ``SO_REUSEPORT`` availability (Linux, BSD, macOS).
+
+Usage Example:
+--------------
+>>> sessions = shared_dict()
+>>> Supervisor([("backend", create_backend, args, kwargs)], workers=4).run()
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import threading
+import time
+
+from .logger import get_logger
+
+#: Workers dying sooner than this after start are restarted with a delay.
+MIN_UPTIME = 1.0
+#: Delay before restarting a worker that died too quickly.
+RESTART_DELAY = 2.0
+
+log = get_logger("Prefork")
+_manager = None
+
+
+def prefork_supported():
+    """
+    Tells whether the platform can run prefork workers.
+
+    :rtype bool: True if both ``fork`` and ``SO_REUSEPORT`` are available.
+    """
+    return (hasattr(socket, "SO_REUSEPORT")
+            and "fork" in multiprocessing.get_all_start_methods())
+
+
+def shared_dict(initial=None):
+    """
+    Creates a dictionary shared by every prefork worker. It must be called
+    before the workers are started.
+
+    :param initial (dict, optional): initial content.
+
+    :rtype DictProxy: dictionary proxy served by the manager process.
+    """
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("fork").Manager()
+    return _manager.dict(initial or {})
+
+
+def _worker_main(target, args, kwargs):
+    # The terminal delivers SIGINT to the whole process group; the supervisor
+    # handles the shutdown, so workers only need to leave quietly.
+    try:
+        target(*args, **kwargs)
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """The :class:`Supervisor <Supervisor>` object, which forks and watches
+    the worker processes of one or several listening addresses.
+
+    Attributes:
+        specs (list): (name, target, args, kwargs) for each worker group.
+        workers (int): number of processes per group.
+        processes (dict): live process to its group spec.
+        restarts (int): number of workers restarted so far.
+    """
+
+    __attrs__ = [
+        "specs",
+        "workers",
+        "processes",
+        "restarts",
+    ]
+
+    def __init__(self, specs, workers):
+        """
+        Initialize a new Supervisor instance.
+
+        :param specs (list): (name, target, args, kwargs) tuples; ``target(*args, **kwargs)``
+                             is run in each worker and should serve forever.
+        :param workers (int): number of worker processes per spec.
+        """
+        if workers < 1:
+            raise ValueError("Prefork needs at least one worker: {}".format(workers))
+        self.specs = specs
+        self.workers = workers
+        self.processes = {}
+        self.restarts = 0
+        self._context = multiprocessing.get_context("fork")
+        self._started = {}
+        self._stopping = False
+
+    def spawn(self, spec):
+        name, target, args, kwargs = spec
+        process = self._context.Process(
+            target=_worker_main,
+            args=(target, args, kwargs),
+            name="{}-worker".format(name),
+        )
+        process.start()
+        self.processes[process] = spec
+        self._started[process] = time.monotonic()
+        log.info("Started %s worker pid %s", name, process.pid)
+        return process
+
+    def stop(self, *_):
+        """Terminates every worker and waits for them to exit."""
+        self._stopping = True
+        for process in list(self.processes):
+            if process.is_alive():
+                process.terminate()
+        for process in list(self.processes):
+            process.join(timeout=5)
+        self.processes.clear()
+
+    def run(self):
+        """
+        Starts the workers and restarts them whenever they exit, until the
+        supervisor receives SIGINT or SIGTERM.
+        """
+        signal.signal(signal.SIGTERM, self._terminate)
+        log.info("Supervisor pid %s starting %s worker(s) per address",
+                 os.getpid(), self.workers)
+        for spec in self.specs:
+            for _ in range(self.workers):
+                self.spawn(spec)
+
+        try:
+            while not self._stopping:
+                sentinels = {process.sentinel: process for process in self.processes}
+                for sentinel in multiprocessing.connection.wait(list(sentinels)):
+                    process = sentinels[sentinel]
+                    self._reap(process)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _reap(self, process):
+        spec = self.processes.pop(process)
+        uptime = time.monotonic() - self._started.pop(process)
+        process.join()
+        if self._stopping:
+            return
+        log.warning("%s worker pid %s exited with code %s, restarting",
+                    spec[0], process.pid, process.exitcode)
+        if uptime < MIN_UPTIME:
+            time.sleep(RESTART_DELAY)
+        self.restarts += 1
+        self.spawn(spec)
+
+    def _terminate(self, *_):
+        raise KeyboardInterrupt
+
+
+def run_prefork(specs, workers):
+    """
+    Entry point for serving the given worker groups with N processes each.
+    Falls back to one thread per group in the current process when the
+    platform lacks ``fork`` or ``SO_REUSEPORT``.
+
+    :param specs (list): (name, target, args, kwargs) tuples, see :class:`Supervisor`.
+    :param workers (int): number of worker processes per spec.
+    """
+    if not prefork_supported():
+        log.warning("fork/SO_REUSEPORT unavailable, serving in a single process")
+        threads = []
+        for name, target, args, kwargs in specs:
+            thread = threading.Thread(target=target, args=args,
+                                      kwargs=dict(kwargs, reuse_port=False), name=name)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return
+
+    Supervisor(specs, workers).run()
@@ -0,0 +1,379 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.profiling
+~~~~~~~~~~~~~~~~~
+
+This module provides the per-request phase timing and the sampled profiling
+of the daemons.
+
+Every request served by :class:`HttpAdapter <HttpAdapter>` is timed with
+monotonic timestamps, one per phase:
+
+- ``parse``: :meth:`Request.prepare` and the route lookup,
+- ``hook``: the route hook, when the request matched one,
+- ``render``: building the response (file lookup, template, compression),
+- ``send``: writing the response to the socket.
+
+The phases known before the response is written are sent to the client in a
+``Server-Timing`` header, which browsers show in their network panel. All of
+them are logged by the ``Timing`` component: at DEBUG for every request, at
+WARNING for the requests slower than the slow request threshold.
+
+One request out of N can also be run under :mod:`cProfile`. The profiles are
+aggregated into one :class:`pstats.Stats` per process and dumped to
+``<directory>/weaprous-<pid>.pstats``, to be read with ``python -m pstats``.
+Sampling is off by default.
+
+Configuration:
+--------------
+- ``WEAPROUS_SERVER_TIMING``: 0 disables the ``Server-Timing`` header (default 1).
+- ``WEAPROUS_SLOW_REQUEST``: slow request threshold in seconds (default 0.5).
+- ``WEAPROUS_PROFILE_SAMPLE``: profile 1 out of N requests, 0 disables (default 0).
+- ``WEAPROUS_PROFILE_DIR``: directory of the dumps (default ``profiles``).
+- :func:`configure_profiling` sets them at runtime, the ``profile_sample``
+  option of :func:`create_backend <daemon.backend.create_backend>` sets the
+  sample rate and :func:`profile_route` serves an admin route.
+
+Usage::
+
+  >>> configure_profiling(sample=100)          # profile 1 request out of 100
+  >>> create_backend("127.0.0.1", 9000, routes, profile_path="/profile")
+  $ curl 'http://127.0.0.1:9000/profile?sample=10'
+  $ python -m pstats profiles/weaprous-1234.pstats
+"""
+
+import atexit
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+
+from .logger import get_logger
+
+#: Default slow request threshold, in seconds.
+SLOW_REQUEST = 0.5
+#: Default directory of the profile dumps.
+PROFILE_DIR = "profiles"
+#: Number of profiled requests between two dumps.
+DUMP_EVERY = 10
+#: Number of functions listed by the admin route.
+REPORT_LIMIT = 40
+
+log = get_logger("Timing")
+
+
+class PhaseTimer:
+    """The :class:`PhaseTimer <PhaseTimer>` object, which times the phases
+    of the request being served on a connection. It is reused from one
+    request to the next.
+
+    :attrs started (float): ``time.perf_counter()`` when the request was parsed.
+    :attrs phases (list): (phase name, seconds) pairs, in order.
+    """
+
+    __slots__ = ("started", "phases", "_last")
+
+    def __init__(self):
+        self.started = 0.0
+        self.phases = []
+        self._last = 0.0
+
+    def start(self):
+        """Starts timing a new request."""
+        self.started = self._last = time.perf_counter()
+        self.phases.clear()
+
+    def mark(self, phase):
+        """
+        Ends a phase: its duration is the time since the previous mark.
+
+        :param phase (str): phase name, e.g. ``"hook"``.
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def elapsed(self):
+        """Seconds since :meth:`start`."""
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """
+        Formats the phases as a ``Server-Timing`` header value, in milliseconds.
+
+        :rtype bytes: e.g. ``b"parse;dur=0.081, hook;dur=2.310, total;dur=2.700"``.
+        """
+        metrics = ["{};dur={:.3f}".format(phase, duration * 1000)
+                   for phase, duration in self.phases]
+        metrics.append("total;dur={:.3f}".format((self._last - self.started) * 1000))
+        return ", ".join(metrics).encode('ascii')
+
+    def summary(self):
+        """Formats the phases for the log, e.g. ``parse=0.08ms hook=2.31ms``."""
+        return " ".join("{}={:.2f}ms".format(phase, duration * 1000)
+                        for phase, duration in self.phases)
+
+
+def _insert_header(head, line):
+    # The header goes right after the status line, the rest is unchanged.
+    end = head.find(b"\r\n") + 2
+    if end < 2:
+        return head
+    view = memoryview(head)
+    return b"".join((view[:end], line, view[end:]))
+
+
+def _annotate_stream(pieces, line):
+    iterator = iter(pieces)
+    try:
+        for piece in iterator:
+            yield _insert_header(piece, line)
+            break
+        for piece in iterator:
+            yield piece
+    finally:
+        close = getattr(pieces, 'close', None)
+        if close:
+            close()
+
+
+def add_server_timing(response, timer):
+    """
+    Adds the ``Server-Timing`` header of the timed phases to an encoded response.
+
+    :param response (bytes | iterable): the response built by :meth:`HttpAdapter.build_reply`.
+    :param timer (PhaseTimer): timer of the request.
+
+    :rtype bytes | iterable: the response with the header.
+    """
+    line = b"Server-Timing: " + timer.server_timing() + b"\r\n"
+    if isinstance(response, (bytes, bytearray)):
+        return _insert_header(response, line)
+    return _annotate_stream(response, line)
+
+
+def log_timing(timer, method, path, status):
+    """
+    Logs the phases of a request that has been answered.
+
+    :param timer (PhaseTimer): timer of the request.
+    :param method (str): request method.
+    :param path (str): request path.
+    :param status (int): response status code.
+    """
+    total = timer.elapsed()
+    if total >= SETTINGS.slow_request:
+        log.warning("Slow request %s %s %s %s total=%.2fms",
+                    method, path, status, timer.summary(), total * 1000)
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug("%s %s %s %s total=%.2fms", method, path, status, timer.summary(), total * 1000)
+
+
+class Profiler:
+    """The :class:`Profiler <Profiler>` object, which runs one request out
+    of ``sample`` under :mod:`cProfile` and aggregates the results.
+
+    Only one request is profiled at a time: the interpreter allows a single
+    active profiler, so a request drawn while another one is profiled is
+    simply not sampled.
+
+    :attrs sample (int): profile 1 request out of N, 0 disables sampling.
+    :attrs directory (str): directory of the dumps.
+    :attrs profiled (int): number of profiled requests.
+    """
+
+    __attrs__ = [
+        "sample",
+        "directory",
+        "profiled",
+    ]
+
+    def __init__(self, sample=0, directory=PROFILE_DIR):
+        self.sample = sample
+        self.directory = directory
+        self.profiled = 0
+        self._count = 0
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = None
+        self._dumped = 0
+
+    @property
+    def path(self):
+        """Path of the dump of this process."""
+        return os.path.join(self.directory, "weaprous-{}.pstats".format(os.getpid()))
+
+    def start(self):
+        """
+        Draws the current request and starts profiling it when it is sampled.
+
+        :rtype cProfile.Profile: the running profile, or None.
+        """
+        sample = self.sample
+        if sample <= 0:
+            return None
+        # Racy increments only blur the sampling, like the log sampler.
+        self._count += 1
+        if self._count % sample or not self._busy.acquire(False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active.
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        """
+        Stops a profile returned by :meth:`start` and aggregates it.
+
+        :param profile (cProfile.Profile): the running profile.
+        """
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled += 1
+            if self.profiled - self._dumped >= DUMP_EVERY:
+                self._dump()
+
+    def dump(self):
+        """Writes the aggregated stats to :attr:`path`."""
+        with self._lock:
+            self._dump()
+
+    def _dump(self):
+        if self._stats is None or self._dumped == self.profiled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._stats.dump_stats(self.path)
+            self._dumped = self.profiled
+        except OSError as e:
+            log.warning("Can not dump the profile to %s: %s", self.path, e)
+
+    def report(self, limit=REPORT_LIMIT):
+        """
+        Formats the aggregated stats, sorted by cumulative time.
+
+        :param limit (int): number of functions listed.
+
+        :rtype str: the ``pstats`` report.
+        """
+        out = io.StringIO()
+        with self._lock:
+            if self._stats is None:
+                return "No profiled request (sample 1 out of {}).\n".format(self.sample)
+            self._stats.stream = out
+            self._stats.sort_stats("cumulative").print_stats(limit)
+        return "Profiled requests: {}, sample 1 out of {}\n{}".format(
+            self.profiled, self.sample, out.getvalue())
+
+
+class Settings:
+    """Runtime switches of the timing, see :func:`configure_profiling`.
+
+    :attrs server_timing (bool): send the ``Server-Timing`` header.
+    :attrs slow_request (float): slow request threshold, in seconds.
+    """
+
+    __attrs__ = [
+        "server_timing",
+        "slow_request",
+    ]
+
+    def __init__(self):
+        self.server_timing = os.environ.get("WEAPROUS_SERVER_TIMING", "1") != "0"
+        self.slow_request = float(os.environ.get("WEAPROUS_SLOW_REQUEST", SLOW_REQUEST))
+
+
+#: Timing switches of this process.
+SETTINGS = Settings()
+#: Request profiler of this process.
+PROFILER = Profiler(int(os.environ.get("WEAPROUS_PROFILE_SAMPLE", "0") or 0),
+                    os.environ.get("WEAPROUS_PROFILE_DIR", PROFILE_DIR))
+
+atexit.register(PROFILER.dump)
+
+
+def configure_profiling(server_timing=None, slow_request=None, sample=None, directory=None):
+    """
+    Changes the timing and profiling switches. Options left to None are kept.
+
+    :param server_timing (bool, optional): send the ``Server-Timing`` header.
+    :param slow_request (float, optional): seconds above which a request is logged as slow.
+    :param sample (int, optional): profile 1 out of N requests, 0 disables sampling.
+    :param directory (str, optional): directory of the profile dumps.
+    """
+    if server_timing is not None:
+        SETTINGS.server_timing = bool(server_timing)
+    if slow_request is not None:
+        SETTINGS.slow_request = float(slow_request)
+    if directory is not None:
+        PROFILER.directory = directory
+    if sample is not None:
+        PROFILER.sample = max(0, int(sample))
+        if PROFILER.sample:
+            log.info("Profiling 1 request out of %s", PROFILER.sample)
+        else:
+            log.info("Profiling disabled")
+
+
+def profile_route(path="/profile"):
+    """
+    Builds the admin route hook of the profiler, ready to be added to a route
+    table like :func:`metrics_route <daemon.metrics.metrics_route>`.
+
+    ``GET <path>`` returns the aggregated report, ``?sample=N`` changes the
+    sample rate first (0 disables it) and ``?dump=1`` writes the dump.
+
+    :param path (str): route path.
+
+    :rtype callable: the route hook.
+    """
+    def profile(headers, body):
+        query = headers.get("query", {})
+        if "sample" in query:
+            try:
+                configure_profiling(sample=query["sample"])
+            except ValueError:
+                return {"body": "Invalid sample rate\n", "status": 400}
+        if query.get("dump"):
+            PROFILER.dump()
+        return {"body": PROFILER.report()}
+
+    profile._route_path = path
+    profile._route_methods = ["GET"]
+    profile._accepts_request = False
+    return profile
+
+
+def _after_fork():
+    # Each prefork worker profiles on its own and dumps to its own pid.
+    PROFILER._busy = threading.Lock()
+    PROFILER._lock = threading.Lock()
+    PROFILER._stats = None
+    PROFILER.profiled = PROFILER._dumped = PROFILER._count = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -27,12 +27,25 @@ Requirement:
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
 
 """
+import functools
 import socket
 import threading
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
+from .reader import HttpParser, RequestError, read_message
+from .limits import ConnectionLimits, DeadlineExceeded, send_nowait
+from .upstream import UpstreamPools, UpstreamError
+from .balancer import compile_policy
+from . import limits as limit_defaults
+from . import upstream as upstream_defaults
+from .logger import get_logger
+from .headers import encode_response
+from . import metrics
 import re
+import time
+
+log = get_logger("Proxy")
 
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
@@ -43,37 +56,56 @@ PROXY_PASS = {
     "app2.local": ('192.168.56.103', 9002),
 }
 
-round_robin_counter = {}
-round_robin_lock = threading.Lock()
+#: Policies compiled for routes given with a policy name instead of a
+#: policy object, by (hostname, name, backends).
+_named_policies = {}
+
+#: Backend connection pools used when :func:`forward_request` is given none.
+UPSTREAMS = UpstreamPools()
 
 
-def forward_request(host, port, request):
+def forward_request(host, port, conn, head, parser, pools=None, limits=None, on_head=None):
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+    Forwards an HTTP request to a backend server and streams the response
+    back to the client.
+
+    The request goes over a pooled keep-alive connection of the backend and
+    both bodies are relayed as they arrive, see :meth:`UpstreamPool.relay
+    <daemon.upstream.UpstreamPool.relay>`.
 
     :params host (str): IP address of the backend server.
     :params port (int): port number of the backend server.
-    :params request (str): incoming HTTP request.
-
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :params conn (socket.socket): client connection socket.
+    :params head (bytes): request head; the body follows on ``conn``.
+    :params parser (HttpParser): client parser holding the body bytes already received.
+    :params pools (UpstreamPools, optional): backend connection pools, :data:`UPSTREAMS`
+                                             by default.
+    :params limits (ConnectionLimits, optional): deadlines of the client connection.
+    :params on_head (callable, optional): called with the head of the backend
+                                          response before it is relayed.
+
+    :rtype tuple: (status, received, sent) of the relayed exchange. If the
+                  backend fails before answering, a 404 Not Found response
+                  is sent instead when it could not be reached, a 502 Bad
+                  Gateway when it may have received the request.
     """
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    pool = (pools or UPSTREAMS).get(host, port)
+    address = pool.address
+    started = time.perf_counter()
 
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        while True:
-            chunk = backend.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-        return response
-    except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
+        status, received, sent = pool.relay(conn, head, parser, limits, on_head)
+        metrics.UPSTREAM_LATENCY.observe((address,), time.perf_counter() - started)
+        metrics.UPSTREAM_REQUESTS.inc((address, status))
+        return status, received, sent
+    except UpstreamError as e:
+      log.warning("Socket error forwarding to %s:%s: %s", host, port, e)
+      metrics.UPSTREAM_REQUESTS.inc((address, 0))
+      if e.status == 502:
+          conn.sendall(BAD_GATEWAY)
+          return 502, len(head), len(BAD_GATEWAY)
+      response = (
             "HTTP/1.1 404 Not Found\r\n"
             "Content-Type: text/plain\r\n"
             "Content-Length: 13\r\n"
@@ -81,59 +113,62 @@ def forward_request(host, port, request):
             "\r\n"
             "404 Not Found"
         ).encode('utf-8')
+      conn.sendall(response)
+      return 404, len(head), len(response)
 
 
-def resolve_routing_policy(hostname, routes):
+def resolve_routing_policy(hostname, routes, headers=None, client_ip=None):
     """
     Handles an routing policy to return the matching proxy_pass.
     It determines the target backend to forward the request to.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
+    :params hostname (str): Host header of the request.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params headers (HeaderMap, optional): request headers, read by the
+                                           sticky and hash policies.
+    :params client_ip (str, optional): client IP address.
+
+    :rtype tuple: (proxy_host, proxy_port, policy). ``policy`` is the
+                  :class:`Policy <daemon.balancer.Policy>` that chose the
+                  backend, to be told when the request is done, or None.
     """
 
-    print(hostname)
     proxy_map, policy = routes.get(hostname,('127.0.0.1:9000','round-robin'))
-    print(proxy_map)
-    print(policy)
+    log.debug("Resolving hostname %s to %s with policy %s", hostname, proxy_map, policy)
 
     proxy_host = ''
     proxy_port = '9000'
     if isinstance(proxy_map, list):
         if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
+            log.warning("Empty resolved routing of hostname %s", hostname)
             # Use a dummy host to raise an invalid connection
             proxy_host = '127.0.0.1'
             proxy_port = '9000'
+            policy = None
         elif len(proxy_map) == 1:
             proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        # elif: # apply the policy handling 
-        #   proxy_map
-        #   policy
-        elif len(proxy_map) > 1:
-            if policy == "round-robin":
-                # TODO: Implement round robin
-                with round_robin_lock:
-                    current_index = round_robin_counter.get(hostname, 0)
-                    backend = proxy_map[current_index]
-                    round_robin_counter[hostname] = (current_index + 1) % len(proxy_map)
-                    proxy_host, proxy_port = backend.split(":", 2)
+            policy = None
         else:
-            # Out-of-handle mapped host
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
+            if isinstance(policy, str):
+                policy = _named_policy(hostname, policy, proxy_map)
+            backend = policy.choose(headers, client_ip)
+            proxy_host, proxy_port = backend.split(":", 2)
     else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
+        log.debug("Resolved route of hostname %s is a single backend", hostname)
         proxy_host, proxy_port = proxy_map.split(":", 2)
+        policy = None
+
+    return proxy_host, proxy_port, policy
 
-    return proxy_host, proxy_port
+def _named_policy(hostname, name, backends):
+    # Routes built by hand may name their policy; compile it once.
+    key = (hostname, name, tuple(backends))
+    policy = _named_policies.get(key)
+    if policy is None:
+        policy = _named_policies.setdefault(key, compile_policy(name, backends))
+    return policy
 
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, metrics_path=None, limits=None, pools=None):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
@@ -150,28 +185,108 @@ def handle_client(ip, port, conn, addr, routes):
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
     :params routes (dict): dictionary mapping hostnames and location.
+    :params metrics_path (str): path answered by the proxy itself with its
+                                metrics, or None to forward every request.
+    :params limits (ConnectionLimits): deadlines of the client connection. The
+                                       connection was admitted by them and is
+                                       released when it closes.
+    :params pools (UpstreamPools): backend connection pools of the proxy.
     """
 
-    request = conn.recv(8192).decode()
+    server = "{}:{}".format(ip, port)
+    metrics.PROXY_CONNECTIONS.inc((server,))
+    try:
+        serve_client(server, conn, addr, routes, metrics_path, limits, pools)
+    except DeadlineExceeded as e:
+        limits.closed(e.reason)
+        if e.reason in ("header_timeout", "body_timeout"):
+            log.warning("Closing %s: %s", addr, e.reason)
+            send_nowait(conn, READ_ERRORS[408])
+        conn.close()
+    except socket.timeout:
+        log.warning("Closing %s: write_timeout", addr)
+        limits.closed("write_timeout")
+        conn.close()
+    except OSError as e:
+        log.warning("Connection error from %s: %s", addr, e)
+        conn.close()
+    finally:
+        metrics.PROXY_CONNECTIONS.dec((server,))
+        if limits is not None:
+            limits.release(addr[0])
+
+def serve_client(server, conn, addr, routes, metrics_path=None, limits=None, pools=None):
+    """
+    Serves the request of one client connection, see :func:`handle_client`.
+
+    :params server (str): "ip:port" of the proxy, the label of its metrics.
+    :params conn (socket.socket): client connection socket.
+    :params addr (tuple): client address (IP, port).
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params metrics_path (str): path of the metrics page, or None.
+    :params limits (ConnectionLimits): deadlines of the client connection.
+    :params pools (UpstreamPools): backend connection pools of the proxy.
 
-    # Extract hostname
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            hostname = line.split(':', 1)[1].strip()
+    :raises DeadlineExceeded: If the request is not received in time.
+    :raises socket.timeout: If the client does not read the response in time.
+    """
 
-    print("[Proxy] {} at Host: {}".format(addr, hostname))
+    # Only the head is read here, the body is streamed to the backend.
+    parser = HttpParser(max_body_size=None)
+    try:
+        head = read_message(conn, parser, limits, head_only=True)
+    except RequestError as e:
+        log.warning("Rejecting request from %s: %s", addr, e)
+        if limits is not None:
+            conn.settimeout(limits.write_timeout)
+        conn.sendall(Response().build_error(e.status, e.reason))
+        metrics.REQUESTS.inc((server, "-", "-", e.status))
+        conn.close()
+        return
+    if head is None:
+        conn.close()
+        return
+
+    started = time.perf_counter()
+    if limits is not None:
+        conn.settimeout(limits.write_timeout)
+    method, target = (head.split(b" ", 2) + [b"", b""])[:2]
+    method = method.decode('latin-1')
+
+    if metrics_path and method == "GET" and target.split(b"?", 1)[0] == metrics_path.encode():
+        response = build_metrics_response()
+        conn.sendall(response)
+        conn.close()
+        metrics.observe_request(server, metrics_path, method, 200,
+                                time.perf_counter() - started, len(head), len(response))
+        return
+
+    # Extract hostname, from the headers the parser already split
+    hostname = parser.headers.get('host', '')
+
+    log.debug("%s at Host: %s", addr, hostname)
 
     # Resolve the matching destination in routes and need conver port
     # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
+    resolved_host, resolved_port, policy = resolve_routing_policy(hostname, routes,
+                                                                  parser.headers, addr[0])
+    backend = "{}:{}".format(resolved_host, resolved_port)
     try:
         resolved_port = int(resolved_port)
     except ValueError:
-        print("Not a valid integer")
+        log.warning("Backend port %r of %s is not a valid integer", resolved_port, hostname)
 
     if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
+        log.debug("Host name %s is forwarded to %s:%s", hostname, resolved_host, resolved_port)
+        on_head = None
+        if policy is not None:
+            on_head = functools.partial(policy.learn, backend)
+        try:
+            status, received, sent = forward_request(resolved_host, resolved_port, conn, head,
+                                                     parser, pools, limits, on_head)
+        finally:
+            if policy is not None:
+                policy.done(backend)
     else:
         response = (
             "HTTP/1.1 404 Not Found\r\n"
@@ -181,10 +296,29 @@ def handle_client(ip, port, conn, addr, routes):
             "\r\n"
             "404 Not Found"
         ).encode('utf-8')
-    conn.sendall(response)
+        conn.sendall(response)
+        status, received, sent = 404, len(head), len(response)
     conn.close()
+    # Only configured virtual hosts become labels, the Host header is client input.
+    route = hostname if hostname in routes else "unknown"
+    metrics.observe_request(server, route, method, status,
+                            time.perf_counter() - started, received, sent)
+
+def build_metrics_response():
+    """
+    Builds the response of the proxy metrics page.
 
-def run_proxy(ip, port, routes):
+    :rtype bytes: the encoded response, closing the connection.
+    """
+    body = metrics.render()
+    return encode_response(200, [
+        ("Content-Type", metrics.CONTENT_TYPE),
+        ("Content-Length", len(body)),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], body)
+
+def run_proxy(ip, port, routes, metrics_path=None, limits=None, pools=None):
     """
     Starts the proxy server and listens for incoming connections. 
 
@@ -196,47 +330,93 @@ def run_proxy(ip, port, routes):
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params metrics_path (str): path of the metrics page, or None to disable it.
+    :params limits (ConnectionLimits): deadlines and per-IP cap of the client
+                                       connections.
+    :params pools (UpstreamPools): backend connection pools.
 
     """
 
+    if limits is None:
+        limits = ConnectionLimits("{}:{}".format(ip, port))
+    if pools is None:
+        pools = UpstreamPools()
     proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
     try:
         proxy.bind((ip, port))
         proxy.listen(50)
-        print("[Proxy] Listening on IP {} port {}".format(ip,port))
+        log.info("Listening on IP %s port %s", ip, port)
         while True:
             conn, addr = proxy.accept()
+            if not limits.admit(addr[0]):
+                log.warning("Too many connections from %s, rejecting", addr[0])
+                send_nowait(conn, TOO_MANY_CONNECTIONS)
+                conn.close()
+                continue
             #
             #  TODO: implement the step of the client incomping connection
             #        using multi-thread programming with the
             #        provided handle_client routine
             #
-            thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
+            thread = threading.Thread(target=handle_client,
+                                      args=(ip, port, conn, addr, routes, metrics_path, limits,
+                                            pools))
             thread.start()
             # thread.join()
             # handle_client(ip, port, conn, addr, routes)
     except socket.error as e:
-      print("Socket error: {}".format(e))
-
-def create_proxy(ip, port, routes):
+      log.error("Socket error: %s", e)
+
+def create_proxy(ip, port, routes, metrics_path=None,
+                 idle_timeout=limit_defaults.IDLE_TIMEOUT,
+                 header_timeout=limit_defaults.HEADER_TIMEOUT,
+                 body_timeout=limit_defaults.BODY_TIMEOUT,
+                 write_timeout=limit_defaults.WRITE_TIMEOUT,
+                 max_connections_per_ip=limit_defaults.MAX_CONNECTIONS_PER_IP,
+                 upstream_max_idle=upstream_defaults.MAX_IDLE,
+                 upstream_idle_timeout=upstream_defaults.IDLE_TIMEOUT,
+                 upstream_max_lifetime=upstream_defaults.MAX_LIFETIME):
     """
     Entry point for launching the proxy server.
 
+    The client limits and backend pool settings are usually read from the
+    configuration file with :func:`parse_proxy_options`.
+
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params metrics_path (str, optional): path answered with the proxy metrics in the
+                                          Prometheus text format, e.g. "/metrics".
+    :params idle_timeout (float): seconds a client may wait before sending a request.
+    :params header_timeout (float): seconds to receive a request head.
+    :params body_timeout (float): seconds to receive a request body.
+    :params write_timeout (float): seconds one response write may take.
+    :params max_connections_per_ip (int): open connections per client IP, 0 for no limit.
+    :params upstream_max_idle (int): idle keep-alive connections kept per backend.
+    :params upstream_idle_timeout (float): seconds a backend connection may stay idle.
+    :params upstream_max_lifetime (float): seconds a backend connection may be reused.
     """
 
-    run_proxy(ip, port, routes)
+    limits = ConnectionLimits("{}:{}".format(ip, port), idle_timeout, header_timeout,
+                              body_timeout, write_timeout, max_connections_per_ip)
+    pools = UpstreamPools(max_idle=upstream_max_idle, idle_timeout=upstream_idle_timeout,
+                          max_lifetime=upstream_max_lifetime)
+    run_proxy(ip, port, routes, metrics_path, limits, pools)
 
 
 def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A ``proxy_pass`` may carry a ``weight=N`` parameter. The ``dist_policy``
+    of a block (see :mod:`daemon.balancer`) is compiled here, once; an
+    invalid one is logged and replaced by round-robin.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: hostname to (proxy_map, policy): the backend "host:port",
+                 or the list of them, and the :class:`Policy
+                 <daemon.balancer.Policy>` distributing requests among them.
     """
 
     with open(config_file, 'r') as f:
@@ -251,19 +431,26 @@ def parse_virtual_hosts(config_file):
     for host, block in host_blocks:
         proxy_map = {}
 
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
+        # Find all proxy_pass entries, with their optional weight
+        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+)(?:\s+weight=(\d+))?\s*;', block)
         map = proxy_map.get(host,[])
-        map = map + proxy_passes
+        map = map + [backend for backend, _ in proxy_passes]
         proxy_map[host] = map
+        weights = [int(weight or 1) for _, weight in proxy_passes]
 
-        # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
+        # Find dist_policy if present, with its arguments
+        policy_match = re.search(r'dist_policy\s+([^;\n]+)', block)
         if policy_match:
-            dist_policy_map = policy_match.group(1)
+            dist_policy_map = policy_match.group(1).strip()
         else: #default policy is round_robin
             dist_policy_map = 'round-robin'
-            
+
+        try:
+            dist_policy_map = compile_policy(dist_policy_map, map, weights)
+        except ValueError as e:
+            log.error("Host %s: %s, using round-robin", host, e)
+            dist_policy_map = compile_policy('round-robin', map, weights)
+
         #
         # @bksysnet: Build the mapping and policy
         # TODO: this policy varies among scenarios 
@@ -281,5 +468,48 @@ def parse_virtual_hosts(config_file):
             routes[host] = (proxy_map.get(host,[]), dist_policy_map)
 
     for key, value in routes.items():
-        print(key, value)
+        log.debug("Route %s -> %s", key, value)
     return routes
+
+
+#: Top-level directives of the configuration file mapped to the arguments
+#: of :func:`create_proxy`, with the type of their value.
+PROXY_DIRECTIVES = {
+    "keepalive_timeout": ("idle_timeout", float),
+    "client_header_timeout": ("header_timeout", float),
+    "client_body_timeout": ("body_timeout", float),
+    "send_timeout": ("write_timeout", float),
+    "limit_conn_per_ip": ("max_connections_per_ip", int),
+    "upstream_keepalive": ("upstream_max_idle", int),
+    "upstream_keepalive_timeout": ("upstream_idle_timeout", float),
+    "upstream_keepalive_time": ("upstream_max_lifetime", float),
+}
+
+
+def parse_proxy_options(config_file):
+    """
+    Parses the client limits and backend pool settings from the top-level
+    directives of a config file, outside the host blocks, e.g.
+    ``client_header_timeout 10;`` or ``upstream_keepalive 32;``.
+
+    :config_file (str): Path to the NGINX config file.
+    :rtype dict: keyword arguments of :func:`create_proxy`; directives not
+                 present keep their default.
+    """
+
+    with open(config_file, 'r') as f:
+        config_text = f.read()
+
+    # Drop the host blocks, their directives are per host
+    config_text = re.sub(r'host\s+"[^"]+"\s*\{.*?\}', '', config_text, flags=re.DOTALL)
+
+    options = {}
+    for directive, value in re.findall(r'^\s*(\w+)\s+([\d.]+)\s*;', config_text, re.MULTILINE):
+        if directive not in PROXY_DIRECTIVES:
+            log.warning("Unknown directive %s in %s", directive, config_file)
+            continue
+        name, convert = PROXY_DIRECTIVES[directive]
+        options[name] = convert(value)
+
+    log.debug("Proxy options %s", options)
+    return options
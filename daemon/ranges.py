@@ -0,0 +1,117 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.ranges
+~~~~~~~~~~~~~~~~~
+
+This module provides the byte range requests of static files (RFC 7233).
+
+:func:`parse_range` turns a ``Range`` header into a list of satisfiable byte
+spans and :func:`if_range_matches` evaluates ``If-Range`` against the
+validators of the current file, so a media element can seek in a video
+without downloading it again from the start.
+
+Usage::
+
+  >>> parse_range("bytes=0-99,-100", 1000)
+  [(0, 99), (900, 999)]
+  >>> parse_range("bytes=2000-", 1000)
+  []
+"""
+
+#: Range requests with more spans than this are answered with the whole file.
+MAX_RANGES = 16
+
+
+def parse_range(header, size, max_ranges=MAX_RANGES):
+    """
+    Parses a ``Range`` header against the size of the selected file.
+
+    Overlapping or adjacent spans are merged, so the result is sorted and
+    every byte is sent at most once.
+
+    :param header (str): ``Range`` header value.
+    :param size (int): file size in bytes.
+    :param max_ranges (int): maximum number of spans honoured.
+
+    :rtype list: (first, last) inclusive byte positions; an empty list when
+                 no span is satisfiable (416), or None when the header must be
+                 ignored and the whole file sent (unknown unit, bad syntax or
+                 too many spans).
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, sep, last = item.partition('-')
+        first = first.strip()
+        last = last.strip()
+        if not sep or not (first or last):
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes.
+                length = int(last)
+                if length < 0:
+                    return None
+                if length == 0 or size == 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else None
+                if start < 0 or (end is not None and end < start):
+                    return None
+                if start >= size:
+                    continue
+                end = size - 1 if end is None else min(end, size - 1)
+        except ValueError:
+            return None
+        ranges.append((start, end))
+
+    if len(ranges) > max_ranges:
+        return None
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(if_range, etag, last_modified):
+    """
+    Evaluates an ``If-Range`` precondition. A range is only sent when the
+    client copy is the current version; otherwise the whole file is sent.
+
+    :param if_range (str): ``If-Range`` header value, an entity tag or a date.
+    :param etag (str): strong entity tag of the file.
+    :param last_modified (str): ``Last-Modified`` value of the file.
+
+    :rtype bool: True if the ``Range`` header should be honoured.
+    """
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        # Weak tags never match in If-Range.
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    return if_range == last_modified
@@ -0,0 +1,368 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.reader
+~~~~~~~~~~~~~~~~~
+
+This module provides a buffered, byte-level reader for HTTP/1.1 messages.
+
+The :class:`HttpParser <HttpParser>` does no I/O: bytes received from the
+network are fed to it and complete messages are taken out one at a time as
+``(head, body)`` pairs. It
+
+- finds the blank line ending the head incrementally, without rescanning
+  bytes that were already searched,
+- splits the head into its start line and a :class:`HeaderMap <HeaderMap>`
+  in a single pass over the bytes (:func:`parse_head`); nothing is decoded
+  but the header names,
+- frames the body with ``Content-Length`` or decodes a chunked
+  ``Transfer-Encoding`` body, or hands the head over alone so the body can
+  be streamed (:meth:`HttpParser.next_head`),
+- enforces head and body size limits,
+- keeps any bytes past the end of the message for the next (pipelined) one.
+
+:func:`read_message` drives a parser from a blocking socket, within the
+idle, header and body deadlines of :mod:`daemon.limits`; the asyncio engine
+drives the same parser from a stream reader.
+
+Usage::
+
+  >>> parser = HttpParser()
+  >>> head, body = read_message(conn, parser)
+  >>> req.prepare(head, routes, body=body, headers=parser.headers)
+"""
+
+import socket
+import time
+
+from .dictionary import HeaderMap, header_key, HEADER_NAMES
+from .limits import DeadlineExceeded
+
+#: Bytes requested from the socket per recv call.
+RECV_SIZE = 65536
+#: Maximum size of the request line and headers.
+MAX_HEADER_SIZE = 16384
+#: Maximum size of a request body.
+MAX_BODY_SIZE = 8 * 1024 * 1024
+
+HEADER_TERMINATOR = b"\r\n\r\n"
+CRLF = b"\r\n"
+
+
+class RequestError(ValueError):
+    """Raised when a message can not be framed. ``status`` and ``reason``
+    describe the HTTP error the peer should receive."""
+
+    def __init__(self, status, reason, message=None):
+        super().__init__(message or reason)
+        self.status = status
+        self.reason = reason
+
+
+def parse_head(head):
+    """
+    Splits a raw message head in one pass over its bytes.
+
+    Header lines without a colon are ignored. Names become the keys of the
+    returned map, values stay undecoded bytes until they are read.
+
+    :param head (bytes): start line and headers, without the blank line.
+
+    :rtype tuple: (start_line, headers) as (bytes, :class:`HeaderMap <HeaderMap>`).
+    """
+    headers = HeaderMap()
+    items = headers._items
+    names = HEADER_NAMES
+    lines = iter(head.split(CRLF))
+    start_line = next(lines)
+    for line in lines:
+        name, colon, value = line.partition(b":")
+        if not colon or not name:
+            continue
+        key = names.get(name)
+        if key is None:
+            key = header_key(name)
+        items[key] = value.strip()
+    return start_line, headers
+
+
+def parse_framing(head):
+    """
+    Extracts the body framing of a message head.
+
+    :param head (bytes | HeaderMap): raw start line and headers, without the
+                                     blank line, or headers already parsed.
+
+    :rtype tuple: (content_length, chunked), content_length is 0 when absent.
+
+    :raises RequestError: If the Content-Length value is invalid.
+    """
+    if head.__class__ is not HeaderMap:
+        head = parse_head(head)[1]
+    chunked = False
+    encoding = head.raw("transfer-encoding")
+    if encoding is not None:
+        if encoding.__class__ is str:
+            encoding = encoding.encode('latin-1', 'replace')
+        chunked = encoding.lower().endswith(b"chunked")
+    content_length = head.raw("content-length")
+    if content_length is None:
+        return 0, chunked
+    try:
+        content_length = int(content_length)
+    except ValueError:
+        raise RequestError(400, "Bad Request", "Invalid Content-Length")
+    if content_length < 0:
+        raise RequestError(400, "Bad Request", "Invalid Content-Length")
+    return content_length, chunked
+
+
+class HttpParser:
+    """The :class:`HttpParser <HttpParser>` object, which splits a byte
+    stream into HTTP messages.
+
+    Attributes:
+        buffer (bytearray): Bytes received but not consumed yet.
+        max_header_size (int): Maximum head size, larger heads raise 431.
+        max_body_size (int): Maximum body size, larger bodies raise 413; None for no limit.
+        chunked (bool): Whether the last returned message used chunked encoding.
+        headers (HeaderMap): Headers of the last returned message.
+    """
+
+    __attrs__ = [
+        "buffer",
+        "max_header_size",
+        "max_body_size",
+        "chunked",
+        "headers",
+    ]
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        #: Pending bytes.
+        self.buffer = bytearray()
+        #: Head size limit.
+        self.max_header_size = max_header_size
+        #: Body size limit.
+        self.max_body_size = max_body_size
+        #: Framing of the last message.
+        self.chunked = False
+        #: Headers of the last message.
+        self.headers = None
+
+        self._scanned = 0
+        self._head = None
+        self._headers = None
+        self._length = 0
+        self._chunks = None
+
+    def feed(self, data):
+        """Appends bytes received from the peer."""
+        self.buffer += data
+
+    def reset(self):
+        """Drops any buffered bytes and partial message."""
+        self.buffer.clear()
+        self._scanned = 0
+        self._head = None
+        self._headers = None
+        self._length = 0
+        self._chunks = None
+        self.chunked = False
+        self.headers = None
+
+    @property
+    def pending(self):
+        """Whether bytes of an unfinished message are buffered."""
+        return self._head is not None or bool(self.buffer)
+
+    def phase(self):
+        """
+        Names the deadline the next read falls under, see :mod:`daemon.limits`.
+
+        :rtype str: "body_timeout" once the head is complete, "header_timeout"
+                    once bytes of a message are buffered, "idle_timeout" otherwise.
+        """
+        if self._head is not None:
+            return "body_timeout"
+        if self.buffer:
+            return "header_timeout"
+        return "idle_timeout"
+
+    def next_message(self):
+        """
+        Takes the next complete message out of the buffer.
+
+        :rtype tuple: (head, body) as bytes, or None if more data is needed.
+                      ``head`` excludes the terminating blank line; its parsed
+                      headers are left in :attr:`headers`.
+
+        :raises RequestError: If a size limit is exceeded or the framing is invalid.
+        """
+        if self._head is None and not self._read_head():
+            return None
+
+        if self._chunks is not None:
+            body = self._read_chunked()
+        else:
+            body = self._read_fixed()
+        if body is None:
+            return None
+
+        head = self._head
+        self.headers = self._headers
+        self._head = None
+        self._chunks = None
+        return head, body
+
+    def next_head(self):
+        """
+        Takes the head of the next message out of the buffer and leaves its
+        body, whatever its framing, to be streamed by the caller: the bytes
+        following the head stay in :attr:`buffer`.
+
+        :rtype bytes: the head, without the terminating blank line, or None
+                      if more data is needed. Its parsed headers are left in
+                      :attr:`headers`.
+
+        :raises RequestError: If the head is too large or its framing is invalid.
+        """
+        if self._head is None and not self._read_head():
+            return None
+        head = self._head
+        self.headers = self._headers
+        self._head = None
+        self._chunks = None
+        return head
+
+    def _read_head(self):
+        buf = self.buffer
+        # Resume the search where the previous feed stopped, keeping
+        # 3 bytes of overlap in case the terminator was split.
+        end = buf.find(HEADER_TERMINATOR, max(0, self._scanned - 3))
+        if end < 0:
+            if len(buf) > self.max_header_size:
+                raise RequestError(431, "Request Header Fields Too Large")
+            self._scanned = len(buf)
+            return False
+        if end > self.max_header_size:
+            raise RequestError(431, "Request Header Fields Too Large")
+
+        head = bytes(buf[:end])
+        del buf[:end + len(HEADER_TERMINATOR)]
+        self._scanned = 0
+
+        _, self._headers = parse_head(head)
+        self._length, self.chunked = parse_framing(self._headers)
+        if self.chunked:
+            self._chunks = bytearray()
+        elif self.max_body_size is not None and self._length > self.max_body_size:
+            raise RequestError(413, "Payload Too Large")
+        self._head = head
+        return True
+
+    def _read_fixed(self):
+        length = self._length
+        buf = self.buffer
+        if len(buf) < length:
+            return None
+        if not length:
+            return b""
+        body = bytes(buf[:length])
+        del buf[:length]
+        return body
+
+    def _read_chunked(self):
+        buf = self.buffer
+        chunks = self._chunks
+        while True:
+            line_end = buf.find(CRLF)
+            if line_end < 0:
+                if len(buf) > self.max_header_size:
+                    raise RequestError(400, "Bad Request", "Invalid chunk size line")
+                return None
+            size_field = bytes(buf[:line_end]).split(b";", 1)[0].strip()
+            try:
+                size = int(size_field, 16)
+            except ValueError:
+                raise RequestError(400, "Bad Request", "Invalid chunk size")
+
+            if size == 0:
+                # Last chunk, skip the optional trailers up to the blank line.
+                if buf[line_end:line_end + 4] == HEADER_TERMINATOR:
+                    del buf[:line_end + 4]
+                    return bytes(chunks)
+                trailer_end = buf.find(HEADER_TERMINATOR, line_end)
+                if trailer_end < 0:
+                    return None
+                del buf[:trailer_end + len(HEADER_TERMINATOR)]
+                return bytes(chunks)
+
+            if self.max_body_size is not None and len(chunks) + size > self.max_body_size:
+                raise RequestError(413, "Payload Too Large")
+            data_start = line_end + len(CRLF)
+            data_end = data_start + size
+            if len(buf) < data_end + len(CRLF):
+                return None
+            chunks += buf[data_start:data_end]
+            del buf[:data_end + len(CRLF)]
+
+
+def read_message(conn, parser, limits=None, head_only=False):
+    """
+    Reads one complete message from a blocking socket.
+
+    With ``limits``, each phase of the message has a total deadline: the wait
+    for its first byte (``idle_timeout``), the head (``header_timeout``) and
+    the body (``body_timeout``). Every ``recv`` is given the time left in the
+    current phase, so a client sending one byte at a time can not stretch it.
+
+    :param conn (socket.socket): connection to read from.
+    :param parser (HttpParser): parser holding the bytes buffered on this connection.
+    :param limits (ConnectionLimits, optional): deadlines of the daemon.
+    :param head_only (bool): stop at the end of the head, see :meth:`HttpParser.next_head`.
+
+    :rtype tuple: (head, body) as bytes, or None if the peer closed before
+                  a complete message arrived. With ``head_only``, the head alone.
+
+    :raises RequestError: If a size limit is exceeded or the framing is invalid.
+    :raises DeadlineExceeded: If a deadline is missed; ``reason`` names the phase.
+    """
+    phase = deadline = None
+    while True:
+        message = parser.next_head() if head_only else parser.next_message()
+        if message is not None:
+            return message
+        if limits is not None:
+            current = parser.phase()
+            if current != phase:
+                phase = current
+                timeout = getattr(limits, phase)
+                if timeout is None:
+                    deadline = None
+                    conn.settimeout(None)
+                else:
+                    deadline = time.monotonic() + timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(phase)
+                conn.settimeout(remaining)
+        try:
+            chunk = conn.recv(RECV_SIZE)
+        except socket.timeout:
+            if phase is None:
+                raise
+            raise DeadlineExceeded(phase) from None
+        if not chunk:
+            return None
+        parser.feed(chunk)
@@ -17,9 +17,21 @@ daemon.request
 This module provides a Request object to manage and persist 
 request settings (cookies, auth, proxies).
 """
-from .dictionary import CaseInsensitiveDict
+from .dictionary import CaseInsensitiveDict, HeaderMap
+from .reader import parse_head
+from . import jsoncodec
+from .logger import get_logger
 import urllib.parse
 
+log = get_logger("Request")
+_UNPARSED = object()
+
+
+def is_json_type(content_type):
+    """Tells whether a ``Content-Type`` value denotes a JSON document."""
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type == 'application/json' or media_type.endswith('+json')
+
 
 class Request():
     """The fully mutable "class" `Request <Request>` object,
@@ -38,17 +50,23 @@ class Request():
       >>> r
       <Request>
     """
-    __attrs__ = [
+    __slots__ = (
         "method",
         "url",
         "headers",
-        "body",
-        "reason",
+        "path",
         "cookies",
         "body",
         "routes",
         "hook",
-    ]
+        "version",
+        "query",
+        "params",
+        "allowed",
+        "context",
+        "_raw_body",
+        "_json",
+    )
 
     def __init__(self):
         #: HTTP verb to send to the server.
@@ -63,41 +81,131 @@ class Request():
         self.cookies = None
         #: request body to send to the server.
         self.body = None
-        #: Routes
-        self.routes = {}
+        #: Routes, set by :meth:`prepare`
+        self.routes = None
         #: Hook point for routed mapped-path
         self.hook = None
+        #: HTTP version of the request line
+        self.version = None
+        #: Parsed query string, set by :meth:`prepare`
+        self.query = None
+        #: Path parameters of the matched route, set by :meth:`prepare`
+        self.params = None
+        #: Methods of a route matching the path but not the method (405)
+        self.allowed = ()
+        #: Values attached by the middleware of the route, see :mod:`daemon.middleware`
+        self.context = None
+        #: Raw body bytes, parsed on demand by :attr:`json`
+        self._raw_body = None
+        self._json = _UNPARSED
+
+    def reset(self):
+        """Clears the parsed state so the object can be reused for the
+        next request on a persistent connection. Nothing is allocated:
+        the containers are created by :meth:`prepare`."""
+        self.method = None
+        self.url = None
+        self.headers = None
+        self.path = None
+        self.cookies = None
+        self.body = None
+        self.routes = None
+        self.hook = None
+        self.version = None
+        self.query = None
+        self.params = None
+        self.allowed = ()
+        self.context = None
+        self._raw_body = None
+        self._json = _UNPARSED
+
+    @property
+    def json(self):
+        """The body parsed as JSON, on first access.
+
+        It is None when the request has no body or its ``Content-Type`` is not
+        ``application/json`` (or ``+json``). The codec is the one installed in
+        :mod:`daemon.jsoncodec`.
+
+        :raises ValueError: If the body is not valid JSON.
+        """
+        if self._json is _UNPARSED:
+            data = self._raw_body
+            if not data or not is_json_type(self.headers.get('content-type', '')):
+                self._json = None
+            else:
+                self._json = jsoncodec.loads(data)
+        return self._json
+
+    def wants_keep_alive(self):
+        """Tells whether the client asked to keep the connection open.
+
+        HTTP/1.1 connections persist unless the client sends
+        ``Connection: close``; HTTP/1.0 ones only with ``Connection: keep-alive``.
+        """
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            return 'close' not in connection
+        return 'keep-alive' in connection
+
+    def extract_request_line(self, line):
+        """Splits the request line, the only part of the head decoded up front.
+
+        :param line (bytes): e.g. ``b"GET /index.html HTTP/1.1"``.
 
-    def extract_request_line(self, request):
+        :rtype tuple: (method, path, version), all None if the line is malformed.
+        """
         try:
-            lines = request.splitlines()
-            first_line = lines[0]
-            method, path, version = first_line.split()
-
-            # if path == '/':
-            #     path = '/index.html'
-        except Exception:
-            return None, None
-
-        return method, path, version
-             
-    def prepare_headers(self, request):
-        """Prepares the given HTTP headers."""
-        lines = request.split('\r\n')
-        headers = {}
-        for line in lines[1:]:
-            if ': ' in line:
-                key, val = line.split(': ', 1)
-                headers[key.lower()] = val
-        return headers
-
-    def prepare(self, request, routes=None):
-        """Prepares the entire request with the given parameters."""
+            method, path, version = line.split()
+            return method.decode('ascii'), path.decode('utf-8', 'replace'), version.decode('ascii')
+        except ValueError:
+            return None, None, None
+
+    def prepare_headers(self, head):
+        """Prepares the given HTTP headers.
+
+        :param head (bytes): request line and headers, without the blank line.
+
+        :rtype tuple: (request line, :class:`HeaderMap <HeaderMap>`).
+        """
+        return parse_head(head)
+
+    def prepare(self, request, routes=None, body=None, headers=None):
+        """Prepares the entire request with the given parameters.
+
+        The head is scanned once by :func:`parse_head <daemon.reader.parse_head>`
+        (or was already scanned by the connection's parser, see ``headers``);
+        only the request line is decoded here, header values are decoded when
+        they are read.
+
+        :param request (bytes): the raw request, or only its head when ``body`` is given.
+                                A str is encoded back to UTF-8 first.
+        :param routes (dict): route mapping used to resolve the hook.
+        :param body (bytes): the body framed by :class:`HttpParser <HttpParser>`,
+                             it is decoded only when its content type is understood.
+        :param headers (HeaderMap): the headers the parser already split from ``request``.
+        """
+
+        if isinstance(request, str):
+            request = request.encode('utf-8')
+        if body is None:
+            request, _, raw_body = request.partition(b"\r\n\r\n")
+        else:
+            raw_body = body
+
+        if headers is None:
+            request_line, headers = self.prepare_headers(request)
+        else:
+            line_end = request.find(b"\r\n")
+            request_line = request if line_end < 0 else request[:line_end]
 
         # Prepare the request line from the request header
-        self.method, self.path, self.version = self.extract_request_line(request)
+        self.method, self.path, self.version = self.extract_request_line(request_line)
         # Initialize query container
         self.query = {}
+        if self.method is None:
+            self.headers = HeaderMap()
+            return
         # If there's a query string, split it off and parse into a dict
         if "?" in self.path:
             path_part, query_string = self.path.split("?", 1)
@@ -106,7 +214,7 @@ class Request():
             # parse_qsl returns list of (key, value) pairs; build dict (last value wins)
             self.query = dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True, encoding='utf-8', errors='replace'))
 
-        print("[Request] {} path {} version {}".format(self.method, self.path, self.version))
+        log.debug("%s path %s version %s", self.method, self.path, self.version)
 
         #
         # @bksysnet Preapring the webapp hook with WeApRous instance
@@ -117,19 +225,16 @@ class Request():
         
         if not routes == {}:  
             self.routes = routes
-            self.hook = routes.get((self.method, self.path))
+            if hasattr(routes, 'match'):
+                self.hook, self.params, self.allowed = routes.match(self.method, self.path)
+            else:
+                self.hook = routes.get((self.method, self.path))
             #
             # self.hook manipulation goes here
             # ...
             #
 
-        parts = request.split("\r\n\r\n", 1)
-        raw_header = parts[0]
-        raw_body = None
-        if len(parts) > 1:
-            raw_body = parts[1]
-
-        self.headers = self.prepare_headers(raw_header)
+        self.headers = headers
         self.body = self.prepare_body(raw_body)
 
         cookies = self.headers.get('cookie', '')
@@ -137,19 +242,26 @@ class Request():
         if cookies:
             self.prepare_cookies(cookies)
 
-        # Update query into self.headers
+        # Update query and path parameters into self.headers
+        if self.params is None:
+            self.params = {}
         self.headers["query"] = self.query
+        self.headers["params"] = self.params
 
         return
 
     def prepare_body(self, data, files=None, json=None):
         body = None
+        self._raw_body = data
         if not data:
             return body
 
         content_type = self.headers.get('content-type', '')
         if content_type == "application/x-www-form-urlencoded":
-            list_of_tuples = urllib.parse.parse_qsl(data)
+            text = data
+            if isinstance(text, (bytes, bytearray)):
+                text = text.decode('utf-8', 'replace')
+            list_of_tuples = urllib.parse.parse_qsl(text)
             body = dict(list_of_tuples)
         
         # if json is not None:
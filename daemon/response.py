@@ -22,11 +22,187 @@ The current version supports MIME type detection, content loading and header for
 """
 import datetime
 import os
+import secrets
+import stat
 import mimetypes
 from .dictionary import CaseInsensitiveDict
+from .cache import STATIC_CACHE, is_not_modified
+from .headers import REASONS, header_writer, current_date, encode_response
+from .template import TEMPLATES
+from .compress import negotiate_encoding, should_compress, compress
+from .ranges import parse_range, if_range_matches
+from . import jsoncodec
+from .logger import get_logger
+
+log = get_logger("Response")
 
 BASE_DIR = ""
 
+#: Cache-Control policy of each static directory, keyed by the directory
+#: resolved in :meth:`Response.prepare_content_type` (without ``BASE_DIR``).
+#: Pages in ``www/`` are always revalidated, so a changed page is seen at once
+#: while an unchanged one costs a 304; assets in ``static/`` may be reused.
+CACHE_CONTROL = {
+    "www/": "no-cache",
+    "static/": "public, max-age=3600",
+    "apps/": "no-cache",
+}
+#: Cache-Control value for directories missing from :data:`CACHE_CONTROL`.
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+#: Bytes read per chunk when streaming a file-like hook result.
+STREAM_CHUNK_SIZE = 65536
+
+#: Seconds a client is told to wait when the daemon is saturated.
+RETRY_AFTER = 1
+
+#: Prebuilt 503 answer sent straight from the accept loop when the worker
+#: queue is full, so rejecting a client costs no parsing nor allocation.
+SERVICE_UNAVAILABLE = encode_response(503, [
+        ("Content-Type", "text/plain"),
+        ("Content-Length", 19),
+        ("Retry-After", RETRY_AFTER),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], b"Service Unavailable")
+
+#: Prebuilt 429 answer sent from the accept loop to a client IP that already
+#: has the maximum number of connections open, see :mod:`daemon.limits`.
+TOO_MANY_CONNECTIONS = encode_response(429, [
+        ("Content-Type", "text/plain"),
+        ("Content-Length", 17),
+        ("Retry-After", RETRY_AFTER),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], b"Too Many Requests")
+
+#: Prebuilt 502 answer of the proxy when a backend fails on a request that
+#: can not safely be sent again.
+BAD_GATEWAY = encode_response(502, [
+        ("Content-Type", "text/plain"),
+        ("Content-Length", 11),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], b"Bad Gateway")
+
+#: Prebuilt 500 answer when a route hook raises before the response head is
+#: sent. The connection is closed, the hook may have left it half-handled.
+INTERNAL_SERVER_ERROR = encode_response(500, [
+        ("Content-Type", "text/plain"),
+        ("Content-Length", 21),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], b"Internal Server Error")
+
+#: Prebuilt 404 answers, keyed by the ``Connection`` header value.
+NOT_FOUND = {
+    connection: encode_response(404, [
+        ("Accept-Ranges", "bytes"),
+        ("Content-Type", "text/html"),
+        ("Content-Length", 13),
+        ("Cache-Control", "max-age=86000"),
+        ("Connection", connection),
+    ], b"404 Not Found")
+    for connection in ("keep-alive", "close")
+}
+
+UNAUTHORIZED_BODY = (
+        b"401 Unauthorized<br>"
+        b"<a href='/login'>Login</a> or <a href='/register'>Register</a>\r\n"
+    )
+
+#: Prebuilt 401 answers, keyed by the ``Connection`` header value.
+UNAUTHORIZED = {
+    connection: encode_response(401, [
+        # ("WWW-Authenticate", "Basic realm=\"Access to the site\""),
+        ("Content-Type", "text/html"),
+        ("Content-Length", len(UNAUTHORIZED_BODY)),
+        ("Cache-Control", "no-cache"),
+        ("Connection", connection),
+    ], UNAUTHORIZED_BODY)
+    for connection in ("keep-alive", "close")
+}
+
+#: Prebuilt answers of the errors raised while reading a request, keyed by
+#: status code (408 when a read deadline is missed). The connection is
+#: always closed after them.
+READ_ERRORS = {
+    status: encode_response(status, [
+        ("Content-Type", "text/plain"),
+        ("Content-Length", len("{} {}".format(status, REASONS[status]))),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+    ], "{} {}".format(status, REASONS[status]).encode('utf-8'))
+    for status in (400, 408, 413, 431)
+}
+
+#: Response headers copied from :attr:`Response.headers` when they are set.
+OPTIONAL_HEADERS = (
+    "ETag",
+    "Last-Modified",
+    "Content-Encoding",
+    "Vary",
+    "Accept-Ranges",
+    "Content-Range",
+)
+
+class FileBody():
+    """The :class:`FileBody <FileBody>` object, a span of an open file used
+    as a response body.
+
+    Writers send it with :meth:`socket.socket.sendfile`, so the kernel copies
+    the bytes from the page cache to the socket without going through Python.
+    ``socket.sendfile`` itself falls back to buffered reads where ``os.sendfile``
+    is not available.
+
+    :attrs file (file): file opened in binary mode.
+    :attrs offset (int): first byte to send.
+    :attrs count (int): number of bytes to send.
+    """
+
+    __attrs__ = [
+        "file",
+        "offset",
+        "count",
+    ]
+
+    def __init__(self, file, offset=0, count=None):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def sendto(self, conn):
+        """
+        Writes the span to a blocking socket.
+
+        :params conn (socket.socket): destination socket.
+
+        :rtype int: number of bytes sent.
+        """
+        return conn.sendfile(self.file, self.offset, self.count)
+
+    def iter_chunks(self, size=65536):
+        """
+        Reads the span in pieces, for writers that can not use sendfile.
+
+        :params size (int): maximum piece size.
+
+        :rtype generator: the bytes of the span.
+        """
+        self.file.seek(self.offset)
+        remaining = self.count
+        while remaining is None or remaining > 0:
+            chunk = self.file.read(size if remaining is None else min(size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -58,34 +234,41 @@ class Response():
       <Response>
     """
 
-    __attrs__ = [
+    __slots__ = (
         "_content",
+        "_content_consumed",
+        "_next",
         "_header",
+        "_history",
+        "_cookies",
+        "_elapsed",
         "status_code",
-        "method",
         "headers",
         "url",
-        "history",
         "encoding",
         "reason",
-        "cookies",
-        "elapsed",
         "request",
-        "body",
-        "reason",
-    ]
+        "keep_alive",
+    )
 
 
     def __init__(self, request=None):
         """
         Initializes a new :class:`Response <Response>` object.
 
+        The history, cookies and elapsed time are rarely used by the
+        daemons, so they are only created when first read.
+
         : params request : The originating request object.
         """
 
         self._content = False
         self._content_consumed = False
         self._next = None
+        self._header = None
+        self._history = None
+        self._cookies = None
+        self._elapsed = None
 
         #: Integer Code of responded HTTP Status, e.g. 404 or 200.
         self.status_code = None
@@ -101,23 +284,69 @@ class Response():
         #: Encoding to decode with when accessing response text.
         self.encoding = None
 
-        #: A list of :class:`Response <Response>` objects from
-        #: the history of the Request.
-        self.history = []
-
         #: Textual reason of responded HTTP Status, e.g. "Not Found" or "OK".
         self.reason = None
 
-        #: A of Cookies the response headers.
-        self.cookies = CaseInsensitiveDict()
-
-        #: The amount of time elapsed between sending the request
-        self.elapsed = datetime.timedelta(0)
-
         #: The :class:`PreparedRequest <PreparedRequest>` object to which this
         #: is a response.
         self.request = None
 
+        #: Whether the connection stays open after this response.
+        self.keep_alive = False
+
+
+    def reset(self):
+        """
+        Clears the per-request state so the object can be reused for the
+        next request on a persistent connection. The headers dictionary is
+        emptied in place rather than replaced.
+        """
+
+        self._content = False
+        self._content_consumed = False
+        self._next = None
+        self._header = None
+        self.status_code = None
+        self.headers.clear()
+        self.url = None
+        self.encoding = None
+        self.reason = None
+        self.request = None
+        self.keep_alive = False
+
+
+    @property
+    def history(self):
+        """A list of :class:`Response <Response>` objects from the history
+        of the Request."""
+        if self._history is None:
+            self._history = []
+        return self._history
+
+
+    @property
+    def cookies(self):
+        """A :class:`CaseInsensitiveDict <CaseInsensitiveDict>` of the
+        cookies of the response headers."""
+        if self._cookies is None:
+            self._cookies = CaseInsensitiveDict()
+        return self._cookies
+
+
+    @property
+    def elapsed(self):
+        """The amount of time elapsed between sending the request and the
+        arrival of the response (a :class:`datetime.timedelta`)."""
+        if self._elapsed is None:
+            self._elapsed = datetime.timedelta(0)
+        return self._elapsed
+
+
+    @property
+    def connection(self):
+        """Value of the ``Connection`` response header."""
+        return "keep-alive" if self.keep_alive else "close"
+
 
     def get_mime_type(self, path):
         """
@@ -151,7 +380,7 @@ class Response():
 
         # Processing mime_type based on main_type and sub_type
         main_type, sub_type = mime_type.split('/', 1)
-        print("[Response] processing MIME main_type={} sub_type={}".format(main_type,sub_type))
+        log.debug("processing MIME main_type=%s sub_type=%s", main_type, sub_type)
         if main_type == 'text':
             self.headers['Content-Type']='text/{}'.format(sub_type)
             if sub_type == 'plain' or sub_type == 'css':
@@ -179,78 +408,94 @@ class Response():
         else:
             raise ValueError("Invalid MEME type: main_type={} sub_type={}".format(main_type,sub_type))
 
+        self.headers['Cache-Control'] = CACHE_CONTROL.get(base_dir[len(BASE_DIR):],
+                                                          DEFAULT_CACHE_CONTROL)
         return base_dir
 
 
-    def build_content(self, path, base_dir):
+    def resolve_path(self, path, base_dir):
         """
-        Loads the objects file from storage space.
+        Maps a request path to a file inside the base directory.
+
+        :params path (str): request path.
+        :params base_dir (str): base directory where the file is located.
+
+        :rtype str: absolute file path, or None if the path escapes ``base_dir``.
+        """
+
+        root = os.path.abspath(base_dir or os.curdir)
+        filepath = os.path.abspath(os.path.join(root, path.lstrip('/')))
+        if filepath != root and not filepath.startswith(root + os.sep):
+            return None
+        return filepath
+
+
+    def open_content(self, path, base_dir):
+        """
+        Opens a static file and stats it, without reading its content.
 
         :params path (str): relative path to the file.
         :params base_dir (str): base directory where the file is located.
 
-        :rtype tuple: (int, bytes) representing content length and content data.
+        :rtype tuple: (file, size), or (None, 0) if there is no such regular file.
         """
 
-        filepath = os.path.join(base_dir, path.lstrip('/'))
+        filepath = self.resolve_path(path, base_dir)
+        if filepath is None:
+            return None, 0
+
+        log.debug("serving the object at location %s", filepath)
 
-        print("[Response] serving the object at location {}".format(filepath))
-        
         try:
-            with open(filepath, 'rb') as f:
-                content = f.read()
-        except FileNotFoundError:
-            content = b"404 Not Found"
-        except Exception as e:
-            print(f"[Response] Error reading file: {e}")
-            content = b"500 Internal Server Error"
-            
-        return len(content), content
+            f = open(filepath, 'rb')
+        except OSError:
+            return None, 0
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            f.close()
+            return None, 0
+        return f, st.st_size
 
 
-    def build_response_header(self, request):
+    def build_response_header(self, request, content_length=None, status=200):
         """
         Constructs the HTTP response headers based on the class:`Request <Request>
         and internal attributes.
 
         :params request (class:`Request <Request>`): incoming request object.
+        :params content_length (int, optional): body size, defaults to the length
+                                                of the loaded content.
+        :params status (int): HTTP status code.
 
         :rtypes bytes: encoded HTTP response header.
         """
-        reqhdr = request.headers
+        if content_length is None:
+            content_length = len(self._content)
         rsphdr = self.headers
 
-        #Build dynamic headers
-        headers = {
-                "Accept": "{}".format(reqhdr.get("Accept", "application/json")),
-                "Accept-Language": "{}".format(reqhdr.get("Accept-Language", "en-US,en;q=0.9")),
-                "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
-                "Cache-Control": "no-cache",
-                "Content-Type": "{}".format(self.headers['Content-Type']),
-                "Content-Length": "{}".format(len(self._content)),
-#                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
+        cache_control = rsphdr.get("Cache-Control", DEFAULT_CACHE_CONTROL)
+
+        writer = header_writer()
+        writer.start(status)
+        writer.header("Content-Type", rsphdr['Content-Type'])
+        writer.header("Content-Length", content_length)
+        writer.header("Cache-Control", cache_control)
+        if cache_control == "no-cache":
+            writer.header("Pragma", "no-cache")
+        for name in OPTIONAL_HEADERS:
+            value = rsphdr.get(name)
+            if value is not None:
+                writer.header(name, value)
         #
         # TODO prepare the request authentication
         #
-	# self.auth = ...
-                "Date": "{}".format(datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")),
-                "Max-Forward": "10",
-                "Pragma": "no-cache",
-                "Proxy-Authorization": "Basic dXNlcjpwYXNz",  # example base64
-                "Warning": "199 Miscellaneous warning",
-                "User-Agent": "{}".format(reqhdr.get("User-Agent", "Chrome/123.0.0.0")),
-            }
-        
+        # self.auth = ...
         if request.method == "POST" and request.path == "/login":
-            headers["Set-Cookie"] = "auth=true"
+            writer.header("Set-Cookie", "auth=true")
+        writer.header("Date", current_date())
+        writer.header("Connection", self.connection)
 
-        # Header text alignment
-        fmt_header = "HTTP/1.1 200 OK\r\n"
-        for key, value in headers.items():
-            fmt_header += f"{key}: {value}\r\n"
-        fmt_header += "\r\n"
-        
-        return str(fmt_header).encode('utf-8')
+        return writer.finish()
 
 
     def build_notfound(self):
@@ -260,16 +505,71 @@ class Response():
         :rtype bytes: Encoded 404 response.
         """
 
-        return (
-                "HTTP/1.1 404 Not Found\r\n"
-                "Accept-Ranges: bytes\r\n"
-                "Content-Type: text/html\r\n"
-                "Content-Length: 13\r\n"
-                "Cache-Control: max-age=86000\r\n"
-                "Connection: close\r\n"
-                "\r\n"
-                "404 Not Found"
-            ).encode('utf-8')
+        return NOT_FOUND[self.connection]
+
+
+    def build_not_modified(self):
+        """
+        Constructs a 304 Not Modified HTTP response for a conditional request
+        whose cached copy is still current. It carries the validators and the
+        caching policy of the resource but no body.
+
+        :rtype bytes: Encoded 304 response.
+        """
+
+        writer = header_writer()
+        writer.start(304)
+        writer.header("ETag", self.headers['ETag'])
+        writer.header("Last-Modified", self.headers['Last-Modified'])
+        writer.header("Cache-Control", self.headers.get('Cache-Control', DEFAULT_CACHE_CONTROL))
+        vary = self.headers.get('Vary')
+        if vary:
+            writer.header("Vary", vary)
+        writer.header("Date", current_date())
+        writer.header("Connection", self.connection)
+        return writer.finish()
+
+
+    def build_range_not_satisfiable(self, size):
+        """
+        Constructs a 416 Range Not Satisfiable HTTP response for a ``Range``
+        header none of whose spans lies inside the file.
+
+        :params size (int): current size of the file.
+
+        :rtype bytes: Encoded 416 response.
+        """
+
+        body = b"416 Range Not Satisfiable"
+        writer = header_writer()
+        writer.start(416)
+        writer.header("Content-Range", "bytes */{}".format(size))
+        writer.header("Content-Type", "text/plain")
+        writer.header("Content-Length", len(body))
+        writer.header("Accept-Ranges", "bytes")
+        writer.header("Connection", self.connection)
+        return writer.finish(body)
+
+
+    def build_method_not_allowed(self, allowed):
+        """
+        Constructs a 405 Method Not Allowed HTTP response, for a path that
+        matches a route registered for other methods.
+
+        :params allowed (tuple): methods of the matching route.
+
+        :rtype bytes: Encoded 405 response with an ``Allow`` header.
+        """
+
+        body = b"405 Method Not Allowed"
+        writer = header_writer()
+        writer.start(405)
+        writer.header("Allow", ", ".join(allowed))
+        writer.header("Content-Type", "text/plain")
+        writer.header("Content-Length", len(body))
+        writer.header("Cache-Control", "no-cache")
+        writer.header("Connection", self.connection)
+        return writer.finish(body)
 
 
     def build_unauthorized(self):
@@ -279,17 +579,65 @@ class Response():
         :rtype bytes: Encoded 401 response.
         """
 
-        return (
-                "HTTP/1.1 401 Unauthorized\r\n"
-                # "WWW-Authenticate: Basic realm=\"Access to the site\"\r\n"
-                "Content-Type: text/html\r\n"
-                # "Content-Length: 16\r\n"
-                "Cache-Control: no-cache\r\n"
-                "Connection: close\r\n"
-                "\r\n"
-                "401 Unauthorized<br>"
-                "<a href='/login'>Login</a> or <a href='/register'>Register</a>\r\n"
-            ).encode('utf-8')
+        return UNAUTHORIZED[self.connection]
+
+
+    def build_error(self, status_code, reason):
+        """
+        Constructs a plain-text error response for a request that could not
+        be read (e.g. 400, 413 or 431). The connection is always closed since
+        the rest of the byte stream can not be trusted.
+
+        :params status_code (int): HTTP status code.
+        :params reason (str): HTTP reason phrase, also used as the body.
+
+        :rtype bytes: Encoded error response.
+        """
+
+        self.keep_alive = False
+        if reason == REASONS.get(status_code) and status_code in READ_ERRORS:
+            return READ_ERRORS[status_code]
+
+        body = "{} {}".format(status_code, reason).encode('utf-8')
+        writer = header_writer()
+        writer.start(status_code)
+        writer.header("Content-Type", "text/plain")
+        writer.header("Content-Length", len(body))
+        writer.header("Cache-Control", "no-cache")
+        writer.header("Connection", "close")
+        return writer.finish(body)
+
+
+    def build_bad_request(self):
+        """
+        Constructs a standard 400 Bad Request HTTP response.
+
+        :rtype bytes: Encoded 400 response.
+        """
+
+        return self.build_error(400, "Bad Request")
+
+
+    def build_unavailable(self):
+        """
+        Constructs a standard 503 Service Unavailable HTTP response.
+
+        :rtype bytes: Encoded 503 response with a ``Retry-After`` header.
+        """
+
+        return SERVICE_UNAVAILABLE
+
+
+    def build_internal_error(self):
+        """
+        Constructs a standard 500 Internal Server Error HTTP response, for a
+        route hook that raised. The connection is closed.
+
+        :rtype bytes: Encoded 500 response.
+        """
+
+        self.keep_alive = False
+        return INTERNAL_SERVER_ERROR
 
 
     def build_redirect(self, path, request, new_session_id=None):
@@ -302,7 +650,7 @@ class Response():
         """
 
         redirect_message = f"Redirecting to {path}"
-        content_length = len(redirect_message)
+        content_length = len(redirect_message.encode('utf-8'))
 
         if request.method == "POST" and request.path in ["/login", "/register"]:
             return (
@@ -311,7 +659,7 @@ class Response():
                 "Content-Type: text/html\r\n"
                 f"Content-Length: {content_length}\r\n"
                 "Cache-Control: no-cache\r\n"
-                "Connection: close\r\n"
+                f"Connection: {self.connection}\r\n"
                 f"Set-Cookie: auth=true; Path=/\r\n"
                 f"Set-Cookie: session_id={new_session_id}; Path=/\r\n"
                 "\r\n"
@@ -325,7 +673,7 @@ class Response():
                 "Content-Type: text/html\r\n"
                 f"Content-Length: {content_length}\r\n"
                 "Cache-Control: no-cache\r\n"
-                "Connection: close\r\n"
+                f"Connection: {self.connection}\r\n"
                 f"Set-Cookie: auth=false; Path=/\r\n"
                 "\r\n"
                 f"{redirect_message}"
@@ -338,7 +686,7 @@ class Response():
                 "Content-Type: text/html\r\n"
                 f"Content-Length: {content_length}\r\n"
                 "Cache-Control: no-cache\r\n"
-                "Connection: close\r\n"
+                f"Connection: {self.connection}\r\n"
                 "\r\n"
                 f"{redirect_message}"
             ).encode('utf-8')
@@ -379,7 +727,7 @@ class Response():
             "Content-Type: text/html; charset=utf-8\r\n"
             f"Content-Length: {content_length}\r\n"
             "Cache-Control: no-cache\r\n"
-            "Connection: close\r\n"
+            f"Connection: {self.connection}\r\n"
             "\r\n"
         ).encode('utf-8')
 
@@ -387,44 +735,208 @@ class Response():
 
 
 
-    def build_content_placeholder(self, req, html_content, placeholders):
-        html_path = os.path.join("www", html_content)
-        with open(html_path,encoding="utf-8") as f:
-            raw_html = f.read()
-        for i, placeholder in enumerate(placeholders):
-            raw_html = raw_html.replace(f"{{{{ placeholder_{i} }}}}", placeholder)
+    def build_json(self, request, data, status=200):
+        """
+        Builds an ``application/json`` response from a hook result. The value
+        is serialized straight to bytes by the codec of :mod:`daemon.jsoncodec`
+        and compressed like the other text responses.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params data: JSON-serializable value.
+        :params status (int): HTTP status code.
+
+        :rtype bytes: Encoded JSON response.
+        """
+
+        return self.build_body(request, jsoncodec.dumps(data), 'application/json', status)
+
+
+    def build_body(self, request, body, content_type='text/plain; charset=utf-8', status=200):
+        """
+        Builds a response from an in-memory body, e.g. a ``"body"`` hook
+        result. Compressible bodies are compressed when the client accepts it.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params body (bytes | str): response body, str is encoded as UTF-8.
+        :params content_type (str): value of the ``Content-Type`` header.
+        :params status (int): HTTP status code.
+
+        :rtype bytes: Encoded response.
+        """
+
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+        if encoding and should_compress(content_type, len(body)):
+            body = compress(body, encoding)
+        else:
+            encoding = None
+
+        writer = header_writer()
+        writer.start(status)
+        writer.header("Content-Type", content_type)
+        writer.header("Content-Length", len(body))
+        if encoding:
+            writer.header("Content-Encoding", encoding)
+        writer.header("Vary", "Accept-Encoding")
+        writer.header("Cache-Control", "no-cache")
+        writer.header("Date", current_date())
+        writer.header("Connection", self.connection)
+        return writer.finish(body)
+
+
+    def build_stream(self, request, chunks, content_type='application/octet-stream'):
+        """
+        Builds a streamed HTTP response from an iterable of chunks or a
+        file-like object, with constant memory.
+
+        For HTTP/1.1 clients every chunk is sent with ``Transfer-Encoding:
+        chunked`` as soon as it is produced. HTTP/1.0 clients do not know
+        chunked framing, so the body is sent raw and the connection is closed
+        to mark its end.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params chunks (iterable | file): bytes or str chunks, or an object with ``read``.
+        :params content_type (str): value of the ``Content-Type`` header.
+
+        :rtype generator: the encoded header followed by the encoded chunks.
+        """
+
+        if hasattr(chunks, 'read'):
+            chunks = self.iter_file(chunks)
+
+        chunked = request.version == 'HTTP/1.1'
+        if not chunked:
+            self.keep_alive = False
+
+        writer = header_writer()
+        writer.start(200)
+        writer.header("Content-Type", content_type)
+        if chunked:
+            writer.header("Transfer-Encoding", "chunked")
+        writer.header("Date", current_date())
+        writer.header("Cache-Control", "no-cache")
+        writer.header("Connection", self.connection)
+        response_header = writer.finish()
+
+        return self._encode_stream(response_header, chunks, chunked)
 
-        # Convert HTML to bytes
-        content = raw_html.encode('utf-8')
-        content_length = len(content)
+
+    def _encode_stream(self, response_header, chunks, chunked):
+        yield response_header
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                if chunked:
+                    yield b"%x\r\n" % len(chunk) + chunk + b"\r\n"
+                else:
+                    yield chunk
+            if chunked:
+                yield b"0\r\n\r\n"
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+
+    def iter_file(self, fileobj):
+        """
+        Reads a file-like object in :data:`STREAM_CHUNK_SIZE` pieces and
+        closes it once exhausted.
+
+        :params fileobj (file): object with a ``read`` method.
+
+        :rtype generator: the file content.
+        """
+
+        try:
+            while True:
+                chunk = fileobj.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            close = getattr(fileobj, 'close', None)
+            if close:
+                close()
+
+
+    def build_content_placeholder(self, req, html_content, placeholders, escape=False):
+        """
+        Renders a page of ``www/`` with the ``"placeholder"`` values of a hook.
+
+        The page is compiled once by :data:`TEMPLATES` and recompiled only when
+        the file changes, so rendering is a single join of its literal segments
+        and the encoded values.
+
+        :params req (class:`Request <Request>`): incoming request object.
+        :params html_content (str): page name, e.g. ``"chat.html"``.
+        :params placeholders (tuple): values of ``{{ placeholder_0 }}``, ``{{ placeholder_1 }}``, ...
+        :params escape (bool): HTML-escape the values before inserting them.
+
+        :rtype bytes: Encoded 200 response, or 404 when the page does not exist.
+        """
+
+        html_path = self.resolve_path(html_content, BASE_DIR + "www/")
+        try:
+            template = TEMPLATES.get(html_path)
+        except (OSError, TypeError):
+            return self.build_notfound()
+
+        parts = template.render_parts(placeholders, escape)
+        content_length = sum(map(len, parts))
+
+        encoding = negotiate_encoding(req.headers.get('accept-encoding'))
+        if encoding and should_compress('text/html', content_length):
+            parts = [compress(b"".join(parts), encoding)]
+            content_length = len(parts[0])
+        else:
+            encoding = None
 
         # Build response header
-        response_header = (
-            "HTTP/1.1 200 OK\r\n"
-            "Content-Type: text/html; charset=utf-8\r\n"
-            f"Content-Length: {content_length}\r\n"
-            f"Date: {datetime.datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')}\r\n"
-            "Cache-Control: no-cache\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-        ).encode('utf-8')
+        writer = header_writer()
+        writer.start(200)
+        writer.header("Content-Type", "text/html; charset=utf-8")
+        writer.header("Content-Length", content_length)
+        if encoding:
+            writer.header("Content-Encoding", encoding)
+        writer.header("Vary", "Accept-Encoding")
+        writer.header("Date", current_date())
+        writer.header("Cache-Control", "no-cache")
+        writer.header("Connection", self.connection)
 
-        return response_header + content
+        parts.insert(0, writer.finish())
+        return b"".join(parts)
 
 
     def build_response(self, request):
         """
         Builds a full HTTP response including headers and content based on the request.
 
+        Static files are looked up in :data:`STATIC_CACHE`, which revalidates
+        them with one ``stat``. The response carries the cached ``ETag`` and
+        ``Last-Modified`` validators, and a conditional GET matching them is
+        answered with 304. Small files are served from memory, compressed with
+        the coding negotiated from ``Accept-Encoding`` when their type allows it;
+        files too large to be cached are sent as a :class:`FileBody <FileBody>`
+        that the adapter writes with ``sendfile``, so their content is never
+        copied through Python. A GET with a ``Range`` header is answered by
+        :meth:`build_partial`.
+
         :params request (class:`Request <Request>`): incoming request object.
 
-        :rtype bytes: complete HTTP response using prepared headers and content.
+        :rtype bytes | iterable: the encoded response, or the encoded header and
+                                 the file body for a large file.
         """
 
         path = request.path
 
         mime_type = self.get_mime_type(path)
-        print("[Response] {} path {} mime_type {}".format(request.method, request.path, mime_type))
+        log.debug("%s path %s mime_type %s", request.method, request.path, mime_type)
 
         base_dir = ""
 
@@ -446,7 +958,132 @@ class Response():
         else:
             return self.build_notfound()
 
-        c_len, self._content = self.build_content(path, base_dir)
-        self._header = self.build_response_header(request)
+        filepath = self.resolve_path(path, base_dir)
+        entry = STATIC_CACHE.lookup(filepath) if filepath is not None else None
+        if entry is None:
+            return self.build_notfound()
+
+        self.headers['Accept-Ranges'] = 'bytes'
+        ranges = None
+        range_header = request.headers.get('range')
+        if range_header and request.method == 'GET':
+            if_range = request.headers.get('if-range')
+            if if_range is None or if_range_matches(if_range, entry.etag, entry.last_modified):
+                ranges = parse_range(range_header, entry.size)
+
+        content = entry.content
+        encoding = None
+        if ranges is None and content is not None and should_compress(self.headers['Content-Type'], entry.size):
+            self.headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+            if encoding:
+                variant = STATIC_CACHE.compressed(entry, encoding)
+                if variant is None:
+                    encoding = None
+                else:
+                    content = variant
+                    self.headers['Content-Encoding'] = encoding
+
+        etag = entry.etag_for(encoding)
+        self.headers['ETag'] = etag
+        self.headers['Last-Modified'] = entry.last_modified
+        if request.method in ('GET', 'HEAD') and is_not_modified(request.headers, entry, etag):
+            return self.build_not_modified()
+
+        if ranges is not None:
+            return self.build_partial(request, entry, ranges, path, base_dir)
+
+        if content is not None:
+            self._content = content
+            self._header = self.build_response_header(request)
+            return self._header + self._content
+
+        f, size = self.open_content(path, base_dir)
+        if f is None:
+            return self.build_notfound()
+
+        self._header = self.build_response_header(request, size)
+
+        return self._file_response(self._header, FileBody(f, 0, size))
+
+
+    def build_partial(self, request, entry, ranges, path, base_dir):
+        """
+        Builds a 206 Partial Content response for the byte spans of a ``Range``
+        request. One span is sent with a ``Content-Range`` header, several
+        spans as a ``multipart/byteranges`` body. Only the requested bytes are
+        sent: from memory for a cached file, otherwise as
+        :class:`FileBody <FileBody>` spans written with ``sendfile``.
 
-        return self._header + self._content
+        :params request (class:`Request <Request>`): incoming request object.
+        :params entry (CacheEntry): current version of the file.
+        :params ranges (list): (first, last) spans from :func:`parse_range`.
+        :params path (str): relative path to the file.
+        :params base_dir (str): base directory where the file is located.
+
+        :rtype bytes | iterable: the encoded response, or its pieces for an
+                                 uncached file.
+        """
+
+        size = entry.size
+        if not ranges:
+            return self.build_range_not_satisfiable(size)
+
+        f = None
+        content = entry.content
+        if content is None:
+            f, size = self.open_content(path, base_dir)
+            if f is None:
+                return self.build_notfound()
+
+        def span(start, end):
+            if f is not None:
+                return FileBody(f, start, end - start + 1)
+            return content[start:end + 1]
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers['Content-Range'] = "bytes {}-{}/{}".format(start, end, size)
+            pieces = [span(start, end)]
+            length = end - start + 1
+        else:
+            content_type = self.headers['Content-Type']
+            boundary = secrets.token_hex(12)
+            self.headers['Content-Type'] = "multipart/byteranges; boundary={}".format(boundary)
+            pieces = []
+            length = 0
+            for start, end in ranges:
+                part_header = (
+                    f"\r\n--{boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n"
+                    "\r\n"
+                ).encode('utf-8')
+                pieces.append(part_header)
+                pieces.append(span(start, end))
+                length += len(part_header) + end - start + 1
+            closing = f"\r\n--{boundary}--\r\n".encode('utf-8')
+            pieces.append(closing)
+            length += len(closing)
+
+        self._header = self.build_response_header(request, length, status=206)
+        if f is None:
+            return self._header + b"".join(pieces)
+        return self._spans_response(self._header, pieces, f)
+
+
+    def _file_response(self, header, body):
+        try:
+            yield header
+            yield body
+        finally:
+            body.close()
+
+
+    def _spans_response(self, header, pieces, file):
+        try:
+            yield header
+            for piece in pieces:
+                yield piece
+        finally:
+            file.close()
@@ -0,0 +1,283 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.router
+~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`Router <Router>` behind :meth:`WeApRous.route`.
+
+Route patterns are split into path segments and compiled into a tree. A
+segment is either a literal (``chat``) or a typed parameter:
+
+- ``<name>`` or ``<str:name>``: one non-empty segment,
+- ``<int:name>``: one segment of digits, converted to ``int``,
+- ``<float:name>``: one segment converted to a finite ``float``,
+- ``<path:name>``: the rest of the path, slashes included.
+
+Looking up a request walks one tree level per path segment, so its cost
+depends on the depth of the path and not on the number of routes. Literal
+segments are tried before parameters, and ``int`` parameters before ``str``
+ones. A path that matches a route registered for other methods only is
+reported with the allowed methods, so the caller can answer 405 instead of
+404.
+
+Usage::
+
+  >>> router = Router()
+  >>> router.add("/chat/<ip>/<int:port>", ["GET", "POST"], chat)
+  >>> router.compile()
+  >>> router.match("GET", "/chat/10.0.0.2/9001")
+  (<function chat>, {'ip': '10.0.0.2', 'port': 9001}, ())
+  >>> router.match("PUT", "/chat/10.0.0.2/9001")
+  (None, {}, ('GET', 'POST'))
+"""
+
+import math
+import re
+import urllib.parse
+
+from .middleware import as_middleware, pipeline
+
+PARAMETER_PATTERN = re.compile(r"^<(?:(\w+):)?(\w+)>$")
+
+
+def _to_str(segment):
+    if not segment:
+        raise ValueError("Empty path segment")
+    return segment
+
+
+def _to_int(segment):
+    if not segment.isdigit():
+        raise ValueError("Not an integer segment: {}".format(segment))
+    return int(segment)
+
+
+def _to_float(segment):
+    value = float(segment)
+    if not math.isfinite(value):
+        raise ValueError("Not a finite number segment: {}".format(segment))
+    return value
+
+
+#: Converters of the typed parameters, with their priority when several
+#: parameters could match the same segment (lower is tried first).
+CONVERTERS = {
+    "int": (_to_int, 0),
+    "float": (_to_float, 1),
+    "str": (_to_str, 2),
+}
+_PRIORITY = {convert: priority for convert, priority in CONVERTERS.values()}
+
+
+def split_path(path):
+    """
+    Splits a path into its non-empty, percent-decoded segments.
+
+    :param path (str): request path without the query string.
+
+    :rtype list: the segments, empty for ``/``.
+    """
+    return [urllib.parse.unquote(segment) for segment in path.split('/') if segment]
+
+
+class RouteNode:
+    """A node of the routing tree: one path segment of one or several routes.
+
+    :attrs static (dict): literal segment to child node.
+    :attrs params (list): (name, converter, child) of the parameter children, by priority.
+    :attrs catchall (tuple): (name, child) of a ``<path:name>`` child, or None.
+    :attrs handlers (dict): method to handler of the routes ending here.
+    """
+
+    __attrs__ = [
+        "static",
+        "params",
+        "catchall",
+        "handlers",
+    ]
+
+    def __init__(self):
+        self.static = {}
+        self.params = []
+        self.catchall = None
+        self.handlers = {}
+
+
+class Router(dict):
+    """The :class:`Router <Router>` object, a route table compiled into a
+    tree of path segments.
+
+    The table itself stays a dictionary ``{(METHOD, pattern): handler}``, the
+    shape :class:`WeApRous <WeApRous>` always exposed as ``app.routes``. The
+    tree is rebuilt by :meth:`compile` and dropped whenever a route is added.
+    The tree holds each handler composed with its middleware chain, see
+    :mod:`daemon.middleware`.
+
+    :attrs middleware (list): middleware of every route, outermost first.
+    :attrs route_middleware (dict): middleware of single routes, keyed like the table.
+    """
+
+    def __init__(self, routes=None):
+        super().__init__()
+        self._root = None
+        self.middleware = []
+        self.route_middleware = {}
+        if routes:
+            for key, handler in routes.items():
+                self[key] = handler
+            if isinstance(routes, Router):
+                self.middleware.extend(routes.middleware)
+                self.route_middleware.update(routes.route_middleware)
+
+    def __setitem__(self, key, handler):
+        method, pattern = key
+        super().__setitem__((method.upper(), pattern), handler)
+        self._root = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.route_middleware.pop(key, None)
+        self._root = None
+
+    def add(self, pattern, methods, handler, middleware=None):
+        """
+        Registers a handler for a route pattern and a set of methods.
+
+        :param pattern (str): route pattern, e.g. ``/chat/<ip>/<int:port>``.
+        :param methods (list): HTTP methods served by the handler.
+        :param handler (callable): route hook.
+        :param middleware (list, optional): middleware of this route only, run
+                                            after the middleware of every route.
+        """
+        chain = [as_middleware(item) for item in middleware or ()]
+        for method in methods:
+            self[(method, pattern)] = handler
+            if chain:
+                self.route_middleware[(method.upper(), pattern)] = chain
+            else:
+                self.route_middleware.pop((method.upper(), pattern), None)
+
+    def use(self, middleware):
+        """
+        Appends a middleware to the chain of every route.
+
+        :param middleware (Middleware | callable): the middleware, a function
+                                                   being a ``before`` step.
+
+        :rtype Middleware: the registered middleware.
+        """
+        middleware = as_middleware(middleware)
+        self.middleware.append(middleware)
+        self._root = None
+        return middleware
+
+    def compile(self):
+        """
+        Builds the routing tree from the route table. It is called once at
+        startup; :meth:`match` compiles on demand if routes were added since.
+
+        :rtype Router: the router itself.
+
+        :raises ValueError: If a pattern uses an unknown converter, or two
+                            routes bind the same method to the same pattern.
+        """
+        root = RouteNode()
+        for (method, pattern), handler in self.items():
+            node = root
+            segments = [segment for segment in pattern.split('/') if segment]
+            for index, segment in enumerate(segments):
+                node = self._child(node, segment, pattern, index == len(segments) - 1)
+            registered = node.handlers.get(method)
+            if registered is not None and getattr(registered, "__wrapped__", registered) is not handler:
+                raise ValueError("Conflicting routes for {} {}".format(method, pattern))
+            chain = self.middleware + self.route_middleware.get((method, pattern), [])
+            node.handlers[method] = pipeline(handler, chain)
+        self._root = root
+        return self
+
+    def _child(self, node, segment, pattern, last):
+        parameter = PARAMETER_PATTERN.match(segment)
+        if parameter is None:
+            return node.static.setdefault(segment, RouteNode())
+
+        kind, name = parameter.group(1) or "str", parameter.group(2)
+        if kind == "path":
+            if not last:
+                raise ValueError("<path:{}> must end the route {}".format(name, pattern))
+            if node.catchall is None:
+                node.catchall = (name, RouteNode())
+            return node.catchall[1]
+
+        if kind not in CONVERTERS:
+            raise ValueError("Unknown converter {} in route {}".format(kind, pattern))
+        convert = CONVERTERS[kind][0]
+        for other_name, other_convert, child in node.params:
+            if other_name == name and other_convert is convert:
+                return child
+        child = RouteNode()
+        node.params.append((name, convert, child))
+        node.params.sort(key=lambda item: _PRIORITY[item[1]])
+        return child
+
+    def match(self, method, path):
+        """
+        Resolves the handler of a request.
+
+        :param method (str): request method.
+        :param path (str): request path without the query string.
+
+        :rtype tuple: (handler, params, allowed). ``handler`` is None when no
+                      route matches; ``allowed`` then lists the methods of the
+                      route matching the path, if any (405), or is empty (404).
+        """
+        root = self._root
+        if root is None:
+            root = self.compile()._root
+
+        params = {}
+        node = self._find(root, split_path(path), 0, params)
+        if node is None:
+            return None, {}, ()
+        handler = node.handlers.get(method)
+        if handler is None:
+            return None, {}, tuple(sorted(node.handlers))
+        return handler, params, ()
+
+    def _find(self, node, segments, index, params):
+        if index == len(segments):
+            return node if node.handlers else None
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._find(child, segments, index + 1, params)
+            if found is not None:
+                return found
+
+        for name, convert, child in node.params:
+            try:
+                params[name] = convert(segment)
+            except ValueError:
+                continue
+            found = self._find(child, segments, index + 1, params)
+            if found is not None:
+                return found
+            del params[name]
+
+        if node.catchall is not None:
+            name, child = node.catchall
+            if child.handlers:
+                params[name] = "/".join(segments[index:])
+                return child
+        return None
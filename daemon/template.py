@@ -0,0 +1,160 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.template
+~~~~~~~~~~~~~~~~~
+
+This module provides the precompiled templates behind the ``"placeholder"``
+hook results.
+
+A page such as ``www/chat.html`` is parsed once into a list of literal byte
+segments and numbered slots (``{{ placeholder_0 }}``, ``{{ placeholder_1 }}``,
+...). Rendering only encodes the inserted values and joins the segments, so
+its cost is linear in the page size whatever the number of placeholders.
+Compiled templates are kept by :class:`TemplateLoader <TemplateLoader>` and
+recompiled when the file mtime or size changes.
+
+Usage::
+
+  >>> template = TEMPLATES.get("www/chat.html")
+  >>> parts = template.render_parts(("10.0.0.2:9001", "<p>hi</p>"))
+  >>> body = b"".join(parts)
+"""
+
+import html
+import os
+import re
+import threading
+
+#: Slot syntax, the number is the index in the placeholder tuple.
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*placeholder_(\d+)\s*\}\}")
+
+
+class Template:
+    """The :class:`Template <Template>` object, a page split into literal
+    segments and placeholder slots.
+
+    :attrs segments (list): literal ``bytes`` segments and ``int`` slot indices, in order.
+    :attrs slots (int): number of slots in the page.
+    """
+
+    __attrs__ = [
+        "segments",
+        "slots",
+    ]
+
+    def __init__(self, source):
+        """
+        Compiles a template.
+
+        :param source (str): template text.
+        """
+        self.segments = []
+        self.slots = 0
+        self._markers = {}
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            if match.start() > position:
+                self.segments.append(source[position:match.start()].encode('utf-8'))
+            index = int(match.group(1))
+            self.segments.append(index)
+            # Kept to render an unfilled slot as it was written.
+            self._markers.setdefault(index, match.group(0).encode('utf-8'))
+            self.slots += 1
+            position = match.end()
+        if position < len(source):
+            self.segments.append(source[position:].encode('utf-8'))
+
+    def render_parts(self, values, escape=False):
+        """
+        Fills the slots without concatenating the page.
+
+        :param values (tuple): placeholder values, ``values[i]`` fills ``placeholder_i``.
+        :param escape (bool): HTML-escape the values before inserting them.
+
+        :rtype list: bytes pieces of the rendered page.
+        """
+        encoded = []
+        for value in values:
+            value = str(value)
+            if escape:
+                value = html.escape(value)
+            encoded.append(value.encode('utf-8'))
+
+        count = len(encoded)
+        markers = self._markers
+        return [
+            segment if segment.__class__ is bytes
+            else encoded[segment] if segment < count
+            else markers[segment]
+            for segment in self.segments
+        ]
+
+    def render(self, values, escape=False):
+        """
+        Renders the page in one join.
+
+        :param values (tuple): placeholder values.
+        :param escape (bool): HTML-escape the values before inserting them.
+
+        :rtype bytes: the rendered page.
+        """
+        return b"".join(self.render_parts(values, escape))
+
+
+class TemplateLoader:
+    """The :class:`TemplateLoader <TemplateLoader>` object, a cache of
+    compiled templates keyed by file path and invalidated by mtime and size.
+    """
+
+    __attrs__ = [
+        "templates",
+    ]
+
+    def __init__(self):
+        #: Path to (mtime_ns, size, template).
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the compiled template of a file, compiling it on first use
+        or when the file changed on disk.
+
+        :param path (str): template file path.
+
+        :rtype Template: the compiled template.
+
+        :raises OSError: If the file can not be read.
+        """
+        st = os.stat(path)
+        cached = self.templates.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        with open(path, encoding='utf-8') as f:
+            template = Template(f.read())
+            st = os.fstat(f.fileno())
+        with self._lock:
+            self.templates[path] = (st.st_mtime_ns, st.st_size, template)
+        return template
+
+    def clear(self):
+        """Drops every compiled template."""
+        with self._lock:
+            self.templates.clear()
+
+
+#: Process-wide template cache used by :class:`Response <Response>`.
+TEMPLATES = TemplateLoader()
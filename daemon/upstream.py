@@ -0,0 +1,586 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.upstream
+~~~~~~~~~~~~~~~~~
+
+This module provides the pools of persistent backend connections of the
+proxy and the relay streaming requests and responses through them.
+
+Each backend (``proxy_pass`` address of ``config/proxy.conf``) has an
+:class:`UpstreamPool <UpstreamPool>` of idle keep-alive connections. A
+relayed request takes the most recently used one, or connects when there
+is none, and gives it back once the whole response went through.
+
+Bodies are not buffered: the request body is written to the backend as it
+arrives from the client, and the response body to the client as it arrives
+from the backend, each through one preallocated buffer filled with
+``recv_into``. A :class:`BodyFramer <BodyFramer>` finds where a body ends
+(``Content-Length``, chunked encoding or the close of the backend) without
+decoding it. Every write blocks until the receiving side takes the bytes,
+so a slow reader holds back the sender instead of growing memory.
+
+An idle connection is dropped when it
+
+- stayed idle longer than ``idle_timeout``, which should be below the
+  keep-alive timeout of the backends (5 s),
+- is older than ``max_lifetime``,
+- would be the ``max_idle + 1``-th idle connection of its backend,
+- fails the health check: the backend closed it or sent unexpected bytes.
+
+A request failing on a reused connection before any response byte arrived
+(the backend closed it meanwhile) is sent again on a new connection, as
+long as its body was not streamed yet and either the send itself failed or
+its method is idempotent (:data:`IDEMPOTENT_METHODS`): the backend may have
+run a POST before closing. Otherwise the client gets a 502. Pool events are counted in
+``weaprous_proxy_upstream_connections_total``.
+
+Usage::
+
+  >>> pools = UpstreamPools(max_idle=32)
+  >>> head = read_message(conn, parser, limits, head_only=True)
+  >>> status, received, sent = pools.get("127.0.0.1", 9001).relay(conn, head, parser, limits)
+"""
+
+import collections
+import socket
+import threading
+import time
+
+from .reader import HttpParser, RequestError, parse_framing, MAX_HEADER_SIZE, CRLF, HEADER_TERMINATOR
+from .limits import DeadlineExceeded
+from .logger import get_logger
+from . import metrics
+
+log = get_logger("Upstream")
+
+#: Idle connections kept per backend.
+MAX_IDLE = 32
+#: Seconds a connection may stay idle in the pool.
+IDLE_TIMEOUT = 4
+#: Seconds a connection may be reused after it was opened.
+MAX_LIFETIME = 60
+#: Seconds to connect to a backend.
+CONNECT_TIMEOUT = 5
+#: Seconds a backend may take to send each part of its response.
+READ_TIMEOUT = 60
+
+#: Bytes of a body relayed at once, the buffer of each relaying thread.
+RELAY_BUFFER_SIZE = 65536
+
+#: Methods a backend may safely run twice, so their requests are sent again
+#: when a reused connection turns out closed.
+IDEMPOTENT_METHODS = (b"GET", b"HEAD", b"OPTIONS", b"PUT", b"DELETE")
+
+#: Headers describing the connection of one hop, never relayed.
+HOP_HEADERS = (b"connection", b"keep-alive")
+
+_buffers = threading.local()
+
+# States of a chunked body.
+_SIZE, _DATA, _DATA_END, _TRAILER = range(4)
+
+
+def relay_buffer():
+    """
+    Returns the relay buffer of the calling thread, allocated once.
+
+    :rtype bytearray: :data:`RELAY_BUFFER_SIZE` bytes.
+    """
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = bytearray(RELAY_BUFFER_SIZE)
+    return buffer
+
+
+class UpstreamError(ConnectionError):
+    """Raised when a backend can not be reached, or fails before the head
+    of its response was relayed to the client. ``status`` is the answer the
+    client should get: 404 when the backend is unreachable, 502 when it
+    failed on a request that may have run."""
+
+    def __init__(self, message, status=404):
+        super().__init__(message)
+        self.status = status
+
+
+class BodyFramer:
+    """Finds the end of a body relayed as is, without decoding it.
+
+    :attrs remaining (int): bytes left of a ``Content-Length`` body or of the current chunk.
+    :attrs chunked (bool): whether the body uses chunked encoding.
+    :attrs until_close (bool): whether the body ends when the sender closes.
+    :attrs done (bool): whether the end of the body was seen.
+    """
+
+    __slots__ = ("remaining", "chunked", "until_close", "done", "_state", "_line")
+
+    def __init__(self, length=0, chunked=False, until_close=False):
+        self.remaining = 0 if chunked else length
+        self.chunked = chunked
+        self.until_close = until_close
+        self.done = not (chunked or until_close or length)
+        self._state = _SIZE
+        self._line = bytearray()
+
+    def feed(self, data, start=0, end=None):
+        """
+        Takes received bytes, up to the end of the body.
+
+        :param data (bytearray): buffer holding the bytes.
+        :param start (int): offset of the first byte.
+        :param end (int): offset after the last byte, ``len(data)`` by default.
+
+        :rtype int: number of bytes from ``start`` belonging to the body; the
+                    bytes after them are not part of it.
+
+        :raises RequestError: If a chunk size line is invalid.
+        """
+        if end is None:
+            end = len(data)
+        if self.done:
+            return 0
+        if not self.chunked:
+            if self.until_close:
+                return end - start
+            taken = min(self.remaining, end - start)
+            self.remaining -= taken
+            self.done = not self.remaining
+            return taken
+
+        pos = start
+        while pos < end and not self.done:
+            if self._state in (_DATA, _DATA_END):
+                taken = min(self.remaining, end - pos)
+                pos += taken
+                self.remaining -= taken
+                if not self.remaining:
+                    if self._state == _DATA:
+                        # The CRLF after the chunk data.
+                        self._state, self.remaining = _DATA_END, 2
+                    else:
+                        self._state = _SIZE
+                continue
+
+            newline = data.find(b"\n", pos, end)
+            if newline < 0:
+                self._line += data[pos:end]
+                if len(self._line) > MAX_HEADER_SIZE:
+                    raise RequestError(400, "Bad Request", "Invalid chunk size line")
+                return end - start
+            self._line += data[pos:newline]
+            line = bytes(self._line).strip()
+            self._line.clear()
+            pos = newline + 1
+
+            if self._state == _TRAILER:
+                # Trailers end with an empty line.
+                self.done = not line
+                continue
+            try:
+                size = int(line.split(b";", 1)[0], 16)
+            except ValueError:
+                raise RequestError(400, "Bad Request", "Invalid chunk size")
+            if size:
+                self._state, self.remaining = _DATA, size
+            else:
+                self._state = _TRAILER
+        return pos - start
+
+
+class UpstreamConnection:
+    """A persistent connection to a backend and the parser of its responses.
+
+    :attrs sock (socket.socket): connected socket.
+    :attrs parser (HttpParser): parser of the response heads.
+    :attrs created (float): time.monotonic() of the connect.
+    :attrs last_used (float): time.monotonic() of the last response.
+    :attrs requests (int): requests answered on the connection.
+    """
+
+    __slots__ = ("sock", "parser", "created", "last_used", "requests")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.parser = HttpParser(max_body_size=None)
+        self.created = self.last_used = time.monotonic()
+        self.requests = 0
+
+    def healthy(self):
+        """
+        Checks, without blocking, that the backend did not close the idle
+        connection nor send anything on it.
+
+        :rtype bool: True if the connection can carry a request.
+        """
+        try:
+            self.sock.setblocking(False)
+            self.sock.recv(1, socket.MSG_PEEK)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def read_head(self, buffer):
+        """
+        Reads the head of the response to the request just sent; the first
+        bytes of its body stay in :attr:`parser`.
+
+        :param buffer (bytearray): relay buffer to receive into.
+
+        :rtype bytes: the head, or None if the backend closed the connection first.
+
+        :raises RequestError: If the head is too large.
+        :raises OSError: If the backend fails or is too slow.
+        """
+        parser = self.parser
+        while True:
+            head = parser.next_head()
+            if head is not None:
+                return head
+            received = self.sock.recv_into(buffer)
+            if not received:
+                return None
+            parser.feed(memoryview(buffer)[:received])
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class UpstreamPool:
+    """The :class:`UpstreamPool <UpstreamPool>` object, the idle keep-alive
+    connections of one backend.
+
+    :attrs host (str): backend IP address.
+    :attrs port (int): backend port.
+    :attrs address (str): "host:port", the ``backend`` label of the metrics.
+    :attrs max_idle (int): idle connections kept, 0 to close every connection.
+    :attrs idle_timeout (float): seconds a connection may stay idle.
+    :attrs max_lifetime (float): seconds a connection may be reused after its connect.
+    :attrs connect_timeout (float): seconds to connect.
+    :attrs read_timeout (float): seconds each read of a response may wait.
+    """
+
+    __attrs__ = [
+        "host",
+        "port",
+        "address",
+        "max_idle",
+        "idle_timeout",
+        "max_lifetime",
+        "connect_timeout",
+        "read_timeout",
+    ]
+
+    def __init__(self, host, port, max_idle=MAX_IDLE, idle_timeout=IDLE_TIMEOUT,
+                 max_lifetime=MAX_LIFETIME, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.address = "{}:{}".format(host, port)
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _event(self, event):
+        metrics.UPSTREAM_CONNECTIONS.inc((self.address, event))
+
+    def _expired(self, conn, now):
+        return (now - conn.last_used > self.idle_timeout
+                or now - conn.created > self.max_lifetime)
+
+    def acquire(self):
+        """
+        Takes the most recently used healthy idle connection, or connects.
+
+        :rtype UpstreamConnection: the connection, to be given back with :meth:`release`.
+
+        :raises OSError: If the backend can not be reached.
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                break
+            if self._expired(conn, now):
+                self._event("expired")
+                conn.close()
+            elif not conn.healthy():
+                self._event("stale")
+                conn.close()
+            else:
+                self._event("reused")
+                return conn
+
+        sock = socket.create_connection((self.host, self.port), self.connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._event("opened")
+        return UpstreamConnection(sock)
+
+    def release(self, conn, reusable=True):
+        """
+        Gives a connection back after a complete response.
+
+        :param conn (UpstreamConnection): connection taken by :meth:`acquire`.
+        :param reusable (bool): whether the response left the connection open.
+        """
+        conn.requests += 1
+        conn.last_used = now = time.monotonic()
+        if reusable and now - conn.created <= self.max_lifetime:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    return
+        self._event("discarded")
+        conn.close()
+
+    def relay(self, client, head, parser, limits=None, on_head=None):
+        """
+        Relays one request of a client to the backend and streams the
+        response back.
+
+        The request head is sent with ``Connection: keep-alive`` and its body
+        follows as it is received from the client; the response goes to the
+        client with ``Connection: close``, its body written as it comes.
+
+        :param client (socket.socket): client connection.
+        :param head (bytes): request head, without the blank line.
+        :param parser (HttpParser): client parser; its buffer holds the body
+                                    bytes received with the head.
+        :param limits (ConnectionLimits, optional): deadlines of the client connection.
+        :param on_head (callable, optional): called with the head of the response
+                                             before it is relayed.
+
+        :rtype tuple: (status, received, sent): status of the backend, bytes
+                      of the request relayed and bytes written to the client.
+
+        :raises UpstreamError: If the backend fails before the head of its response was relayed.
+        :raises DeadlineExceeded: If the client does not send its body in time.
+        :raises OSError: If the client fails, ``socket.timeout`` if it does not read in time.
+        """
+        buffer = relay_buffer()
+        method = head.split(b" ", 1)[0]
+        length, chunked = parse_framing(parser.headers)
+        body = BodyFramer(length, chunked)
+        pending = parser.buffer
+        taken = body.feed(pending)
+        first = relay_message(head, "keep-alive") + bytes(pending[:taken])
+        del pending[:taken]
+        # A request whose body came with its head can be sent again, when
+        # the backend did not get it or can safely run it twice.
+        replayable = body.done
+        idempotent = method in IDEMPOTENT_METHODS
+
+        while True:
+            try:
+                conn = self.acquire()
+            except OSError as e:
+                raise UpstreamError("Can not connect to {}: {}".format(self.address, e)) from e
+            reused = conn.requests > 0
+            received = len(first)
+            delivered = False
+            try:
+                try:
+                    conn.sock.settimeout(self.read_timeout)
+                    conn.sock.sendall(first)
+                except OSError as e:
+                    raise UpstreamError(str(e)) from e
+                delivered = True
+                if not body.done:
+                    received += self._stream_request(client, conn, body, buffer, limits)
+                try:
+                    response_head = conn.read_head(buffer)
+                except (OSError, RequestError) as e:
+                    raise UpstreamError(str(e)) from e
+                if response_head is None:
+                    raise UpstreamError("Backend {} closed the connection".format(self.address))
+            except UpstreamError as e:
+                conn.close()
+                if reused and replayable and not conn.parser.pending:
+                    if not delivered or idempotent:
+                        self._event("stale")
+                        continue
+                    raise UpstreamError("{}, {} not sent again".format(
+                        e, method.decode('latin-1')), 502) from e
+                if delivered:
+                    e.status = 502
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        try:
+            if on_head is not None:
+                on_head(response_head)
+            status, sent = self._stream_response(client, conn, method, response_head,
+                                                 buffer, limits)
+        except BaseException:
+            conn.close()
+            raise
+        return status, received, sent
+
+    def _stream_request(self, client, conn, body, buffer, limits):
+        # Client body to backend, within the body deadline of the client.
+        view = memoryview(buffer)
+        timeout = None if limits is None else limits.body_timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        relayed = 0
+        while not body.done:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("body_timeout")
+                client.settimeout(remaining)
+            try:
+                received = client.recv_into(buffer)
+            except socket.timeout:
+                raise DeadlineExceeded("body_timeout") from None
+            if not received:
+                raise ConnectionError("Client closed before the end of its body")
+            taken = body.feed(buffer, 0, received)
+            try:
+                conn.sock.sendall(view[:taken])
+            except OSError as e:
+                raise UpstreamError(str(e)) from e
+            relayed += taken
+        return relayed
+
+    def _stream_response(self, client, conn, method, head, buffer, limits):
+        # Backend response to client. Once its head is written, a failing
+        # backend can only cut the response short.
+        parser = conn.parser
+        headers = parser.headers
+        status = (head.split(b" ", 2) + [b""])[1]
+        if method == b"HEAD" or status[:1] == b"1" or status in (b"204", b"304"):
+            body = BodyFramer()
+        else:
+            try:
+                length, chunked = parse_framing(headers)
+            except RequestError as e:
+                raise UpstreamError(str(e)) from e
+            body = BodyFramer(length, chunked,
+                              until_close=not chunked and headers.raw("content-length") is None)
+        connection = headers.raw("connection") or b""
+        reusable = (head.startswith(b"HTTP/1.1 ") and b"close" not in connection.lower()
+                    and not body.until_close)
+
+        pending = parser.buffer
+        taken = body.feed(pending)
+        first = relay_message(head) + bytes(pending[:taken])
+        del pending[:taken]
+        if limits is not None:
+            client.settimeout(limits.write_timeout)
+        client.sendall(first)
+        sent = len(first)
+
+        view = memoryview(buffer)
+        while not body.done:
+            try:
+                received = conn.sock.recv_into(buffer)
+                taken = body.feed(buffer, 0, received)
+            except (OSError, RequestError) as e:
+                log.warning("Backend %s failed in the middle of a response: %s", self.address, e)
+                conn.close()
+                return metrics.status_of(head), sent
+            if not received:
+                if body.until_close:
+                    break
+                log.warning("Backend %s closed in the middle of a response", self.address)
+                conn.close()
+                return metrics.status_of(head), sent
+            client.sendall(view[:taken])
+            sent += taken
+            if taken < received:
+                reusable = False
+
+        self.release(conn, reusable and not parser.buffer)
+        return metrics.status_of(head), sent
+
+    def close(self):
+        """Closes the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, collections.deque()
+        for conn in idle:
+            conn.close()
+
+
+class UpstreamPools:
+    """The :class:`UpstreamPools <UpstreamPools>` object, the pools of the
+    backends of one proxy, created on first use with the same settings.
+
+    :attrs options (dict): keyword arguments of every :class:`UpstreamPool <UpstreamPool>`.
+    """
+
+    __attrs__ = [
+        "options",
+    ]
+
+    def __init__(self, **options):
+        self.options = options
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, port):
+        """
+        Returns the pool of a backend.
+
+        :param host (str): backend IP address.
+        :param port (int): backend port.
+
+        :rtype UpstreamPool: the pool.
+        """
+        pool = self._pools.get((host, port))
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get((host, port))
+                if pool is None:
+                    pool = self._pools[(host, port)] = UpstreamPool(host, port, **self.options)
+        return pool
+
+    def close(self):
+        """Closes the idle connections of every backend."""
+        for pool in list(self._pools.values()):
+            pool.close()
+
+
+def relay_message(head, connection="close"):
+    """
+    Rewrites the head of a request or response relayed between the client
+    and a backend. The hop-by-hop connection headers are replaced; the
+    framing headers are kept since the body is streamed as it was received.
+
+    :param head (bytes): start line and headers, without the blank line.
+    :param connection (str): value of the ``Connection`` header for the next hop.
+
+    :rtype bytes: the head, with its terminating blank line.
+    """
+    lines = head.split(CRLF)
+    kept = [lines[0]]
+    for line in lines[1:]:
+        if line.partition(b":")[0].strip().lower() not in HOP_HEADERS:
+            kept.append(line)
+    kept.append(b"Connection: " + connection.encode())
+    return CRLF.join(kept) + HEADER_TERMINATOR
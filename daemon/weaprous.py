@@ -18,9 +18,35 @@ This module provides a WeApRous object to deploy RESTful url web app with routin
 """
 
 from .backend import create_backend
+from .router import Router
+from .middleware import BeforeHook, AfterHook
+from .workerpool import DEFAULT_POOL_SIZE, DEFAULT_QUEUE_SIZE
+from .prefork import run_prefork, shared_dict
 from .proxy import parse_virtual_hosts
+from .logger import get_logger
+import inspect
 import threading
 
+log = get_logger("WeApRous")
+
+def accepts_request(func):
+    """
+    Tells whether a route handler takes the :class:`Request <Request>` object,
+    i.e. declares a ``request`` parameter or ``**kwargs``.
+
+    :param func (callable): route handler.
+
+    :rtype bool: True if the handler should be called with ``request=``.
+    """
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    if "request" in parameters:
+        return True
+    return any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
     mutable web application router for deploying RESTful URL endpoints.
@@ -42,6 +68,22 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> @app.route('/chat/<ip>/<int:port>', methods=['GET', 'POST'])
+      >>> def chat(headers, body):
+      >>>     ip, port = headers['params']['ip'], headers['params']['port']
+
+      >>> @app.route('/echo', methods=['POST'])
+      >>> def echo(headers, body, request):
+      >>>     return {'json': {'received': request.json}}
+
+      >>> @app.before_request
+      >>> def load_user(request):
+      >>>     request.context['user'] = sessions.get((request.cookies or {}).get('session_id'))
+
+      >>> @app.route('/me', methods=['GET'], middleware=[login_required])
+      >>> def me(headers, body):
+      >>>     return {'json': {'user': headers['context']['user']}}
+
       >>> app.run()
     """
 
@@ -51,7 +93,7 @@ class WeApRous:
 
         Sets up an empty route registry and prepares placeholders for IP and port.
         """
-        self.routes = {}
+        self.routes = Router()
         self.ip = None
         self.port = None
         return
@@ -66,66 +108,181 @@ class WeApRous:
         self.ip = ip
         self.port = port
 
-    def route(self, path, methods=['GET']):
+    def route(self, path, methods=['GET'], middleware=None):
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
-        :param path (str): The URL path to route.
+        The path may contain typed parameters (``<name>``, ``<int:name>``,
+        ``<float:name>``, ``<path:name>``, see :mod:`daemon.router`); their values
+        are passed to the handler in ``headers["params"]``.
+
+        :param path (str): The URL path to route, e.g. ``/chat/<ip>/<int:port>``.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
+        :param middleware (list): Middleware of this route only, run after the
+                                  middleware of the app, see :mod:`daemon.middleware`.
+                                  A function is a ``before`` step.
 
         :rtype: function - A decorator that registers the handler function.
         """
         def decorator(func):
-            for method in methods:
-                self.routes[(method.upper(), path)] = func
+            self.routes.add(path, methods, func, middleware)
 
             # Optional attach route metadata to the function
             func._route_path = path
             func._route_methods = methods
+            func._accepts_request = accepts_request(func)
 
             return func
         return decorator
 
-    def run(self):
+    def use(self, middleware):
+        """
+        Add a middleware to the chain run around every route of the app.
+
+        :param middleware (Middleware): object with ``before(request)`` and
+                                        ``after(request, result)`` steps, see
+                                        :mod:`daemon.middleware`.
+
+        :rtype Middleware: the registered middleware.
+        """
+        return self.routes.use(middleware)
+
+    def before_request(self, func):
+        """
+        Decorator to run a function before every route hook of the app.
+
+        The function takes the :class:`Request <Request>`; it may store values in
+        ``request.context`` and may answer the request itself by returning a
+        hook result.
+
+        :param func (callable): the ``before`` step.
+
+        :rtype: function - the function itself.
+        """
+        self.routes.use(BeforeHook(func))
+        return func
+
+    def after_request(self, func):
+        """
+        Decorator to run a function after every route hook of the app.
+
+        The function takes the :class:`Request <Request>` and the hook result,
+        and returns a new result or None to keep it.
+
+        :param func (callable): the ``after`` step.
+
+        :rtype: function - the function itself.
+        """
+        self.routes.use(AfterHook(func))
+        return func
+
+    def shared_state(self, initial=None):
+        """
+        Create a dictionary shared by every prefork worker of the app.
+
+        Module-level state is copied into each worker process and diverges
+        afterwards, so state that must stay consistent across workers (e.g.
+        sessions) should be created here before :meth:`run` is called.
+        Nested mutable values are copies: assign them back after mutating.
+        See :mod:`daemon.prefork`.
+
+        :param initial (dict, optional): initial content.
+
+        :rtype: dict-like proxy shared across worker processes.
+        """
+        return shared_dict(initial)
+
+    def run(self, pool_size=DEFAULT_POOL_SIZE, queue_size=DEFAULT_QUEUE_SIZE, engine="thread",
+            workers=1, metrics_path=None, profile_path=None, profile_sample=None):
         """
         Start the backend server and begin handling requests.
 
         This method launches the TCP server using the configured IP and port,
         and dispatches incoming requests to the registered route handlers.
 
+        :param pool_size (int): Number of worker threads serving requests.
+        :param queue_size (int): Depth of the accept queue feeding the workers.
+        :param engine (str): "thread" (worker pool) or "async" (event loop).
+        :param workers (int): Number of prefork worker processes sharing the
+                              address through SO_REUSEPORT. Defaults to 1 (no fork).
+        :param metrics_path (str): Path of an extra route serving the metrics in
+                                   the Prometheus text format, e.g. "/metrics".
+        :param profile_path (str): Path of an admin route reporting the sampled
+                                   profiles, e.g. "/profile".
+        :param profile_sample (int): Profile 1 request out of N with cProfile.
+
         :raise: Error if IP or port has not been configured.
         """
         if not self.ip or not self.port:
-            print("Rous app need to preapre address"
-                  "by calling app.prepare_address(ip,port)")
+            log.error("Rous app need to prepare address "
+                      "by calling app.prepare_address(ip,port)")
 
-        create_backend(self.ip, self.port, self.routes)
+        self.routes.compile()
+        options = {"pool_size": pool_size, "queue_size": queue_size, "engine": engine,
+                   "metrics_path": metrics_path, "profile_path": profile_path,
+                   "profile_sample": profile_sample}
+        if workers > 1:
+            address = "{}:{}".format(self.ip, self.port)
+            spec = (address, create_backend, (self.ip, self.port, self.routes),
+                    dict(options, reuse_port=True))
+            run_prefork([spec], workers)
+            return
 
+        create_backend(self.ip, self.port, self.routes, **options)
 
-    def run_proxy(self):
+
+    def run_proxy(self, pool_size=DEFAULT_POOL_SIZE, queue_size=DEFAULT_QUEUE_SIZE, engine="thread",
+                  workers=1, metrics_path=None, profile_path=None, profile_sample=None):
         """
         Start the backend server and begin handling requests.
 
         This method launches the TCP server using the configured IP and port,
         and dispatches incoming requests to the registered route handlers.
 
+        :param pool_size (int): Number of worker threads of each backend.
+        :param queue_size (int): Depth of the accept queue of each backend.
+        :param engine (str): "thread" (worker pool) or "async" (event loop).
+        :param workers (int): Number of prefork worker processes per backend
+                              address. With 1 (default) the backends run as
+                              threads of this process and share its GIL.
+        :param metrics_path (str): Path of an extra route serving the metrics of
+                                   each backend, e.g. "/metrics".
+        :param profile_path (str): Path of an admin route reporting the sampled
+                                   profiles of each backend, e.g. "/profile".
+        :param profile_sample (int): Profile 1 request out of N with cProfile.
+
         :raise: Error if IP or port has not been configured.
         """
         if not self.ip or not self.port:
-            print("Rous app need to preapre address"
-                  "by calling app.prepare_address(ip,port)")
+            log.error("Rous app need to prepare address "
+                      "by calling app.prepare_address(ip,port)")
             
         proxy_routes = parse_virtual_hosts("config/proxy.conf")
         proxy_map, policy = proxy_routes[f"{self.ip}:{self.port}"]
+        self.routes.compile()
+        options = {"pool_size": pool_size, "queue_size": queue_size, "engine": engine,
+                   "metrics_path": metrics_path, "profile_path": profile_path,
+                   "profile_sample": profile_sample}
+
+        if workers > 1:
+            backends = proxy_map if isinstance(proxy_map, list) else [proxy_map]
+            specs = []
+            for backend in backends:
+                proxy_host, proxy_port = backend.split(":", 1)
+                specs.append((backend, create_backend, (proxy_host, int(proxy_port), self.routes),
+                              dict(options, reuse_port=True)))
+            run_prefork(specs, workers)
+            return
+
         if isinstance(proxy_map, list):
             for backend in proxy_map:
                 proxy_host, proxy_port = backend.split(":", 1)
                 backend_thread = threading.Thread(
                     target=create_backend, 
-                    args=(proxy_host, int(proxy_port), self.routes)
+                    args=(proxy_host, int(proxy_port), self.routes),
+                    kwargs=options
                 )
                 backend_thread.start()
         else:
             proxy_host, proxy_port = proxy_map.split(":", 1)
-            create_backend(proxy_host, int(proxy_port), self.routes)
-        
+            create_backend(proxy_host, int(proxy_port), self.routes, **options)
@@ -0,0 +1,163 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.workerpool
+~~~~~~~~~~~~~~~~~
+
+This module provides a fixed-size pool of worker threads fed by a bounded
+queue. The accept loop of a daemon submits accepted connections to the pool
+instead of spawning one thread per connection, so the number of threads stays
+constant under load. When the queue is full the submission is rejected and the
+caller is expected to answer the client cheaply (e.g. with a 503).
+"""
+
+import queue
+import threading
+
+from .logger import get_logger
+
+log = get_logger("WorkerPool")
+
+#: Default number of worker threads per daemon.
+DEFAULT_POOL_SIZE = 32
+#: Default number of accepted connections waiting for a free worker.
+DEFAULT_QUEUE_SIZE = 128
+
+
+class WorkerPool:
+    """The :class:`WorkerPool <WorkerPool>` object, which runs a handler
+    on a fixed number of threads fed by a bounded task queue.
+
+    Usage::
+
+      >>> pool = WorkerPool(handle_client, size=8, queue_size=64)
+      >>> pool.start()
+      >>> if not pool.submit(ip, port, conn, addr, routes):
+      >>>     conn.sendall(SERVICE_UNAVAILABLE)
+      >>> pool.stats()
+      {'pool_size': 8, 'busy_workers': 1, 'queue_depth': 0, ...}
+    """
+
+    __attrs__ = [
+        "handler",
+        "size",
+        "queue_size",
+        "name",
+        "tasks",
+        "workers",
+        "busy",
+        "completed",
+        "rejected",
+    ]
+
+    def __init__(self, handler, size=DEFAULT_POOL_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE, name="Worker"):
+        """
+        Initialize a new WorkerPool instance.
+
+        :param handler (callable): function executed for every submitted task.
+        :param size (int): number of worker threads.
+        :param queue_size (int): maximum number of pending tasks.
+        :param name (str): prefix used for the worker thread names.
+        """
+        if size < 1:
+            raise ValueError("Worker pool size must be positive: {}".format(size))
+        if queue_size < 1:
+            raise ValueError("Worker queue size must be positive: {}".format(queue_size))
+
+        #: Task handler.
+        self.handler = handler
+        #: Number of worker threads.
+        self.size = size
+        #: Maximum pending tasks.
+        self.queue_size = queue_size
+        #: Thread name prefix.
+        self.name = name
+        #: Bounded task queue.
+        self.tasks = queue.Queue(maxsize=queue_size)
+        #: Worker threads.
+        self.workers = []
+        #: Number of workers currently running a task.
+        self.busy = 0
+        #: Number of tasks finished.
+        self.completed = 0
+        #: Number of tasks rejected because the queue was full.
+        self.rejected = 0
+
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Spawns the worker threads."""
+        for index in range(self.size):
+            worker = threading.Thread(
+                target=self._run,
+                name="{}-{}".format(self.name, index),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+        return self
+
+    def submit(self, *args):
+        """
+        Queues a task without blocking.
+
+        :rtype bool: True if the task was queued, False if the queue is full.
+        """
+        try:
+            self.tasks.put_nowait(args)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            args = self.tasks.get()
+            with self._lock:
+                self.busy += 1
+            try:
+                self.handler(*args)
+            except Exception:
+                log.exception("%s worker error", self.name)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.completed += 1
+
+    @property
+    def queue_depth(self):
+        """Number of tasks waiting for a free worker."""
+        return self.tasks.qsize()
+
+    @property
+    def busy_workers(self):
+        """Number of workers currently running a task."""
+        return self.busy
+
+    def stats(self):
+        """
+        Snapshot of the live pool counters.
+
+        :rtype dict: pool size, busy workers, queue depth and task counters.
+        """
+        with self._lock:
+            return {
+                "pool_size": self.size,
+                "busy_workers": self.busy,
+                "queue_depth": self.tasks.qsize(),
+                "queue_size": self.queue_size,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
@@ -26,19 +26,38 @@ import random
 from urllib.parse import urlencode
 
 from daemon.weaprous import WeApRous
+from daemon.logger import get_logger
 
 PORT = 8000  # Default port
 
 app = WeApRous()
+log = get_logger("App")
 accounts = dict()               # map: username -> hash password
 session_to_account = dict()     # map: session id -> username
 account_to_address = dict()     # map: username -> (peer ip, peer port, local port)
 channels = dict()               # map: channel name -> ( peer address list, channel password )
 
 
+@app.before_request
+def resolve_session(request):
+    # Resolve the session cookie once per request; handlers and
+    # login_required read the user from the request context.
+    cookie = request.cookies or {}
+    username = None
+    if cookie.get("auth", "") == "true":
+        username = session_to_account.get(cookie.get("session_id", ""))
+    request.context["username"] = username
+
+
+def login_required(request):
+    # Answer 401 before the handler runs when no user is logged in.
+    if request.context["username"] is None:
+        return {"auth": "false"}
+
+
 @app.route('/login', methods=['POST'])
 def login_post(headers, body):
-    print(f"[App] login_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("login_post with\nHeader: %s\nBody: %s", headers, body)
 
     username, password = body["username"], body["password"]
     if (username == "admin" and password == "password") or (accounts.get(username, "") == hash(password)):
@@ -51,13 +70,13 @@ def login_post(headers, body):
 
 @app.route('/login', methods=['GET'])
 def login_get(headers, body):
-    print(f"[App] login_get with\nHeader: {headers}\nBody: {body}")
+    log.debug("login_get with\nHeader: %s\nBody: %s", headers, body)
     return {"auth": "true", "content": "/login.html"}
 
 
 @app.route('/register', methods=['POST'])
 def register_post(headers, body):
-    print(f"[App] register_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("register_post with\nHeader: %s\nBody: %s", headers, body)
 
     username, password = body["username"], body["password"]
     if username == "admin" or username in accounts:
@@ -74,13 +93,13 @@ def register_post(headers, body):
 
 @app.route('/register', methods=['GET'])
 def register_get(headers, body):
-    print(f"[App] register_get with\nHeader: {headers}\nBody: {body}")
+    log.debug("register_get with\nHeader: %s\nBody: %s", headers, body)
     return {"auth": "true", "content": "/register.html"}
 
 
 @app.route('/logout', methods=['POST'])
 def logout(headers, body):
-    print(f"[App] logout with\nHeader: {headers}\nBody: {body}")
+    log.debug("logout with\nHeader: %s\nBody: %s", headers, body)
     
     cookie = headers.get("cookie-pair", None)
     username = get_username(headers)
@@ -91,13 +110,9 @@ def logout(headers, body):
     return {"auth": "true", "redirect": "/login"}
 
 
-@app.route('/', methods=['GET'])
+@app.route('/', methods=['GET'], middleware=[login_required])
 def index(headers, body):
-    print(f"[App] index with\nHeader: {headers}\nBody: {body}")
-
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("index with\nHeader: %s\nBody: %s", headers, body)
     username = get_username(headers)
     functions = ""
     user_ip, user_port, user_local_port = account_to_address.get(username, (None, None, None))
@@ -115,7 +130,7 @@ def index(headers, body):
 
 @app.route('/submit-info', methods=['POST'])
 def submit_post(headers, body):
-    print(f"[App] submit_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("submit_post with\nHeader: %s\nBody: %s", headers, body)
 
     user_ip, user_port, user_local_port = body["ip"], body["port"], body["local-port"]
     
@@ -135,18 +150,15 @@ def submit_post(headers, body):
 
 @app.route('/submit-info', methods=['GET'])
 def submit_get(headers, body):
-    print(f"[App] submit_get with\nHeader: {headers}\nBody: {body}")
+    log.debug("submit_get with\nHeader: %s\nBody: %s", headers, body)
     if authenticate(headers):
         return {"auth": "true", "content": "/submit-info.html"}
     return {"auth": "false"}
 
 
-@app.route('/get-list', methods=['GET'])
+@app.route('/get-list', methods=['GET'], middleware=[login_required])
 def get_list(headers, body):
-    print(f"[App] get_list with\nHeader: {headers}\nBody: {body}")
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("get_list with\nHeader: %s\nBody: %s", headers, body)
     html_list_string = ""
     address_list = []
     current_username = get_username(headers)
@@ -190,12 +202,9 @@ def get_list(headers, body):
     return {"auth": "true", "content": "get-list.html", "placeholder": (html_list_string, broadcast)}
 
 
-@app.route('/channel', methods=['GET'])
+@app.route('/channel', methods=['GET'], middleware=[login_required])
 def channel_get(headers, body):
-    print(f"[App] channel_get with\nHeader: {headers}\nBody: {body}")
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("channel_get with\nHeader: %s\nBody: %s", headers, body)
     current_username = get_username(headers)
     joined_channel_html = ""
     available_channel_html = ""
@@ -231,12 +240,9 @@ def channel_get(headers, body):
     return {"auth": "true", "content": "channel-list.html", "placeholder": (joined_channel_html, available_channel_html)}
 
 
-@app.route('/connect-channel', methods=['POST'])
+@app.route('/connect-channel', methods=['POST'], middleware=[login_required])
 def connect_channel(headers, body):
-    print(f"[App] connect_channel with\nHeader: {headers}\nBody: {body}")
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("connect_channel with\nHeader: %s\nBody: %s", headers, body)
     channel_name = body.get("channel-name", "")
     
     if (not channel_name) or (channel_name not in channels):
@@ -258,12 +264,9 @@ def connect_channel(headers, body):
     return {"auth": "true", "temp_redirect": f"http://127.0.0.1:{local_port}/connect-channel", "temp_body": data}
 
 
-@app.route('/create-channel', methods=['POST'])
+@app.route('/create-channel', methods=['POST'], middleware=[login_required])
 def create_channel(headers, body):
-    print(f"[App] create_channel with\nHeader: {headers}\nBody: {body}")
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("create_channel with\nHeader: %s\nBody: %s", headers, body)
     channel_name = body.get("channel-name", "")
     channel_password = body.get("channel-password", "")
     if (not channel_name) or (channel_name in channels) or (not channel_password):
@@ -275,12 +278,9 @@ def create_channel(headers, body):
     return {"auth": "true", "redirect": "/channel"}
 
 
-@app.route('/join-channel', methods=['POST'])
+@app.route('/join-channel', methods=['POST'], middleware=[login_required])
 def join_channel(headers, body):
-    print(f"[App] join_channel with\nHeader: {headers}\nBody: {body}")
-    if not authenticate(headers):
-        return {"auth": "false"}
-    
+    log.debug("join_channel with\nHeader: %s\nBody: %s", headers, body)
     channel_name = body.get("channel-name", "")
     channel_password = body.get("channel-password", "")
 
@@ -294,28 +294,19 @@ def join_channel(headers, body):
     username = get_username(headers)
     peer_ip, peer_port, _ = account_to_address[username]
     address_list.append(f"{peer_ip}:{peer_port}")
+    # Publish the change when channels is shared across prefork workers
+    channels[channel_name] = (address_list, password_hash)
 
     return {"auth": "true", "redirect": "/channel"}
 
 
 def authenticate(headers):
-    cookie = headers.get("cookie-pair", None)
-    if cookie:
-        auth = cookie.get("auth", "")
-        session_id = cookie.get("session_id", "")
-        if auth == "true" and session_id in session_to_account:
-            return True
-    return False
+    return get_username(headers) is not None
 
 
 def get_username(headers):
-    cookie = headers.get("cookie-pair", None)
-    if cookie:
-        auth = cookie.get("auth", "")
-        session_id = cookie.get("session_id", "")
-        if auth == "true" and session_id in session_to_account:
-            return session_to_account[session_id]
-    return None
+    # Resolved once per request by resolve_session
+    return headers["context"]["username"]
 
 
 def validate_address(ip, port, local_port):
@@ -349,12 +340,30 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes per backend (prefork). Default is 1.')
+    parser.add_argument('--engine', choices=('thread', 'async'), default='thread',
+                        help='Serving engine of the backends. Default is thread.')
+    parser.add_argument('--metrics-path', default=None,
+                        help='Serve the metrics of each backend on this path, e.g. /metrics.')
+    parser.add_argument('--profile-path', default=None,
+                        help='Serve the sampled profiles of each backend on this path, e.g. /profile.')
+    parser.add_argument('--profile-sample', type=int, default=None,
+                        help='Profile 1 request out of N with cProfile.')
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
+    if args.workers > 1:
+        # Every worker process must see the same accounts and sessions
+        accounts = app.shared_state()
+        session_to_account = app.shared_state()
+        account_to_address = app.shared_state()
+        channels = app.shared_state()
+
     # Prepare and launch the RESTful application
     app.prepare_address(ip, port)
     # app.run()
-    app.run_proxy()
\ No newline at end of file
+    app.run_proxy(workers=args.workers, engine=args.engine, metrics_path=args.metrics_path,
+                  profile_path=args.profile_path, profile_sample=args.profile_sample)
\ No newline at end of file
@@ -58,9 +58,32 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--engine',
+        choices=('thread', 'async'),
+        default='thread',
+        help='Serving engine: worker pool threads or one event loop. Default is thread.'
+    )
+    parser.add_argument(
+        '--metrics-path',
+        default=None,
+        help='Serve the backend metrics on this path, e.g. /metrics. Disabled by default.'
+    )
+    parser.add_argument(
+        '--profile-path',
+        default=None,
+        help='Serve the sampled profiles on this path, e.g. /profile. Disabled by default.'
+    )
+    parser.add_argument(
+        '--profile-sample',
+        type=int,
+        default=None,
+        help='Profile 1 request out of N with cProfile. Disabled by default.'
+    )
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    create_backend(ip, port)
+    create_backend(ip, port, engine=args.engine, metrics_path=args.metrics_path,
+                   profile_path=args.profile_path, profile_sample=args.profile_sample)
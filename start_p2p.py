@@ -32,11 +32,14 @@ from collections import defaultdict
 
 
 from daemon.weaprous import WeApRous
+from daemon.logger import get_logger
 # from daemon import p2p
 
 PORT = 8386  # Default port
 
 app = WeApRous()
+log = get_logger("App")
+peer_log = get_logger("Peer")
 accounts = dict()
 session_to_account = dict()
 account_to_address = dict()
@@ -75,9 +78,7 @@ def handle_incoming_connection(connection):
             try:
                 sender_address, timestamp, content = message_str.split(" ", 2)
 
-                print(
-                    f"\n[Received from {sender_address}] @ {timestamp}:\n  {content}\n"
-                )
+                peer_log.debug("Received from %s @ %s: %s", sender_address, timestamp, content)
 
                 # Update the chat history
                 if content.startswith("[Channel]"):
@@ -102,10 +103,10 @@ def handle_incoming_connection(connection):
                         )
 
             except ValueError:
-                print(f"\n[Received malformed message]: {message_str}\n")
+                peer_log.warning("Received malformed message: %s", message_str)
 
     except Exception as e:
-        print(f"\n[Error handling connection]: {e}\n")
+        peer_log.warning("Error handling connection: %s", e)
     finally:
         connection.close()
 
@@ -121,7 +122,7 @@ def start_server(host, port):
     try:
         server_socket.bind((host, port))
         server_socket.listen()
-        print(f"[Server Started] Listening for connections on {host}:{port}")
+        peer_log.info("Listening for connections on %s:%s", host, port)
 
         while True:
             # Wait for and accept an incoming connection
@@ -132,11 +133,11 @@ def start_server(host, port):
             handler_thread.start()
 
     except OSError as e:
-        print(f"\n[FATAL ERROR] Could not start server: {e}")
-        print("This port might be in use. Please try a different port.")
+        peer_log.error("Could not start server: %s. This port might be in use, "
+                       "please try a different port.", e)
         sys.exit(1)  # Exit the entire program
     except Exception as e:
-        print(f"\n[Server Error]: {e}\n")
+        peer_log.error("Server error: %s", e)
     finally:
         server_socket.close()
 
@@ -164,7 +165,7 @@ def send_message(target_ip, target_port, content):
         client_socket.connect((target_ip, target_port))
         client_socket.sendall(message.encode("utf-8"))
 
-        print(f"\n[Message sent to {target_address_str}]\n")
+        peer_log.debug("Message sent to %s", target_address_str)
 
         # update local chat history
         if content.startswith("[Channel]"):
@@ -180,13 +181,11 @@ def send_message(target_ip, target_port, content):
                 chat_history[target_address_str].append(("sent", timestamp, content))
 
     except socket.timeout:
-        print(f"\n[Error] Connection to {target_address_str} timed out.\n")
+        peer_log.warning("Connection to %s timed out", target_address_str)
     except ConnectionRefusedError:
-        print(
-            f"\n[Error] Connection to {target_address_str} was refused.\n  (Is the other peer running?)\n"
-        )
+        peer_log.warning("Connection to %s was refused (is the other peer running?)", target_address_str)
     except Exception as e:
-        print(f"\n[Error sending message to {target_address_str}]: {e}\n")
+        peer_log.warning("Error sending message to %s: %s", target_address_str, e)
     finally:
         client_socket.close()
 
@@ -197,8 +196,8 @@ def run(my_ip, my_port):
     """
     global my_listening_address
     my_listening_address = f"{my_ip}:{my_port}"
-    print(f"\nYour listening address is: {my_listening_address}")
-    print("Share this with peers so they can message you.")
+    peer_log.info("Your listening address is %s, share it with peers so they can "
+                  "message you.", my_listening_address)
 
     # server thread listen on '0.0.0.0' to accept connections from any IP
     server_thread = threading.Thread(
@@ -220,15 +219,15 @@ def run(my_ip, my_port):
                 )
                 send_thread.start()
             else:
-                print("Cannot send empty message.")
+                peer_log.warning("Cannot send empty message to %s:%s", target_ip, target_port)
 
         except Exception as e:
-            print(f"An error occurred: {e}")
+            peer_log.error("An error occurred: %s", e)
 
 
 @app.route("/connect-peer", methods=["POST"])
 def connect_peer_post(headers, body):
-    print(f"[App] connect_peer_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("connect_peer_post with\nHeader: %s\nBody: %s", headers, body)
     global server_ip
     server_ip = body.get("server-ip", "")
     global server_port
@@ -237,14 +236,14 @@ def connect_peer_post(headers, body):
     peer_ip = body.get("peer-ip", "")
     peer_port = body.get("peer-port", "")
 
-    return {"auth": "true", "redirect": f"/chat?ip={peer_ip}&port={peer_port}"}
+    return {"auth": "true", "redirect": f"/chat/{peer_ip}/{peer_port}"}
 
 
-@app.route("/chat", methods=["GET"])
+@app.route("/chat/<ip>/<int:port>", methods=["GET"])
 def chat_get(headers, body):
-    print(f"[App] chat_get with\nHeader: {headers}\nBody: {body}")
-    peer_ip = headers["query"]["ip"]
-    peer_port = headers["query"]["port"]
+    log.debug("chat_get with\nHeader: %s\nBody: %s", headers, body)
+    peer_ip = headers["params"]["ip"]
+    peer_port = headers["params"]["port"]
     peer_address = f"{peer_ip}:{peer_port}"
     history = chat_history.get(peer_address, "No history")
     return {
@@ -261,23 +260,39 @@ def chat_get(headers, body):
     }
 
 
-@app.route("/chat", methods=["POST"])
+@app.route("/chat/<ip>/<int:port>", methods=["POST"])
 def chat_post(headers, body):
-    print(f"[App] chat_post with\nHeader: {headers}\nBody: {body}")
-    peer_ip = headers["query"]["ip"]
-    peer_port = headers["query"]["port"]
+    log.debug("chat_post with\nHeader: %s\nBody: %s", headers, body)
+    peer_ip = headers["params"]["ip"]
+    peer_port = headers["params"]["port"]
     peer_address = f"{peer_ip}:{peer_port}"
     history = chat_history.get(peer_address, "")
 
     message_to_send = body["message"]
     send_queue.put((peer_ip, peer_port, message_to_send))
 
-    return {"auth": "true", "redirect": f"/chat?ip={peer_ip}&port={peer_port}"}
+    return {"auth": "true", "redirect": f"/chat/{peer_ip}/{peer_port}"}
+
+
+@app.route("/chat-export/<ip>/<int:port>", methods=["GET"])
+def chat_export(headers, body):
+    log.debug("chat_export with\nHeader: %s\nBody: %s", headers, body)
+    peer_ip = headers["params"]["ip"]
+    peer_port = headers["params"]["port"]
+    peer_address = f"{peer_ip}:{peer_port}"
+    with history_lock:
+        history = list(chat_history.get(peer_address, []))
+
+    def export_lines():
+        for sender, timestamp, message in history:
+            yield f"[{timestamp}] {sender}: {message}\n"
+
+    return {"auth": "true", "stream": export_lines(), "content_type": "text/plain; charset=utf-8"}
 
 
 @app.route("/broadcast0", methods=["POST"])
 def broadcast0(headers, body):
-    print(f"[App] broadcast0 with\nHeader: {headers}\nBody: {body}")
+    log.debug("broadcast0 with\nHeader: %s\nBody: %s", headers, body)
     global server_ip
     server_ip = body.get("server-ip", "")
     global server_port
@@ -293,7 +308,7 @@ def broadcast0(headers, body):
 
 @app.route("/broadcast", methods=["GET"])
 def broadcast_get(headers, body):
-    print(f"[App] broadcast_get with\nHeader: {headers}\nBody: {body}")
+    log.debug("broadcast_get with\nHeader: %s\nBody: %s", headers, body)
     return {
         "auth": "true",
         "content": "broadcast.html",
@@ -303,7 +318,7 @@ def broadcast_get(headers, body):
 
 @app.route("/broadcast", methods=["POST"])
 def broadcast_post(headers, body):
-    print(f"[App] broadcast_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("broadcast_post with\nHeader: %s\nBody: %s", headers, body)
     message_to_send = "[Broadcast] " + body["message"]
     for peer in peer_list:
         peer_ip, peer_port = peer.split(":")
@@ -314,7 +329,7 @@ def broadcast_post(headers, body):
 
 @app.route("/connect-channel", methods=["POST"])
 def connect_channel(headers, body):
-    print(f"[App] connect_channel with\nHeader: {headers}\nBody: {body}")
+    log.debug("connect_channel with\nHeader: %s\nBody: %s", headers, body)
 
     global server_ip
     server_ip = body.get("server-ip", "")
@@ -340,7 +355,7 @@ def connect_channel(headers, body):
 
 @app.route("/channel", methods=["GET"])
 def channel_get(headers, body):
-    print(f"[App] channel_get with\nHeader: {headers}\nBody: {body}")
+    log.debug("channel_get with\nHeader: %s\nBody: %s", headers, body)
 
     channel_name = headers["query"]["name"]
     history = channel_history.get(channel_name, "No history")
@@ -360,7 +375,7 @@ def channel_get(headers, body):
 
 @app.route("/channel", methods=["POST"])
 def channel_post(headers, body):
-    print(f"[App] channel_post with\nHeader: {headers}\nBody: {body}")
+    log.debug("channel_post with\nHeader: %s\nBody: %s", headers, body)
 
     channel_name = headers["query"]["name"]
     message = body["message"]
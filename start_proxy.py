@@ -43,7 +43,7 @@ from urllib.parse import urlparse
 from collections import defaultdict
 
 from daemon import create_proxy
-from daemon.proxy import parse_virtual_hosts
+from daemon.proxy import parse_virtual_hosts, parse_proxy_options
 
 PROXY_PORT = 8080
 
@@ -63,6 +63,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--metrics-path', default=None,
+                        help='Serve the proxy metrics on this path, e.g. /metrics.')
  
     args = parser.parse_args()
     ip = args.server_ip
@@ -70,4 +72,5 @@ if __name__ == "__main__":
 
     routes = parse_virtual_hosts("config/proxy.conf")
 
-    create_proxy(ip, port, routes)
+    create_proxy(ip, port, routes, metrics_path=args.metrics_path,
+                 **parse_proxy_options("config/proxy.conf"))
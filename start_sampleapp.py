@@ -29,36 +29,37 @@ import socket
 import argparse
 
 from daemon import WeApRous
+from daemon.logger import get_logger
 
 PORT = 8000  # Default port
 
 app = WeApRous()
+log = get_logger("SampleApp")
 
 @app.route('/login', methods=['POST'])
 def login(headers="guest", body="anonymous"):
     """
     Handle user login via POST request.
 
-    This route simulates a login process and prints the provided headers and body
-    to the console.
+    This route simulates a login process and logs the provided headers and body.
 
     :param headers (str): The request headers or user identifier.
     :param body (str): The request body or login payload.
     """
-    print("[SampleApp] Logging in {} to {}".format(headers, body))
+    log.info("Logging in %s to %s", headers, body)
 
 @app.route('/hello', methods=['PUT'])
 def hello(headers, body):
     """
     Handle greeting via PUT request.
 
-    This route prints a greeting message to the console using the provided headers
+    This route logs a greeting message using the provided headers
     and body.
 
     :param headers (str): The request headers or user identifier.
     :param body (str): The request body or message payload.
     """
-    print("[SampleApp] ['PUT'] Hello in {} to {}".format(headers, body))
+    log.info("['PUT'] Hello in %s to %s", headers, body)
 
 if __name__ == "__main__":
     # Parse command-line arguments to configure server IP and port
@@ -0,0 +1,94 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+Tests of the threaded backend, run with ``python -m pytest tests`` or
+``python -m unittest discover tests``.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+from daemon.backend import create_backend
+from daemon.weaprous import WeApRous
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+app = WeApRous()
+
+
+@app.route("/ping", methods=["GET"])
+def ping(headers, body):
+    return {"json": {"ok": True}}
+
+
+class IdleKeepAliveTest(unittest.TestCase):
+
+    POOL_SIZE = 2
+
+    @classmethod
+    def setUpClass(cls):
+        cls.port = free_port()
+        threading.Thread(target=create_backend, args=("127.0.0.1", cls.port, app.routes),
+                         kwargs={"pool_size": cls.POOL_SIZE, "keep_alive_timeout": 5},
+                         daemon=True).start()
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", cls.port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def request(self, conn, connection="keep-alive"):
+        conn.sendall("GET /ping HTTP/1.1\r\nHost: test\r\nConnection: {}\r\n\r\n".format(
+            connection).encode())
+        reply = b""
+        while b"\r\n\r\n" not in reply:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+        return reply
+
+    def test_idle_connections_do_not_hold_workers(self):
+        idle = [socket.create_connection(("127.0.0.1", self.port), timeout=3)
+                for _ in range(self.POOL_SIZE * 2)]
+        try:
+            for conn in idle:
+                self.assertTrue(self.request(conn).startswith(b"HTTP/1.1 200"))
+
+            started = time.monotonic()
+            with socket.create_connection(("127.0.0.1", self.port), timeout=3) as conn:
+                reply = self.request(conn, "close")
+            self.assertTrue(reply.startswith(b"HTTP/1.1 200"))
+            self.assertLess(time.monotonic() - started, 1)
+
+            # The parked connections are still served.
+            for conn in idle:
+                self.assertTrue(self.request(conn).startswith(b"HTTP/1.1 200"))
+        finally:
+            for conn in idle:
+                conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()